@@ -0,0 +1,130 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗情報の正規化のベンチマーク
+
+1-1.csv の行をもとに表記を揺らした合成データを作り、
+1 行ずつ Python で正規化する場合と、`gnavi_scraper.normalize` で列単位に正規化する場合の
+実行時間を比較します。両者の結果が一致することも確認します。
+
+実行方法:
+    python3 benchmark_normalize.py --rows 1000000
+
+"""
+import argparse                         # コマンドライン引数の解析
+import os                               # パス操作
+import random                           # 合成データの生成
+import re                               # 1 行ずつの正規化
+import sys                              # モジュール検索パスの追加
+import time                             # 実行時間の計測
+import unicodedata                      # 1 行ずつの NFKC
+
+# 共通パッケージ gnavi_scraper（1つ上のディレクトリ）を読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd                                                     # 合成データのデータフレーム
+from gnavi_scraper.extract import ADDRESS_REGEX                         # 住所の分割
+from gnavi_scraper.normalize import normalize_frame, DASH_PATTERN, URL_PATTERN, TEXT_COLUMNS   # 列単位の正規化
+
+DASH_REGEX = re.compile(DASH_PATTERN)
+URL_REGEX = re.compile(URL_PATTERN)
+# 全角に置き換える文字（半角 → 全角）
+FULL_WIDTH = str.maketrans('0123456789-ABCDEFGHIJKLMNOPQRSTUVWXYZ', '０１２３４５６７８９－ＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ')
+
+def make_rows(seed_file, rows, seed=0):
+    """1-1.csv の行の表記を揺らして、指定した行数の合成データを作る。
+
+    店舗名・電話番号・番地は行ごとにほぼ異なる値にし、都道府県・市区町村・URL は 1-1.csv の値を繰り返す
+    （実際のデータと同じく、列によって重複の多さが異なる）。
+
+    Args:
+        seed_file (str): もとにする CSV ファイル。
+        rows (int): 作成する行数。
+        seed (int): 乱数のシード。
+
+    Returns:
+        pandas.DataFrame: 合成データ。
+    """
+    rng = random.Random(seed)
+    base = pd.read_csv(seed_file, dtype=str, keep_default_na=False, encoding='utf-8-sig').to_dict('records')
+    records = []
+    for _ in range(rows):
+        row = dict(rng.choice(base))
+        row['店舗名'] = f"{row['店舗名']} {rng.randrange(100000)}号店"
+        row['電話番号'] = f"0{rng.randrange(10, 100)}-{rng.randrange(1000, 10000)}-{rng.randrange(1000, 10000)}"
+        row['番地'] = f"{rng.randrange(1, 10)}-{rng.randrange(1, 40)}-{rng.randrange(1, 30)}"
+        variant = rng.random()
+        if variant < 0.25:
+            row['電話番号'] = row['電話番号'].translate(FULL_WIDTH)
+            row['番地'] = row['番地'].translate(FULL_WIDTH)
+        elif variant < 0.4:
+            row['電話番号'] = '+81 ' + row['電話番号'][1:]
+            row['URL'] = row['URL'].upper().replace('HTTPS://', 'https://') + '#top'
+        elif variant < 0.5:
+            row['店舗名'] = ' ' + row['店舗名'].translate(FULL_WIDTH) + '　'
+            row['メールアドレス'] = 'mailto:' + row['メールアドレス'] if row['メールアドレス'] else ''
+        records.append(row)
+    return pd.DataFrame(records)
+
+def nfkc(value):
+    """1 つの値を NFKC で正規化し、前後の空白を除く。"""
+    return unicodedata.normalize('NFKC', value or '').strip()
+
+def normalize_row(row):
+    """1 行ずつ正規化する（`normalize_frame` と同じ規則を Python のループで行う比較用）。"""
+    row = dict(row)
+    for column in TEXT_COLUMNS:
+        row[column] = nfkc(row[column])
+    row['メールアドレス'] = re.sub(r'^mailto:', '', row['メールアドレス'], flags=re.IGNORECASE)
+
+    phone = re.sub(r'^\+81[\s\-]*', '0', nfkc(row['電話番号']))
+    phone = re.sub(r'[()\s]+', '-', re.sub(r'^\((\d+)\)', r'\1-', phone))
+    phone = DASH_REGEX.sub('-', phone)
+    row['電話番号'] = re.sub(r'[^\d\-]', '', phone).strip('-')
+
+    match = ADDRESS_REGEX.match(row['都道府県'] + row['市区町村'] + row['番地'])
+    if match:
+        row['都道府県'], row['市区町村'], row['番地'] = match.groups()
+
+    url = (row['URL'] or '').strip()
+    match = URL_REGEX.match(url)
+    if match:
+        scheme, host, port, rest = (part or '' for part in match.groups())
+        scheme = scheme.lower()
+        if (scheme, port) in (('http', '80'), ('https', '443')):
+            port = ''
+        rest = rest or '/'
+        row['URL'] = f"{scheme}://{host.lower().rstrip('.')}{':' + port if port else ''}" \
+                     f"{rest if rest.startswith('/') else '/' + rest}"
+    else:
+        row['URL'] = url
+
+    row['SSL'] = str(row['SSL']).strip().lower() in ('true', '1')
+    return row
+
+def main():
+    """合成データで 1 行ずつの正規化と列単位の正規化を比較する。"""
+    parser = argparse.ArgumentParser(description='店舗情報の正規化のベンチマーク')
+    parser.add_argument('--rows', type=int, default=1000000, help='合成データの行数')
+    parser.add_argument('--seed-file', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '1-1.csv'),
+                        help='もとにする CSV ファイル')
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} rows from {args.seed_file}")
+    df = make_rows(args.seed_file, args.rows)
+
+    start = time.perf_counter()
+    records = df.to_dict('records')
+    row_result = pd.DataFrame([normalize_row(row) for row in records])
+    row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame_result = normalize_frame(df)
+    frame_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(row_result.astype(str), frame_result.astype(str))
+    print(f"{'row-by-row':>12}: {row_time:8.2f} s ({args.rows / row_time:10,.0f} rows/s)")
+    print(f"{'vectorized':>12}: {frame_time:8.2f} s ({args.rows / frame_time:10,.0f} rows/s)")
+    print(f"{'speedup':>12}: {row_time / frame_time:8.2f} x (results are identical)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""取得結果を溜める方法のメモリ使用量のベンチマーク
+
+1-1.csv の行をもとに合成した店舗情報を、次の 2 つの方法で溜めて DataFrame に変換し、
+tracemalloc で計測したメモリ使用量と実行時間を比較します。
+
+- dict のリスト: 従来の `data.append(row)` と `pd.DataFrame(data)`。
+- 列ごとのバッファ: `gnavi_scraper.column_buffer.ColumnBuffer` と `to_frame(release=True)`。
+
+どちらの方法でも、行は 1 件ずつ新しい文字列で作ります（HTML から抽出した値と同じく、
+同じ都道府県名でも別の文字列オブジェクトになる）。
+
+実行方法:
+    python3 benchmark_rows.py --rows 1000000
+
+"""
+import argparse                         # コマンドライン引数の解析
+import csv                              # もとにする CSV の読み込み
+import gc                               # 計測前のガベージコレクション
+import os                               # パス操作
+import random                           # 合成データの生成
+import sys                              # モジュール検索パスの追加
+import time                             # 実行時間の計測
+import tracemalloc                      # メモリ使用量の計測
+
+# 共通パッケージ gnavi_scraper（1つ上のディレクトリ）を読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd                                         # DataFrame への変換
+from gnavi_scraper.column_buffer import ColumnBuffer        # 列ごとのバッファ
+
+def load_seed_rows(seed_file):
+    """もとにする CSV の行を読み込む。"""
+    with open(seed_file, newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+def fresh(value):
+    """同じ内容の新しい文字列オブジェクトを返す（HTML から抽出した値を模す）。"""
+    return ''.join([value, ' '])[:-1] if value else value
+
+def iter_rows(base, rows, seed=0):
+    """`get_rs_data` が返すものと同じ形の店舗情報を 1 件ずつ作る。
+
+    Args:
+        base (list): もとにする行のリスト。
+        rows (int): 作成する行数。
+        seed (int): 乱数のシード。
+
+    Yields:
+        dict: `ROW_COLUMNS` をキーとする店舗情報。
+    """
+    rng = random.Random(seed)
+    for number in range(rows):
+        row = rng.choice(base)
+        yield {
+            '店舗URL': f"https://r.gnavi.co.jp/{number:08x}/",
+            '店舗名': f"{row['店舗名']} {rng.randrange(100000)}号店",
+            '電話番号': f"0{rng.randrange(10, 100)}-{rng.randrange(1000, 10000)}-{rng.randrange(1000, 10000)}",
+            'メールアドレス': fresh(row['メールアドレス']),
+            '都道府県': fresh(row['都道府県']),
+            '市区町村': fresh(row['市区町村']),
+            '番地': f"{rng.randrange(1, 10)}-{rng.randrange(1, 40)}-{rng.randrange(1, 30)}",
+            '建物名': fresh(row['建物名']),
+            'URL': fresh(row['URL']),
+            'SSL': row['SSL'] == 'True',
+        }
+
+def measure(label, collect, base, rows):
+    """行を溜めて DataFrame に変換し、メモリ使用量と実行時間を表示する。
+
+    Args:
+        label (str): 表示する方法の名前。
+        collect (callable): 行のイテレータを受け取り、(溜めたもの, DataFrame を返す関数) を返す関数。
+        base (list): もとにする行のリスト。
+        rows (int): 行数。
+
+    Returns:
+        pandas.DataFrame: 変換した DataFrame（結果の比較用）。
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    container, convert = collect(iter_rows(base, rows))
+    filled, _ = tracemalloc.get_traced_memory()
+    fill_time = time.perf_counter() - start
+    df = convert(container)
+    del container
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    print(f"{label:>14}: filled {filled / 2**20:8.1f} MB ({filled / rows:5.0f} B/row), "
+          f"peak {peak / 2**20:8.1f} MB, DataFrame {retained / 2**20:8.1f} MB, "
+          f"{fill_time:6.2f} s + {elapsed - fill_time:6.2f} s")
+    return df
+
+def collect_dicts(rows):
+    data = []
+    for row in rows:
+        data.append(row)
+    return data, pd.DataFrame
+
+def collect_columns(rows):
+    buffer = ColumnBuffer()
+    for row in rows:
+        buffer.write(row)
+    return buffer, lambda buffer: buffer.to_frame(release=True)
+
+def main():
+    """dict のリストと列ごとのバッファのメモリ使用量を比較する。"""
+    parser = argparse.ArgumentParser(description='取得結果を溜める方法のメモリ使用量のベンチマーク')
+    parser.add_argument('--rows', type=int, default=1000000, help='合成データの行数')
+    parser.add_argument('--seed-file', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '1-1.csv'),
+                        help='もとにする CSV ファイル')
+    args = parser.parse_args()
+
+    base = load_seed_rows(args.seed_file)
+    print(f"{args.rows} rows generated from {args.seed_file} (memory measured with tracemalloc)")
+    dict_df = measure('list of dicts', collect_dicts, base, args.rows)
+    del dict_df     # 次の計測に含めない
+    column_df = measure('ColumnBuffer', collect_columns, base, args.rows)
+    expected = pd.DataFrame(list(iter_rows(base, min(args.rows, 10000))))
+    pd.testing.assert_frame_equal(column_df.head(len(expected)).astype(str), expected.astype(str))
+    print("Results are identical.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""読み取り用 API の負荷試験（結果のキャッシュの効果）
+
+ローカルの MySQL の ex2_2 に対して `gnavi_scraper.query_service` の API を 2 つ起動し
+（キャッシュあり・なし）、よく使う検索と集計を同じ割合で並列に送って、毎秒のリクエスト数と
+応答時間を比較します。途中で更新番号を進め、キャッシュが捨てられることも確認します。
+
+ex2_2 に行がない場合は、先に 2-2.py か `python3 -m gnavi_scraper backfill` で読み込んでください。
+
+実行方法（コンテナ内）:
+    python3 benchmark_query.py --requests 5000 --concurrency 16
+
+"""
+import argparse                                     # コマンドライン引数の解析
+import os                                           # パス操作
+import random                                       # リクエストの選択
+import statistics                                   # 応答時間の分位点
+import sys                                          # モジュール検索パスの追加
+import threading                                    # API のサーバーのスレッド
+import time                                         # 応答時間の計測
+from concurrent.futures import ThreadPoolExecutor   # 並列のリクエスト
+from http.server import ThreadingHTTPServer         # API のサーバー
+from urllib.parse import urlencode                  # クエリ文字列の作成
+from urllib.request import urlopen                  # API へのリクエスト
+
+# 共通パッケージ gnavi_scraper（ローカルでは 1つ上のディレクトリ、コンテナでは /app）を読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gnavi_scraper.db import has_version_table, bump_table_version      # 更新番号
+from gnavi_scraper.metrics import METRICS                               # キャッシュの命中数
+from gnavi_scraper.query_service import open_service, _QueryHandler    # 読み取り用 API
+
+def start_server(service):
+    """API をバックグラウンドで起動し、ベース URL を返す。"""
+    handler = type('QueryHandler', (_QueryHandler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def build_queries(service, count=50):
+    """よく使う検索条件を、実際のデータの都道府県・市区町村から作る。
+
+    Returns:
+        list: クエリ文字列付きのパスのリスト。
+    """
+    cities = service.counts({'group': 'city'})[:count]
+    queries = ['/counts?group=pref', '/counts?group=pref&ssl=0', '/counts?group=city&ssl=0']
+    for city in cities:
+        pref = {'pref': city['都道府県'], 'city': city['市区町村']}
+        queries.append('/stores?' + urlencode(dict(pref, ssl=0)))
+        queries.append('/stores?' + urlencode(dict(pref, limit=20)))
+        queries.append('/counts?' + urlencode({'group': 'city', 'pref': city['都道府県']}))
+    return queries
+
+def run(base_url, queries, requests, concurrency, seed=0):
+    """クエリを並列に送り、毎秒のリクエスト数と応答時間の分位点を返す。"""
+    rng = random.Random(seed)
+    paths = [rng.choice(queries) for _ in range(requests)]
+
+    def request(path):
+        start = time.perf_counter()
+        with urlopen(base_url + path) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(request, paths))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+def cache_hits():
+    """クエリのキャッシュの (命中数, 外れ数) を返す。"""
+    counters = METRICS.status()['counters']
+    return (counters.get('gnavi_cache_requests_total{cache="query",result="hit"}', 0),
+            counters.get('gnavi_cache_requests_total{cache="query",result="miss"}', 0))
+
+def main():
+    """キャッシュあり・なしの API に同じリクエストを送り、結果を比較する。"""
+    parser = argparse.ArgumentParser(description='読み取り用 API の負荷試験')
+    parser.add_argument('--requests', type=int, default=5000, help='リクエスト数')
+    parser.add_argument('--concurrency', type=int, default=16, help='並列に送るリクエスト数')
+    parser.add_argument('--table', default='ex2_2', help='店舗情報のテーブル名')
+    parser.add_argument('--cache-ttl', type=float, default=60.0, help='結果の有効期限（秒）')
+    args = parser.parse_args()
+
+    uncached = open_service(args.table, cache_size=0, workers=args.concurrency)
+    cached = open_service(args.table, cache_size=1024, cache_ttl=args.cache_ttl, workers=args.concurrency)
+    queries = build_queries(uncached)
+    print(f"{len(queries)} distinct queries, {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'mode':>20} {'req/s':>9} {'p50 [ms]':>9} {'p95 [ms]':>9} {'hit ratio':>10}")
+
+    for label, service in [('no cache', uncached), ('cache (cold)', cached), ('cache (warm)', cached)]:
+        server, base_url = start_server(service)
+        hits, misses = cache_hits()
+        rate, p50, p95 = run(base_url, queries, args.requests, args.concurrency)
+        new_hits, new_misses = cache_hits()
+        lookups = (new_hits - hits) + (new_misses - misses)
+        ratio = f"{(new_hits - hits) / lookups:10.1%}" if lookups else f"{'-':>10}"
+        print(f"{label:>20} {rate:9.1f} {p50 * 1000:9.1f} {p95 * 1000:9.1f} {ratio}")
+        server.shutdown()
+
+    # 書き込みを模して更新番号を進め、次のリクエストでキャッシュが捨てられることを確認する
+    with cached.engine.begin() as conn:
+        if not has_version_table(conn):
+            print("table_versions is missing; skipped the invalidation check.")
+            return
+        bump_table_version(conn, args.table)
+    time.sleep(cached.cache.version_interval)
+    server, base_url = start_server(cached)
+    hits, misses = cache_hits()
+    rate, p50, p95 = run(base_url, queries, args.requests, args.concurrency, seed=1)
+    new_hits, new_misses = cache_hits()
+    print(f"{'after version bump':>20} {rate:9.1f} {p50 * 1000:9.1f} {p95 * 1000:9.1f} "
+          f"{(new_hits - hits) / ((new_hits - hits) + (new_misses - misses)):10.1%}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
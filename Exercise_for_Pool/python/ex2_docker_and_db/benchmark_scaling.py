@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗数・並列数と処理速度のベンチマーク（合成サイトに対する取得）
+
+`gnavi_scraper.loadgen` の合成サイトを店舗数ごとに起動し、requests と Selenium のバックエンドで
+`scrape` と同じ処理（検索結果ページをたどって店舗ページ・公式URL・SSL を確認し、CSV に書き込む）を
+並列数を変えて実行して、毎秒の店舗数を比較します。遅延・障害の指定は loadgen と同じ引数で行います。
+
+結果は CSV に保存し、matplotlib がある場合は並列数ごとの処理速度の曲線を PNG に保存します
+（コンテナでは `pip install matplotlib` が必要）。
+
+実行方法（コンテナ内）:
+    python3 benchmark_scaling.py --sizes 1000 10000 --concurrency 1 4 16 --store-latency lognormal:0.1:0.5
+    python3 benchmark_scaling.py --sizes 10000 100000 1000000 --backends requests --concurrency 8 32 64
+
+"""
+import argparse                                     # コマンドライン引数の解析
+import contextlib                                   # 取得中の表示の抑制
+import csv                                          # 結果の保存
+import os                                           # パス操作
+import sys                                          # モジュール検索パスの追加
+import tempfile                                     # 取得結果の CSV の保存先
+import time                                         # 実行時間の計測
+
+# 共通パッケージ gnavi_scraper（ローカルでは 1つ上のディレクトリ、コンテナでは /app）を読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gnavi_scraper.cli import scrape                            # 店舗情報の取得
+from gnavi_scraper.config import load_config                    # 取得の設定
+from gnavi_scraper.loadgen import add_arguments, from_arguments # 合成サイト
+from gnavi_scraper.metrics import METRICS                       # 合成サイトの応答数
+
+# 結果の CSV の列
+RESULT_COLUMNS = ['backend', 'stores', 'concurrency', 'seconds', 'stores_per_sec', 'rows', 'errors']
+
+def run(base_url, backend, size, concurrency, output, timeout):
+    """合成サイトから `size` 店舗を取得し、(経過時間 [秒], 書き込んだ行数) を返す。"""
+    config = load_config(None, {
+        'scope': {'demand': size, 'start_urls': [f"{base_url}/area/jp/rs/"], 'max_blank_stores': 0},
+        'fetch': {'backend': backend, 'workers': concurrency, 'tabs': concurrency if backend == 'selenium' else 1,
+                  'timeout': timeout, 'ssl_timeout': timeout, 'deadline': 0},
+        'breaker': {'file': ''},
+        'sink': {'type': 'csv', 'output': output},
+    })
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rows = scrape(config)
+    return time.perf_counter() - start, rows
+
+def error_count():
+    """合成サイトが 503 を返した回数を返す。"""
+    counters = METRICS.status()['counters']
+    return sum(value for name, value in counters.items()
+               if name.startswith('gnavi_loadgen_requests_total') and 'status="503"' in name)
+
+def plot(results, path):
+    """バックエンドと店舗数ごとに、並列数と毎秒の店舗数の曲線を PNG に保存する。"""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipped the plot.")
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for key in sorted({(row['backend'], row['stores']) for row in results}):
+        points = [row for row in results if (row['backend'], row['stores']) == key]
+        ax.plot([row['concurrency'] for row in points], [row['stores_per_sec'] for row in points],
+                marker='o', label=f"{key[0]} / {key[1]} stores")
+    ax.set_xscale('log', base=2)
+    ax.set_xlabel('concurrency (workers / tabs)')
+    ax.set_ylabel('stores per second')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"{path} has been created!")
+
+def main():
+    """店舗数・バックエンド・並列数ごとに取得し、毎秒の店舗数を表示する。"""
+    parser = argparse.ArgumentParser(description='店舗数・並列数と処理速度のベンチマーク（合成サイト）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='店舗数')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='並列数（スレッド数・タブ数）')
+    parser.add_argument('--backends', nargs='+', choices=['requests', 'selenium'], default=['requests', 'selenium'],
+                        help='ページ取得のバックエンド')
+    parser.add_argument('--selenium-max-stores', type=int, default=2000,
+                        help='Selenium で取得する店舗数の上限（大きい店舗数では省略する）')
+    parser.add_argument('--timeout', type=float, default=5.0, help='ページ取得・SSL 確認のタイムアウト（秒）')
+    parser.add_argument('--https-port', type=int, default=None, help='合成サイトの HTTPS のポート番号')
+    parser.add_argument('--output', default='benchmark_scaling.csv', help='結果の CSV')
+    parser.add_argument('--plot', default='benchmark_scaling.png', help='処理速度の曲線の PNG（空文字で保存しない）')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'backend':>9} {'stores':>8} {'conc':>5} {'seconds':>9} {'stores/s':>9} {'rows':>8} {'503':>6}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            with from_arguments(args, size) as generator:
+                base_url = generator.start('0.0.0.0', 0, args.https_port)
+                for backend in args.backends:
+                    if backend == 'selenium' and size > args.selenium_max_stores:
+                        print(f"{backend:>9} {size:8d} skipped (--selenium-max-stores {args.selenium_max_stores})")
+                        continue
+                    for concurrency in args.concurrency:
+                        errors = error_count()
+                        seconds, rows = run(base_url, backend, size, concurrency,
+                                            os.path.join(directory, 'scrape.csv'), args.timeout)
+                        row = {'backend': backend, 'stores': size, 'concurrency': concurrency,
+                               'seconds': round(seconds, 3), 'stores_per_sec': round(rows / seconds, 2),
+                               'rows': rows, 'errors': error_count() - errors}
+                        results.append(row)
+                        print(f"{backend:>9} {size:8d} {concurrency:5d} {seconds:9.2f} "
+                              f"{row['stores_per_sec']:9.2f} {rows:8d} {row['errors']:6d}")
+
+    with open(args.output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"{args.output} has been created!")
+    if args.plot:
+        plot(results, args.plot)
+
+if __name__ == "__main__":
+    main()
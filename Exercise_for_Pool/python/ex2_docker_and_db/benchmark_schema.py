@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ex2_2 テーブルのスキーマ比較ベンチマーク
+
+旧スキーマ（主キーのみ）と新スキーマ（mysql-init.sql のインデックス付き）の
+テーブルに同じ合成データを投入し、よく使うクエリの実行時間を比較します。
+
+実行方法:
+    python3 benchmark_schema.py --rows 1000000
+
+"""
+import argparse                         # コマンドライン引数の解析
+import os                               # 環境変数から接続設定を取得する
+import random                           # 合成データの生成
+import statistics                       # 実行時間の中央値
+import time                             # 実行時間の計測
+from sqlalchemy import create_engine    # データベースエンジンの作成
+
+# 旧スキーマ（店舗URL 列はクエリをそろえるために追加し、インデックスは付けない）
+OLD_DDL = '''
+CREATE TABLE {table} (
+    ID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    `店舗URL` VARCHAR(255),
+    `店舗名` VARCHAR(255),
+    `電話番号` VARCHAR(30),
+    `メールアドレス` VARCHAR(255),
+    `都道府県` VARCHAR(255),
+    `市区町村` VARCHAR(255),
+    `番地` VARCHAR(255),
+    `建物名` VARCHAR(255),
+    `URL` VARCHAR(255),
+    `SSL` TINYINT(1) DEFAULT 0
+) DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+'''
+
+# 新スキーマ（mysql-init.sql と同じ定義）
+NEW_DDL = '''
+CREATE TABLE {table} (
+    ID BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    `店舗URL` VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin,
+    `店舗名` VARCHAR(255) NOT NULL DEFAULT '',
+    `電話番号` VARCHAR(32) NOT NULL DEFAULT '',
+    `メールアドレス` VARCHAR(254) NOT NULL DEFAULT '',
+    `都道府県` VARCHAR(4) NOT NULL DEFAULT '',
+    `市区町村` VARCHAR(64) NOT NULL DEFAULT '',
+    `番地` VARCHAR(255) NOT NULL DEFAULT '',
+    `建物名` VARCHAR(255) NOT NULL DEFAULT '',
+    `URL` VARCHAR(512),
+    `SSL` TINYINT(1) NOT NULL DEFAULT 0,
+    `SSL確認` VARCHAR(255) NOT NULL DEFAULT '',
+    `取得日時` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_store_url (`店舗URL`),
+    KEY idx_pref_city (`都道府県`, `市区町村`),
+    KEY idx_ssl_pref_city (`SSL`, `都道府県`, `市区町村`),
+    KEY idx_phone (`電話番号`)
+) ENGINE=InnoDB DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+'''
+
+PREFECTURES = [
+    '北海道', '青森県', '岩手県', '宮城県', '秋田県', '山形県', '福島県', '茨城県', '栃木県', '群馬県',
+    '埼玉県', '千葉県', '東京都', '神奈川県', '新潟県', '富山県', '石川県', '福井県', '山梨県', '長野県',
+    '岐阜県', '静岡県', '愛知県', '三重県', '滋賀県', '京都府', '大阪府', '兵庫県', '奈良県', '和歌山県',
+    '鳥取県', '島根県', '岡山県', '広島県', '山口県', '徳島県', '香川県', '愛媛県', '高知県', '福岡県',
+    '佐賀県', '長崎県', '熊本県', '大分県', '宮崎県', '鹿児島県', '沖縄県',
+]
+
+# 比較するクエリ（名前, SQL, パラメータを生成する関数）
+QUERIES = [
+    ('都道府県で件数',
+     "SELECT COUNT(*) FROM {table} WHERE `都道府県` = %s",
+     lambda rnd, n: (rnd.choice(PREFECTURES),)),
+    ('市区町村で一覧',
+     "SELECT `店舗名`, `電話番号` FROM {table} WHERE `都道府県` = %s AND `市区町村` = %s",
+     lambda rnd, n: city_of(rnd)),
+    ('SSL非対応の店舗',
+     "SELECT `店舗名`, `URL` FROM {table} WHERE `SSL` = 0 AND `都道府県` = %s AND `市区町村` = %s",
+     lambda rnd, n: city_of(rnd)),
+    ('店舗URLで重複確認',
+     "SELECT ID FROM {table} WHERE `店舗URL` = %s",
+     lambda rnd, n: (store_url(rnd.randrange(n)),)),
+    ('電話番号で重複確認',
+     "SELECT ID FROM {table} WHERE `電話番号` = %s",
+     lambda rnd, n: (phone(rnd.randrange(n)),)),
+]
+
+def city_of(rnd):
+    """ランダムな (都道府県, 市区町村) を返す。"""
+    return rnd.choice(PREFECTURES), f"第{rnd.randrange(40)}市"
+
+def store_url(i):
+    """i 番目の店舗の店舗URLを返す。"""
+    return f"https://r.gnavi.co.jp/b{i:07d}/"
+
+def phone(i):
+    """i 番目の店舗の電話番号を返す。"""
+    return f"0{i % 9 + 1}-{i // 10000:04d}-{i % 10000:04d}"
+
+def synthetic_rows(start, count, rnd):
+    """合成データの行を生成する。"""
+    for i in range(start, start + count):
+        prefecture, city = city_of(rnd)
+        has_ssl = rnd.random() < 0.6
+        yield (
+            store_url(i), f"店舗{i}", phone(i), f"shop{i}@example.com", prefecture, city,
+            f"{rnd.randrange(1, 30)}-{rnd.randrange(1, 30)}", f"ビル{rnd.randrange(100)}",
+            f"{'https' if has_ssl else 'http'}://shop{i}.example.com", int(has_ssl),
+        )
+
+def load(conn, table, rows, batch_size=5000, seed=0):
+    """テーブルを作り直し、合成データを投入する。"""
+    rnd = random.Random(seed)
+    sql = (f"INSERT INTO {table} (`店舗URL`, `店舗名`, `電話番号`, `メールアドレス`, `都道府県`, "
+           f"`市区町村`, `番地`, `建物名`, `URL`, `SSL`) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    started = time.perf_counter()
+    for start in range(0, rows, batch_size):
+        batch = list(synthetic_rows(start, min(batch_size, rows - start), rnd))
+        conn.exec_driver_sql(sql, batch)
+        conn.commit()
+    conn.exec_driver_sql(f"ANALYZE TABLE {table}")
+    return time.perf_counter() - started
+
+def run_query(conn, table, sql, make_params, rows, repeat, seed=1):
+    """クエリを repeat 回実行し、実行時間の中央値（ミリ秒）と EXPLAIN の結果を返す。"""
+    rnd = random.Random(seed)
+    sql = sql.format(table=table)
+    timings = []
+    for _ in range(repeat):
+        params = make_params(rnd, rows)
+        started = time.perf_counter()
+        conn.exec_driver_sql(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    plan = conn.exec_driver_sql("EXPLAIN " + sql, make_params(rnd, rows)).mappings().first()
+    return statistics.median(timings), plan
+
+def main():
+    """旧スキーマと新スキーマのテーブルを作成し、クエリの実行時間を比較する。"""
+    parser = argparse.ArgumentParser(description='ex2_2 の旧スキーマと新スキーマのクエリ性能を比較する')
+    parser.add_argument('--rows', type=int, default=1000000, help='投入する合成データの行数')
+    parser.add_argument('--repeat', type=int, default=20, help='各クエリの実行回数')
+    parser.add_argument('--keep', action='store_true', help='終了後もベンチマーク用テーブルを残す')
+    args = parser.parse_args()
+
+    # MySQL接続設定: 環境変数から取得
+    user = os.getenv('MYSQL_USER', 'user')
+    password = os.getenv('MYSQL_PASSWORD', 'user_password')
+    host = os.getenv('MYSQL_HOST', 'mysql_container')
+    database = os.getenv('MYSQL_DATABASE', 'ex2')
+    engine = create_engine(f'mysql+mysqlconnector://{user}:{password}@{host}/{database}?charset=utf8mb4')
+
+    tables = {'old': ('bench_ex2_2_old', OLD_DDL), 'new': ('bench_ex2_2_new', NEW_DDL)}
+    results = {}
+    with engine.connect() as conn:
+        for label, (table, ddl) in tables.items():
+            conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+            conn.exec_driver_sql(ddl.format(table=table))
+            elapsed = load(conn, table, args.rows)
+            print(f"[{label}] loaded {args.rows} rows into {table} in {elapsed:.1f}s")
+
+            for name, sql, make_params in QUERIES:
+                median_ms, plan = run_query(conn, table, sql, make_params, args.rows, args.repeat)
+                results[(name, label)] = median_ms
+                print(f"[{label}] {name}: {median_ms:.2f} ms (type={plan['type']}, key={plan['key']})")
+
+        print(f"\n{'クエリ':<16}{'旧 (ms)':>12}{'新 (ms)':>12}{'倍率':>10}")
+        for name, _, _ in QUERIES:
+            old_ms, new_ms = results[(name, 'old')], results[(name, 'new')]
+            print(f"{name:<16}{old_ms:>12.2f}{new_ms:>12.2f}{old_ms / max(new_ms, 1e-6):>9.1f}x")
+
+        if not args.keep:
+            for table, _ in tables.values():
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {table}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Selenium のタブ数と処理速度・メモリ使用量のベンチマーク
+
+応答に一定の遅延があるローカルの HTTP サーバーを起動し、同じ店舗ページを次の方法で取得して、
+毎秒のページ数と Chrome・chromedriver の RSS 合計のピークを比較します。
+
+- tabs: 1 つの Chrome の N 個のタブで並行して読み込む（`SeleniumFetcher(tabs=N)`）。
+- browsers: Chrome を N 個起動し、それぞれ 1 ページずつ読み込む（比較用）。
+
+実行方法（コンテナ内）:
+    python3 benchmark_tabs.py --pages 200 --counts 1 2 4 8 --latency 0.5
+
+"""
+import argparse                                                      # コマンドライン引数の解析
+import os                                                            # パス操作
+import sys                                                           # モジュール検索パスの追加
+import threading                                                     # HTTP サーバーのスレッド、RSS の計測
+import time                                                          # 実行時間の計測、応答の遅延
+from concurrent.futures import ThreadPoolExecutor                    # 並列の取得要求
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 遅延のある店舗ページ
+
+# 共通パッケージ gnavi_scraper（ローカルでは 1つ上のディレクトリ、コンテナでは /app）を読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gnavi_scraper.backends.selenium_backend import SeleniumFetcher    # Selenium のページ取得
+
+# 店舗ページに似た HTML（店舗名の要素を JavaScript で少し遅れて描画する。
+# 描画前の HTML に id="info-name" が現れないよう、id は文字列を連結して付ける）
+PAGE = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>store {number}</title></head>
+<body><div id="app"></div>
+<script>setTimeout(function () {{
+  var name = document.createElement('p');
+  name.id = 'info-' + 'name';
+  name.textContent = '店舗 {number}';
+  document.getElementById('app').appendChild(name);
+}}, 50);</script>
+</body></html>"""
+
+def start_server(latency):
+    """一定の遅延のあと店舗ページを返す HTTP サーバーを起動する。
+
+    Args:
+        latency (float): 応答までの遅延（秒）。
+
+    Returns:
+        ThreadingHTTPServer: 起動したサーバー（`server_address` でポート番号を取得できる）。
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = PAGE.format(number=self.path.strip('/')).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def sample_rss(fetchers, stop, interval=0.5):
+    """取得中に一定間隔でブラウザの RSS を計測する（ピークは各 `ManagedDriver` に記録される）。"""
+    while not stop.wait(interval):
+        for fetcher in fetchers:
+            fetcher.driver.memory_usage()
+
+def run(mode, count, urls):
+    """指定した方法でページを取得し、経過時間と RSS 合計のピークを返す。
+
+    Args:
+        mode (str): 'tabs' または 'browsers'。
+        count (int): タブの数、またはブラウザの数。
+        urls (list): 取得するページの URL。
+
+    Returns:
+        tuple: (経過時間 [秒], RSS 合計のピーク [バイト], 取得できたページ数)。
+    """
+    if mode == 'tabs':
+        fetchers = [SeleniumFetcher(tabs=count)]
+    else:
+        fetchers = [SeleniumFetcher() for _ in range(count)]
+    for fetcher in fetchers:
+        fetcher.__enter__()
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_rss, args=(fetchers, stop), daemon=True)
+    sampler.start()
+    try:
+        start = time.perf_counter()
+        if mode == 'tabs':
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                pages = list(executor.map(lambda url: fetchers[0].fetch(url, '#info-name'), urls))
+        else:
+            # ブラウザごとに 1 スレッドで、URL を順番に分け合う
+            def crawl(index):
+                return [fetchers[index].fetch(url, '#info-name') for url in urls[index::count]]
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                pages = [page for result in executor.map(crawl, range(count)) for page in result]
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        sampler.join()
+        for fetcher in fetchers:
+            fetcher.__exit__(None, None, None)
+    peak = sum(fetcher.driver.peak_rss for fetcher in fetchers)
+    return elapsed, peak, sum(1 for page in pages if page and 'id="info-name"' in page)
+
+def main():
+    """タブ数・ブラウザ数ごとに毎秒のページ数とメモリ使用量を表示する。"""
+    parser = argparse.ArgumentParser(description='Selenium のタブ数と処理速度・メモリ使用量のベンチマーク')
+    parser.add_argument('--pages', type=int, default=200, help='取得するページ数')
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 2, 4, 8], help='タブ数・ブラウザ数')
+    parser.add_argument('--latency', type=float, default=0.5, help='店舗ページの応答の遅延（秒）')
+    parser.add_argument('--no-browsers', action='store_true', help='ブラウザを複数起動する比較を行わない')
+    args = parser.parse_args()
+
+    server = start_server(args.latency)
+    port = server.server_address[1]
+    urls = [f"http://127.0.0.1:{port}/{number}" for number in range(args.pages)]
+    print(f"{args.pages} pages, server latency {args.latency}s")
+    print(f"{'mode':>8} {'count':>5} {'pages/s':>8} {'peak RSS [MB]':>14} {'MB per worker':>14} {'ok':>5}")
+    modes = ['tabs'] if args.no_browsers else ['tabs', 'browsers']
+    for mode in modes:
+        for count in args.counts:
+            elapsed, peak, ok = run(mode, count, urls)
+            print(f"{mode:>8} {count:5d} {args.pages / elapsed:8.2f} {peak / 2**20:14.0f} "
+                  f"{peak / 2**20 / count:14.0f} {ok:5d}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+-- ex2_2 テーブルを mysql-init.sql の新しい定義に移行する
+-- 実行方法: mysql -u user -p ex2 < migrations/001_ex2_2_indexes.sql
+--
+-- 事前確認: 列の長さを縮めるため、次のクエリで最大長が新しい上限以下であることを確認する
+--   SELECT MAX(CHAR_LENGTH(`電話番号`)), MAX(CHAR_LENGTH(`都道府県`)),
+--          MAX(CHAR_LENGTH(`市区町村`)), MAX(CHAR_LENGTH(`URL`)) FROM ex2_2;
+
+SET NAMES utf8mb4;
+USE ex2;
+
+-- 1. NULL を空文字にそろえる（NOT NULL 制約を付けるため）
+UPDATE ex2_2 SET
+    `店舗名` = COALESCE(`店舗名`, ''),
+    `電話番号` = COALESCE(`電話番号`, ''),
+    `メールアドレス` = COALESCE(`メールアドレス`, ''),
+    `都道府県` = COALESCE(`都道府県`, ''),
+    `市区町村` = COALESCE(`市区町村`, ''),
+    `番地` = COALESCE(`番地`, ''),
+    `建物名` = COALESCE(`建物名`, ''),
+    `SSL` = COALESCE(`SSL`, 0);
+
+-- 2. 列の追加と型の変更（テーブルの再構築は 1 回で済むようにまとめる）
+--    既存の行の 店舗URL は NULL のまま（一意制約は NULL の重複を許す）
+ALTER TABLE ex2_2
+    MODIFY ID BIGINT UNSIGNED AUTO_INCREMENT,
+    ADD COLUMN `店舗URL` VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin AFTER ID,
+    MODIFY `店舗名` VARCHAR(255) NOT NULL DEFAULT '',
+    MODIFY `電話番号` VARCHAR(32) NOT NULL DEFAULT '',
+    MODIFY `メールアドレス` VARCHAR(254) NOT NULL DEFAULT '',
+    MODIFY `都道府県` VARCHAR(4) NOT NULL DEFAULT '',
+    MODIFY `市区町村` VARCHAR(64) NOT NULL DEFAULT '',
+    MODIFY `番地` VARCHAR(255) NOT NULL DEFAULT '',
+    MODIFY `建物名` VARCHAR(255) NOT NULL DEFAULT '',
+    MODIFY `URL` VARCHAR(512),
+    MODIFY `SSL` TINYINT(1) NOT NULL DEFAULT 0,
+    ADD COLUMN `取得日時` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+-- 3. インデックスの作成（オンラインで作成し、書き込みを止めない）
+ALTER TABLE ex2_2
+    ADD UNIQUE KEY uq_store_url (`店舗URL`),
+    ADD KEY idx_pref_city (`都道府県`, `市区町村`),
+    ADD KEY idx_ssl_pref_city (`SSL`, `都道府県`, `市区町村`),
+    ADD KEY idx_phone (`電話番号`),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ANALYZE TABLE ex2_2;
@@ -0,0 +1,37 @@
+-- ex2_2 の変更履歴テーブル ex2_2_history を追加する（001 の適用後に実行する）
+-- 実行方法: mysql -u user -p ex2 < migrations/002_ex2_2_history.sql
+--
+-- 日次パーティションは python3 -m gnavi_scraper.history で作成する。
+
+SET NAMES utf8mb4;
+USE ex2;
+
+-- 1. 同じ店舗の行が複数ある場合は、最新（ID が最大）の 1 行だけを残す
+--    店舗URL のある行は 001 の一意キー uq_store_url で重複しないため、対象は 001 より前に書き込まれた
+--    店舗URL が NULL の行だけ（NULL = NULL は真にならないため、店舗URL では比較できない）。
+--    これらの行は 店舗名・電話番号・番地 がすべて同じ場合に同じ店舗とみなす（チェーン店は電話番号が
+--    同じでも番地が異なるため残る）。店舗名が空の行（取得に失敗した行）はそのまま残す。
+--    001 で各列を NOT NULL（空文字）にそろえているため、= で比較できる。
+DELETE older FROM ex2_2 AS older
+    JOIN ex2_2 AS newer
+        ON older.`店舗名` = newer.`店舗名`
+        AND older.`電話番号` = newer.`電話番号`
+        AND older.`番地` = newer.`番地`
+        AND older.ID < newer.ID
+    WHERE older.`店舗URL` IS NULL AND newer.`店舗URL` IS NULL AND older.`店舗名` <> '';
+
+-- 2. 履歴テーブルを作成（mysql-init.sql と同じ定義）
+CREATE TABLE IF NOT EXISTS ex2_2_history (
+    ID BIGINT UNSIGNED AUTO_INCREMENT,
+    `店舗URL` VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
+    `取得日` DATE NOT NULL,
+    `取得日時` DATETIME NOT NULL,
+    `変更種別` ENUM('new', 'update') NOT NULL,
+    `変更内容` JSON NOT NULL,
+    PRIMARY KEY (ID, `取得日`),
+    KEY idx_store_time (`店舗URL`, `取得日時`)
+) ENGINE=InnoDB DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+PARTITION BY RANGE COLUMNS (`取得日`) (
+    PARTITION p00000000 VALUES LESS THAN ('2025-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
@@ -0,0 +1,15 @@
+-- テーブルごとの更新番号 table_versions を追加する
+-- 実行方法: mysql -u user -p ex2 < migrations/003_table_versions.sql
+--
+-- ex2_2 に書き込む処理（write_behind / backfill / revalidate）が更新番号を進め、
+-- 読み取り用の API（python3 -m gnavi_scraper serve）は更新番号が変わったら結果のキャッシュを捨てる。
+-- このテーブルがない場合、書き込む処理は更新番号を記録せず、API はキャッシュの有効期限だけで更新する。
+
+SET NAMES utf8mb4;
+USE ex2;
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(64) CHARACTER SET ascii COLLATE ascii_bin PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
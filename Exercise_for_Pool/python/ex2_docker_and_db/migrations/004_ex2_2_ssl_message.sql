@@ -0,0 +1,12 @@
+-- ex2_2 に SSL確認 列を追加する
+-- 実行方法: mysql -u user -p ex2 < migrations/004_ex2_2_ssl_message.sql
+--
+-- SSL確認 には SSL 証明書の確認結果のメッセージ（'SSL Available' など）と、サーキットブレーカーで
+-- 店舗公式サイトに接続しなかった理由（'URL Circuit Open (Conn Timeout)' など）を記録する。
+-- この列がないテーブルには、書き込む処理（write_behind）は SSL確認 を書き込まない。
+
+SET NAMES utf8mb4;
+USE ex2;
+
+ALTER TABLE ex2_2
+    ADD COLUMN `SSL確認` VARCHAR(255) NOT NULL DEFAULT '' AFTER `SSL`;
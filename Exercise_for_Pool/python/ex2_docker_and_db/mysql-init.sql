@@ -19,15 +19,57 @@ CREATE DATABASE IF NOT EXISTS ex2
 USE ex2;
 
 -- ex2_2 テーブルを作成（主キーとして ID を追加）
+--   - 店舗URL: ぐるなびの店舗ページ URL。同じ店舗の重複登録を防ぐため一意にする（ASCII のみ）
+--   - 都道府県 / 市区町村: 地域での絞り込み用に複合インデックスを作成する
+--   - SSL: SSL 非対応の店舗を地域ごとに探せるよう、都道府県・市区町村と組み合わせる
+--   - SSL確認: SSL 証明書の確認結果、またはサーキットブレーカーで接続しなかった理由
+--   - 電話番号: 重複確認用のインデックス（チェーン店で重複しうるため一意にはしない）
+--   - 取得日時: 最後に取得した日時（scrape の書き込みでは内容が同じでも書き換える）
 CREATE TABLE IF NOT EXISTS ex2_2 (
-    ID BIGINT AUTO_INCREMENT PRIMARY KEY,
-    `店舗名` VARCHAR(255),
-    `電話番号` VARCHAR(30),
-    `メールアドレス` VARCHAR(255),
-    `都道府県` VARCHAR(255),
-    `市区町村` VARCHAR(255),
-    `番地` VARCHAR(255),
-    `建物名` VARCHAR(255),
-    `URL` VARCHAR(255),
-    `SSL` TINYINT(1) DEFAULT 0
-) DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
\ No newline at end of file
+    ID BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    `店舗URL` VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin,
+    `店舗名` VARCHAR(255) NOT NULL DEFAULT '',
+    `電話番号` VARCHAR(32) NOT NULL DEFAULT '',
+    `メールアドレス` VARCHAR(254) NOT NULL DEFAULT '',
+    `都道府県` VARCHAR(4) NOT NULL DEFAULT '',
+    `市区町村` VARCHAR(64) NOT NULL DEFAULT '',
+    `番地` VARCHAR(255) NOT NULL DEFAULT '',
+    `建物名` VARCHAR(255) NOT NULL DEFAULT '',
+    `URL` VARCHAR(512),
+    `SSL` TINYINT(1) NOT NULL DEFAULT 0,
+    `SSL確認` VARCHAR(255) NOT NULL DEFAULT '',
+    `取得日時` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_store_url (`店舗URL`),
+    KEY idx_pref_city (`都道府県`, `市区町村`),
+    KEY idx_ssl_pref_city (`SSL`, `都道府県`, `市区町村`),
+    KEY idx_phone (`電話番号`)
+) ENGINE=InnoDB DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
+-- ex2_2_history テーブルを作成（ex2_2 の変更履歴）
+--   - ex2_2 は店舗URLごとに最新の 1 行を持ち、変更された項目だけをここに記録する
+--   - 取得日で日次のパーティションに分割する（gnavi_scraper/history.py が先の日付のパーティションを作成し、
+--     古いパーティションを DROP PARTITION で削除する）
+--   - 変更内容: 変更された項目 {列名: 新しい値} の JSON
+CREATE TABLE IF NOT EXISTS ex2_2_history (
+    ID BIGINT UNSIGNED AUTO_INCREMENT,
+    `店舗URL` VARCHAR(255) CHARACTER SET ascii COLLATE ascii_bin NOT NULL,
+    `取得日` DATE NOT NULL,
+    `取得日時` DATETIME NOT NULL,
+    `変更種別` ENUM('new', 'update') NOT NULL,
+    `変更内容` JSON NOT NULL,
+    PRIMARY KEY (ID, `取得日`),
+    KEY idx_store_time (`店舗URL`, `取得日時`)
+) ENGINE=InnoDB DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+PARTITION BY RANGE COLUMNS (`取得日`) (
+    PARTITION p00000000 VALUES LESS THAN ('2025-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- table_versions テーブルを作成（テーブルごとの更新番号）
+--   - ex2_2 に書き込む処理が書き込みと同じトランザクションで version を進める
+--   - 読み取り用の API（gnavi_scraper/query_service.py）は version が変わったら結果のキャッシュを捨てる
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(64) CHARACTER SET ascii COLLATE ascii_bin PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
\ No newline at end of file
@@ -0,0 +1,32 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ぐるなび店舗情報収集パッケージ
+
+1-1.py / 1-2.py / 2-2.py で共通に使用する処理をまとめたパッケージです。
+
+- extract: 取得方法に依存しない、HTML からの店舗情報の抽出
+- official_site: 店舗公式URLのリダイレクト先と SSL 証明書の確認
+- circuit_breaker: 接続できない店舗公式サイトへの接続を止めるサーキットブレーカー（状態は次回に引き継ぐ）
+- backends: ページ取得のバックエンド（requests / Selenium）
+- links: 検索結果ページからの店舗URLの遅延取得
+- discovery: サイトマップ・検索結果ページから集めた店舗URLのインデックス（範囲を選んで直接取得する）
+- selector_health: クラス名の変更の検知（代替セレクタへの切り替えと早期の中断）
+- pipeline: 店舗ページの取得から出力までの処理
+- hedging: テールレイテンシの抑制（ヘッジリクエストと処理ごとの期限）
+- scheduler: 時間枠付きの取得（新しい店舗・古い店舗の順の優先順位と、期限での打ち切り）
+- sinks: 出力先（CSV / MySQL / 標準出力への NDJSON）
+- column_buffer: 店舗情報を列ごとに溜めるバッファ（dict のリストを作らずに CSV / pandas / Arrow へ書き出す）
+- archive / reextract: 店舗ページのアーカイブと、そこからの再抽出
+- revalidate: 既存の CSV / ex2_2 の公式URLと SSL 対応状況だけの再確認
+- backfill: 既存の CSV から ex2_2 へのチャンク単位の並列読み込み
+- query_service: ex2_2 の読み取り用 API（キーセットページネーションと、更新番号で無効化する結果のキャッシュ）
+- loadgen: ぐるなびに似た合成サイト（負荷試験用。遅延・エラー・接続できないホストの注入）
+- normalize: 電話番号・URL・住所などの列単位の正規化（pandas を使用）
+- cli: コマンドライン（`python3 -m gnavi_scraper`）
+- profiling: 取得処理のプロファイリング（cProfile とフレームグラフ用のサンプリング）
+- metrics: 進捗・処理速度の計測と、状態確認用の HTTP エンドポイント（/status, /metrics）
+
+Selenium・SQLAlchemy は、それを使う処理が呼ばれたときに初めて読み込みます。
+CSV の出力に pandas は使用しません（正規化を行う場合だけ読み込みます）。
+
+"""
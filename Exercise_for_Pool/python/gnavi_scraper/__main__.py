@@ -0,0 +1,7 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""`python3 -m gnavi_scraper` の入口（サブコマンドは cli を参照）"""
+from .cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗ページの生HTMLアーカイブ
+
+取得した店舗ページのHTMLを圧縮して保存し、後からネットワークに接続せずに
+抽出処理をやり直せるようにします。
+
+保存形式:
+    <root>/objects/<ハッシュ先頭2文字>/<SHA-256>.<拡張子>  圧縮済みのHTML本体
+    <root>/index.jsonl                                     URL → ハッシュの索引（1行1レコード）
+
+同じ内容のページはハッシュが一致するため、1 度だけ保存されます（重複排除）。
+
+"""
+import gzip                         # 標準の圧縮形式 (gzip)
+import hashlib                      # 内容のハッシュ値（SHA-256）を計算する
+import json                         # 索引の読み書き
+import os                           # パス操作
+import threading                    # 索引への追記を排他制御する
+import time                         # 取得日時の記録
+
+# zstd / Brotli は追加ライブラリがインストールされている場合のみ使用する
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 圧縮形式ごとのファイル拡張子
+CODEC_EXTENSIONS = {
+    'gzip': 'gz',
+    'zstd': 'zst',
+    'brotli': 'br',
+}
+
+def compress(data, codec):
+    """指定された形式でバイト列を圧縮する。
+
+    Args:
+        data (bytes): 圧縮するデータ。
+        codec (str): 圧縮形式 ('gzip', 'zstd', 'brotli')。
+
+    Returns:
+        bytes: 圧縮後のデータ。
+
+    Raises:
+        ValueError: 未対応、またはライブラリが未インストールの圧縮形式の場合。
+    """
+    if codec == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    if codec == 'zstd' and zstandard:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    if codec == 'brotli' and brotli:
+        return brotli.compress(data, quality=9)
+    raise ValueError(f"Unsupported codec: {codec}")
+
+def decompress(data, codec):
+    """`compress` で圧縮したバイト列を展開する。
+
+    Args:
+        data (bytes): 圧縮済みのデータ。
+        codec (str): 圧縮形式 ('gzip', 'zstd', 'brotli')。
+
+    Returns:
+        bytes: 展開後のデータ。
+
+    Raises:
+        ValueError: 未対応、またはライブラリが未インストールの圧縮形式の場合。
+    """
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    if codec == 'zstd' and zstandard:
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'brotli' and brotli:
+        return brotli.decompress(data)
+    raise ValueError(f"Unsupported codec: {codec}")
+
+class PageArchive:
+    """店舗ページの生HTMLを圧縮・重複排除して保存するアーカイブ。
+
+    Args:
+        root_dir (str): アーカイブの保存先ディレクトリ（存在しなければ作成する）。
+        codec (str): 新しく保存するページの圧縮形式 ('gzip', 'zstd', 'brotli')。
+
+    Notes:
+        - 索引は追記のみで更新し、同じ URL のレコードが複数ある場合は最後のものを有効とする。
+        - 1 つのアーカイブを複数スレッドから同時に使用できる。
+    """
+
+    def __init__(self, root_dir, codec='gzip'):
+        if codec not in CODEC_EXTENSIONS:
+            raise ValueError(f"Unsupported codec: {codec}")
+        self.root_dir = root_dir
+        self.codec = codec
+        self.index_path = os.path.join(root_dir, 'index.jsonl')
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root_dir, 'objects'), exist_ok=True)
+
+    def _blob_path(self, digest, codec):
+        """ハッシュ値と圧縮形式から、本体ファイルのパスを返す。"""
+        ext = CODEC_EXTENSIONS[codec]
+        return os.path.join(self.root_dir, 'objects', digest[:2], f"{digest}.{ext}")
+
+    def put(self, url, content, **fields):
+        """ページを保存し、索引に URL を登録する。
+
+        Args:
+            url (str): 店舗ページの URL。
+            content (bytes or str): ページの生HTML。
+            **fields: 索引に一緒に記録する値（取得時の URL・SSL の判定結果など）。
+
+        Returns:
+            str: 保存したページの SHA-256 ハッシュ値。
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+
+        # 同じ内容が保存済みでなければ本体を書き込む（一時ファイル経由で置き換え）
+        blob_path = self._blob_path(digest, self.codec)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(compress(content, self.codec))
+            os.replace(tmp_path, blob_path)
+
+        record = {
+            'url': url,
+            'sha256': digest,
+            'codec': self.codec,
+            'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        record.update(fields)
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        return digest
+
+    def records(self):
+        """URL ごとに最新の索引レコードを返す。
+
+        Returns:
+            list: 索引レコード (dict) のリスト。URL が最初に登録された順に並ぶ。
+        """
+        latest = {}
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    latest[record['url']] = record
+        return list(latest.values())
+
+    def read(self, record):
+        """索引レコードに対応するページの生HTMLを返す。
+
+        Args:
+            record (dict): `records` が返した索引レコード。
+
+        Returns:
+            bytes: 展開済みのHTML。
+        """
+        with open(self._blob_path(record['sha256'], record['codec']), 'rb') as f:
+            return decompress(f.read(), record['codec'])
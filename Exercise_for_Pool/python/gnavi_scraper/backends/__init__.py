@@ -0,0 +1,36 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ページ取得のバックエンド
+
+- 'requests': requests で HTML を取得する（軽量、並列取得が可能）。
+- 'selenium': Chrome で描画後の HTML を取得する（JavaScript が必要なページ向け）。
+
+使用するバックエンドのモジュールだけを読み込むため、requests バックエンドでは
+Selenium や webdriver_manager は読み込まれません。
+
+"""
+import importlib                        # バックエンドのモジュールを必要になってから読み込む
+
+# バックエンド名 → (モジュール名, クラス名)
+BACKENDS = {
+    'requests': ('.requests_backend', 'RequestsFetcher'),
+    'selenium': ('.selenium_backend', 'SeleniumFetcher'),
+}
+
+def load_backend(name):
+    """バックエンド名から、ページ取得クラスを読み込んで返す。
+
+    Args:
+        name (str): バックエンド名 ('requests', 'selenium')。
+
+    Returns:
+        type: ページ取得クラス。
+
+    Raises:
+        ValueError: 未知のバックエンド名の場合。
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    module_name, class_name = BACKENDS[name]
+    module = importlib.import_module(module_name, __name__)
+    return getattr(module, class_name)
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""requests によるページ取得"""
+import requests                         # HTTPリクエストを送信する
+
+# HTTPリクエスト時のヘッダー情報（ぐるなび側のブロックを防ぐためにUser-Agentを指定）
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+}
+
+class RequestsFetcher:
+    """requests でページの HTML を取得するバックエンド。
+
+    Args:
+        timeout (float or None): リクエストのタイムアウト（秒）。
+
+    Notes:
+        - 接続を使い回すため `requests.Session` を使用する。
+        - 複数のスレッドから同時に `fetch` を呼び出せる（`concurrent` が True）。
+    """
+
+    # 複数スレッドから同時に使用できるか
+    concurrent = True
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def fetch(self, url, wait_for=None):
+        """ページの HTML を取得する。
+
+        Args:
+            url (str): 取得するページの URL。
+            wait_for (str or None): Selenium バックエンドとの互換用（使用しない）。
+
+        Returns:
+            bytes or None: ページの HTML。取得に失敗した場合は None。
+        """
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            # ネットワークエラー時の処理
+            print(f"Request error: {e}")
+            return None
+
+        if response.status_code != 200:
+            print(f"Page loading failed: {url} ({response.status_code})")
+            return None
+        return response.content
+
+    def close(self):
+        """セッションを閉じる。"""
+        self.session.close()
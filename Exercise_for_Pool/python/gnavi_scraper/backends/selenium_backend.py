@@ -0,0 +1,416 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Selenium（Chrome）によるページ取得
+
+`tabs` に 2 以上を指定すると、1 つの Chrome の複数のタブでページを並行して読み込みます
+（`TabPool`）。Chrome をワーカーの数だけ起動するより、少ないメモリで並列取得の効果の大部分が得られます。
+
+`capture='cdp'` を指定すると、描画の完了を待たず、Chrome DevTools Protocol でページの HTML
+（サーバーの応答そのもの）が届いた時点で取得し、残りの読み込みを止めます（`capture_document`）。
+Chrome のセッションと Cookie はそのまま使われます。
+
+"""
+import base64                                                       # CDP で取得した応答本文のデコード
+import functools                                                    # タブ用のオプションを付けた WebDriver の作成
+import json                                                         # パフォーマンスログの解析
+import queue                                                        # タブへの取得要求の受け渡し
+import threading                                                    # タブを操作するスレッド
+import time                                                         # リトライ前の待機、読み込みの経過時間
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError   # 取得要求の結果
+from selenium import webdriver                                      # Selenium WebDriverをインポート
+from selenium.common.exceptions import TimeoutException, WebDriverException   # ページ読み込みのタイムアウト、操作の失敗
+from selenium.webdriver.common.by import By                         # WebElementを指定するためのByをインポート
+from selenium.webdriver.support import expected_conditions as EC    # 特定の条件が満たされるのを待つためのモジュール
+from selenium.webdriver.support.ui import WebDriverWait             # WebDriverの待機処理を提供するモジュール
+from selenium.webdriver.chrome.service import Service               # ChromeDriverのサービスをインポート
+from webdriver_manager.chrome import ChromeDriverManager            # ChromeDriverの自動インストール
+from ..extract import parse_html                                    # CDP で取得した HTML の要素の確認
+from ..managed_driver import ManagedDriver                          # メモリ上限付きの WebDriver 管理
+from ..metrics import METRICS                                       # タブの使用状況の公開
+
+# 複数のタブで並行して読み込むときのオプション（裏にあるタブの読み込み・タイマーを遅らせない）
+TAB_ARGUMENTS = [
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+]
+
+# タブでページの読み込みを始めるスクリプト（読み込みを待たずに戻る）。
+# 古いページに目印を付けておき、新しいページに切り替わる前の readyState を読み込み完了と誤らないようにする。
+NAVIGATE_SCRIPT = "window.__gnaviStale = true; window.location.href = arguments[0];"
+# タブの読み込み状態を返すスクリプト（'loading', 'error', 'waiting', 'ready'）
+READY_SCRIPT = """
+if (window.__gnaviStale || document.readyState !== 'complete') { return 'loading'; }
+if (document.documentURI.indexOf('chrome-error://') === 0) { return 'error'; }
+if (arguments[0] && !document.querySelector(arguments[0])) { return 'waiting'; }
+return 'ready';
+"""
+
+# 取得方法（'render': 描画の完了を待つ、'cdp': HTML の応答が届いた時点で取得する）
+CAPTURE_MODES = ('render', 'cdp')
+
+def set_webdriver(extra_arguments=(), cdp_capture=False):
+    """Selenium 用の Chrome WebDriver を設定して返す。
+
+    Args:
+        extra_arguments (iterable): 追加する Chrome のコマンドライン引数（例: `TAB_ARGUMENTS`）。
+        cdp_capture (bool): True の場合、`capture_document` 用に設定する
+            （`get` が読み込みを待たずに戻り、ネットワークのイベントをパフォーマンスログに記録する）。
+
+    Returns:
+        selenium.webdriver.Chrome: 設定済みの Chrome WebDriver インスタンス。
+
+    Notes:
+        - Docker 環境で動作するように、適切なオプションを追加。
+    """
+    service = Service(ChromeDriverManager().install())
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    for argument in extra_arguments:
+        options.add_argument(argument)
+    if cdp_capture:
+        options.page_load_strategy = 'none'
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    driver = webdriver.Chrome(service=service, options=options)
+    if cdp_capture:
+        driver.execute_cdp_cmd('Network.enable', {})    # Network.getResponseBody を使えるようにする
+    return driver
+
+def capture_document(driver, url, timeout=30, poll_interval=0.05):
+    """ページを開き、HTML の応答が届いた時点でその本文を返す（描画・画像・JavaScript の完了は待たない）。
+
+    Args:
+        driver (ManagedDriver): `set_webdriver(cdp_capture=True)` で作成したブラウザ。
+        url (str): 取得するページの URL。
+        timeout (float): HTML の応答を待つ最大秒数。
+        poll_interval (float): パフォーマンスログを確認する間隔（秒）。
+
+    Returns:
+        str or None: ページの HTML。取得に失敗した場合、ステータスが 200 以外の場合、
+            またはタイムアウトした場合は None。
+
+    Notes:
+        - 最初に送られた Document のリクエスト（リダイレクト後の応答を含む）をページの HTML とする。
+        - 本文を受け取り終えたら `window.stop()` で画像などの残りの読み込みを止める。
+    """
+    driver.get_log('performance')       # 前のページのイベントを捨てる
+    driver.get(url)
+    request_id, status = None, None
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for entry in driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            method, params = message.get('method'), message.get('params', {})
+            if method == 'Network.requestWillBeSent' and request_id is None and params.get('type') == 'Document':
+                request_id = params['requestId']
+            elif params.get('requestId') != request_id or request_id is None:
+                continue
+            elif method == 'Network.responseReceived':
+                status = params['response']['status']
+            elif method == 'Network.loadingFailed':
+                print(f"Page loading failed: {url} ({params.get('errorText')})")
+                return None
+            elif method == 'Network.loadingFinished':
+                driver.execute_script('window.stop();')
+                if status != 200:
+                    print(f"Page loading failed: {url} ({status})")
+                    return None
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                if body.get('base64Encoded'):
+                    return base64.b64decode(body['body']).decode('utf-8', 'ignore')
+                return body['body']
+        time.sleep(poll_interval)
+    print(f"Timeout occurred while trying to access {url}.")
+    driver.execute_script('window.stop();')
+    return None
+
+def get_rs_page(driver, rs_url, max_retries=5, retry_delay=5):
+    """ページを開く（リトライ機能付き）。
+
+    Args:
+        driver (selenium.webdriver.Chrome): SeleniumのWebDriverインスタンス
+        rs_url (str): 取得するURL
+        max_retries (int): 最大リトライ回数（デフォルト: 5)
+        retry_delay (int): リトライ間隔（秒）（デフォルト: 5秒)
+
+    Returns:
+        bool: ページを開けた場合は True、最大リトライ回数を超えた場合は False。
+    """
+    for attempt in range(1, max_retries + 1):
+        try:
+            driver.get(rs_url)
+            return True
+        except TimeoutException:
+            print(f"Timeout occurred while trying to access {rs_url}. Attempt {attempt}/{max_retries}.")
+            if attempt < max_retries:
+                print(f"Retrying in {retry_delay} seconds...")
+                time.sleep(retry_delay)     # リトライ前に指定秒数だけ待機
+
+    print(f"Max retries reached. Could not access {rs_url}.")
+    return False
+
+class _Tab:
+    """タブ 1 つの状態（読み込み中の要求と、その経過時間）。"""
+
+    def __init__(self, handle):
+        self.handle = handle        # WebDriver のウィンドウハンドル
+        self.request = None         # 読み込み中の (URL, wait_for, Future)。空いていれば None
+        self.started_at = 0.0       # 読み込みを始めた時刻
+        self.loaded_at = None       # 読み込みが完了した時刻（wait_for の要素を待っている間）
+
+class TabPool:
+    """1 つのブラウザの複数のタブで、ページを並行して読み込む。
+
+    Args:
+        driver (ManagedDriver): ブラウザ。
+        size (int): タブの数。
+        wait_timeout (float): 読み込み完了後、`wait_for` の要素が現れるまで待つ最大秒数。
+        load_timeout (float): ページの読み込みを待つ最大秒数。
+        poll_interval (float): 読み込み中のタブを確認する間隔（秒）。
+
+    Notes:
+        - WebDriver のコマンドは 1 つのスレッド（ディスパッチャ）だけが送る。`fetch` は複数のスレッドから
+          呼び出せ、要求をキューに入れて結果を待つ。
+        - 空いたタブに順番に（ラウンドロビンで）要求を割り当ててスクリプトで読み込みを始め、
+          読み込み中のタブを順に確認して、完了したタブから HTML を返す。
+        - `ManagedDriver.check_every` 件ごとに、すべてのタブが空くのを待ってメモリ使用量を確認し、
+          上限を超えていればブラウザを再起動してタブを開き直す。
+    """
+
+    def __init__(self, driver, size=4, wait_timeout=10, load_timeout=30, poll_interval=0.05):
+        self.driver = driver
+        self.size = size
+        self.wait_timeout = wait_timeout
+        self.load_timeout = load_timeout
+        self.poll_interval = poll_interval
+        self.tabs = []
+        self._next = 0                      # 次に要求を割り当てるタブ
+        self._memory_check = False          # タブが空いたらメモリ使用量を確認する
+        self._requests = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='tab-dispatcher', daemon=True)
+        METRICS.gauge_function('gnavi_tabs_busy', lambda: sum(1 for tab in self.tabs if tab.request))
+        METRICS.gauge_function('gnavi_tabs_queued', self._requests.qsize)
+
+    def start(self):
+        """タブを開き、ディスパッチャを開始する。"""
+        self._open_tabs()
+        self._thread.start()
+
+    def close(self):
+        """ディスパッチャを止める。読み込み中・待機中の要求は None を返す。"""
+        self._stop.set()
+        self._requests.put(None)
+        self._thread.join()
+
+    def fetch(self, url, wait_for=None):
+        """ページを空いたタブで読み込み、描画後の HTML を返す。
+
+        Args:
+            url (str): 取得するページの URL。
+            wait_for (str or None): 指定した場合、この CSS セレクタの要素が現れるまで待つ。
+
+        Returns:
+            str or None: ページの HTML。ページを開けなかった場合は None。
+        """
+        if self._stop.is_set():
+            return None
+        future = Future()
+        self._requests.put((url, wait_for, future))
+        while True:
+            try:
+                return future.result(timeout=1.0)
+            except FuturesTimeoutError:
+                if not self._thread.is_alive() and not future.done():
+                    return None     # ディスパッチャが止まった後に入れた要求
+
+    def _open_tabs(self):
+        """タブを `size` 個になるまで開く。"""
+        while len(self.driver.window_handles) < self.size:
+            self.driver.switch_to.new_window('tab')
+        self.tabs = [_Tab(handle) for handle in self.driver.window_handles[:self.size]]
+        self._next = 0
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                busy = [tab for tab in self.tabs if tab.request]
+                if not busy and self._memory_check:
+                    self._memory_check = False
+                    if self.driver.check_memory():
+                        self._open_tabs()
+                if not self._memory_check:
+                    self._assign(block=not busy)
+                for tab in self.tabs:
+                    if tab.request:
+                        self._poll(tab)
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            # ブラウザを開き直せないなど、タブを操作できなくなった場合は以降の要求をすべて失敗させる
+            print(f"Tab dispatcher stopped: {e}")
+            self._stop.set()
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """読み込み中・待機中の要求に None を返す。"""
+        for tab in self.tabs:
+            if tab.request:
+                self._finish(tab, None)
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if request:
+                request[2].set_result(None)
+
+    def _assign(self, block):
+        """空いたタブに、キューの要求をラウンドロビンで割り当てる。
+
+        Args:
+            block (bool): True の場合、要求が来るまで待つ（すべてのタブが空いているとき）。
+        """
+        for offset in range(len(self.tabs)):
+            tab = self.tabs[(self._next + offset) % len(self.tabs)]
+            if tab.request:
+                continue
+            try:
+                request = self._requests.get(timeout=1.0) if block else self._requests.get_nowait()
+            except queue.Empty:
+                return
+            if request is None:         # close による終了
+                return
+            block = False
+            self._navigate(tab, request)
+            self._next = (self.tabs.index(tab) + 1) % len(self.tabs)
+
+    def _navigate(self, tab, request):
+        """タブでページの読み込みを始める。"""
+        tab.request, tab.started_at, tab.loaded_at = request, time.monotonic(), None
+        self.driver.get_count += 1
+        if self.driver.get_count % self.driver.check_every == 0:
+            self._memory_check = True
+        try:
+            self.driver.switch_to.window(tab.handle)
+            self.driver.execute_script(NAVIGATE_SCRIPT, request[0])
+        except WebDriverException as e:
+            print(f"Failed to open {request[0]}: {e.msg}")
+            self._finish(tab, None)
+
+    def _poll(self, tab):
+        """タブの読み込み状態を確認し、完了していれば HTML を返す。"""
+        url, wait_for, _ = tab.request
+        now = time.monotonic()
+        try:
+            self.driver.switch_to.window(tab.handle)
+            state = self.driver.execute_script(READY_SCRIPT, wait_for)
+            if state == 'ready':
+                self._finish(tab, self.driver.page_source)
+            elif state == 'error':
+                print(f"Page loading failed: {url}")
+                self._finish(tab, None)
+            elif state == 'waiting':
+                tab.loaded_at = tab.loaded_at or now
+                if now - tab.loaded_at > self.wait_timeout:
+                    print(f"Timeout waiting for '{wait_for}' on {url}")
+                    self._finish(tab, self.driver.page_source)
+            elif now - tab.started_at > self.load_timeout:
+                print(f"Timeout occurred while trying to access {url}.")
+                self.driver.execute_script("window.stop();")
+                self._finish(tab, None)
+        except WebDriverException as e:
+            print(f"Tab error on {url}: {e.msg}")
+            self._finish(tab, None)
+
+    def _finish(self, tab, html):
+        """タブの要求に結果を返し、タブを空ける。"""
+        future = tab.request[2]
+        tab.request = None
+        METRICS.observe('gnavi_tab_load_seconds', time.monotonic() - tab.started_at)
+        future.set_result(html)
+
+class SeleniumFetcher:
+    """Chrome で描画したページの HTML を取得するバックエンド。
+
+    Args:
+        max_rss_mb (int): Chrome と chromedriver の RSS 合計の上限（MB）。
+        wait_timeout (float): `wait_for` の要素が現れるまで待つ最大秒数。
+        tabs (int): ページを並行して読み込むタブの数（1 の場合は 1 ページずつ読み込む）。
+        capture (str): 'render' の場合は描画の完了を待って HTML を取得する。'cdp' の場合は HTML の応答が
+            届いた時点で取得する（`capture_document`）。
+
+    Raises:
+        ValueError: 'cdp' と複数のタブを同時に指定した場合（パフォーマンスログはタブを区別しないため）。
+
+    Notes:
+        - ブラウザは `ManagedDriver` で管理し、メモリ上限を超えたら再起動する。
+        - `with` 文で使用すると、例外やシグナルで終了した場合もブラウザを閉じる。
+        - `tabs` が 1 の場合は 1 つのタブを共有するため、複数スレッドからは使用できない（`concurrent` が False）。
+          2 以上の場合は `TabPool` が要求を各タブに振り分けるため、複数スレッドから使用できる。
+        - 'cdp' で取得した HTML に `wait_for` の要素がない場合（JavaScript で描画されるページ）は、
+          そのページだけ描画の完了を待って取得し直す。
+    """
+
+    # 複数スレッドから同時に使用できるか（tabs が 2 以上の場合はインスタンスで True にする）
+    concurrent = False
+
+    def __init__(self, max_rss_mb=1024, wait_timeout=10, tabs=1, capture='render'):
+        if capture not in CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode: {capture}")
+        if capture == 'cdp' and tabs > 1:
+            raise ValueError("capture='cdp' cannot be combined with multiple tabs")
+        factory = functools.partial(set_webdriver, TAB_ARGUMENTS if tabs > 1 else (), capture == 'cdp')
+        self.driver = ManagedDriver(factory, max_rss_mb=max_rss_mb)
+        self.wait_timeout = wait_timeout
+        self.capture = capture
+        self.tab_pool = TabPool(self.driver, tabs, wait_timeout) if tabs > 1 else None
+        self.concurrent = self.tab_pool is not None
+
+    def __enter__(self):
+        self.driver.__enter__()
+        if self.tab_pool:
+            self.tab_pool.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.tab_pool:
+            self.tab_pool.close()
+        return self.driver.__exit__(exc_type, exc, tb)
+
+    def fetch(self, url, wait_for=None):
+        """ページを開き、描画後の HTML を取得する。
+
+        Args:
+            url (str): 取得するページの URL。
+            wait_for (str or None): 指定した場合、この CSS セレクタの要素が現れるまで待つ。
+
+        Returns:
+            str or None: ページの HTML。ページを開けなかった場合は None。
+        """
+        if self.tab_pool:
+            return self.tab_pool.fetch(url, wait_for)
+        if self.capture == 'cdp':
+            html = capture_document(self.driver, url)
+            if html is None or not wait_for or parse_html(html).select_one(wait_for) is not None:
+                return html
+            print(f"'{wait_for}' is not in the HTML of {url}. Waiting for rendering...")
+        if not get_rs_page(self.driver, url):
+            return None
+
+        if wait_for:
+            try:
+                WebDriverWait(self.driver, self.wait_timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, wait_for)))
+            except TimeoutException:
+                print(f"Timeout waiting for '{wait_for}' on {url}")
+
+        return self.driver.page_source
+
+    def close(self):
+        """ブラウザを閉じる。"""
+        self.driver.quit()
@@ -0,0 +1,336 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""既存の CSV から ex2_2 への一括読み込み（バックフィル）
+
+1-1.csv / 1-2.csv と同じ形式の CSV（UTF-8 BOM 付き、日本語の見出し）を、
+ファイル全体をメモリに読み込まずに一定行数のチャンクに分け、複数の接続で並列に
+ex2_2 へ書き込みます。
+
+- 見出しを ex2_2 の列に対応付ける（`HEADER_ALIASES` と `--map 旧名=列名`）。
+  対応しない列は読み込まない。
+- SSL は 'True' / 'False'（pandas の出力）や '1' / '0' を TINYINT の 1 / 0 に変換する。
+- チャンクごとに 1 回の複数行 INSERT ... ON DUPLICATE KEY UPDATE（店舗URLが同じ行は上書き）で書き込む。
+- 読み込みの前に一意でないインデックスを削除し、読み込み後にまとめて作り直す
+  （InnoDB には ALTER TABLE ... DISABLE KEYS がないため。行ごとにインデックスを更新するより速い）。
+  主キーと一意キー（店舗URL）は、重複の判定に必要なため残す。
+
+変更履歴（ex2_2_history）は記録しません（既存の出力の取り込みのため）。
+店舗URLの列がない CSV（1-1.csv など）は重複を判定できないため、同じファイルを 2 回読み込むと行が重複します。
+
+実行方法:
+    python3 -m gnavi_scraper backfill ex1_web-scraping/1-1.csv ex1_web-scraping/1-2.csv -j 4
+    python3 -m gnavi_scraper backfill exports/*.csv --chunk-size 10000 --map 'ぐるなびURL=店舗URL'
+
+"""
+import argparse                                     # コマンドライン引数の解析
+import csv                                          # CSV の読み込み
+import time                                         # 処理速度の計測
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED   # チャンクの並列書き込み
+from .extract import ROW_COLUMNS
+from .metrics import METRICS
+
+# 見出しの別名 → ex2_2 の列名（ROW_COLUMNS と同じ見出しはそのまま対応付ける）
+HEADER_ALIASES = {
+    'ぐるなびURL': '店舗URL',
+    '店舗ページURL': '店舗URL',
+    '公式URL': 'URL',
+    'SSL対応': 'SSL',
+}
+# NULL の代わりに空文字を書き込む列（ex2_2 で NOT NULL DEFAULT '' の列）
+NOT_NULL_COLUMNS = ['店舗名', '電話番号', 'メールアドレス', '都道府県', '市区町村', '番地', '建物名']
+# SSL の値のうち、1（対応）とみなすもの
+SSL_TRUE_VALUES = {'true', '1', 'yes'}
+
+def map_headers(headers, aliases=None):
+    """CSV の見出しを ex2_2 の列名に対応付ける。
+
+    Args:
+        headers (list): CSV の見出し。
+        aliases (dict or None): `HEADER_ALIASES` に追加する別名（見出し → 列名）。
+
+    Returns:
+        list: (CSV の列番号, ex2_2 の列名) のリスト。対応しない見出しは含まない。
+
+    Raises:
+        ValueError: ex2_2 の列に対応する見出しが 1 つもない場合。
+    """
+    aliases = dict(HEADER_ALIASES, **(aliases or {}))
+    mapping = []
+    for position, header in enumerate(headers):
+        header = header.strip()
+        column = header if header in ROW_COLUMNS else aliases.get(header)
+        if column in ROW_COLUMNS and column not in [c for _, c in mapping]:
+            mapping.append((position, column))
+        else:
+            print(f"Ignored column: {header}")
+    if not mapping:
+        raise ValueError(f"No columns match {', '.join(ROW_COLUMNS)}")
+    return mapping
+
+def convert_value(column, value):
+    """CSV の値を ex2_2 の列に書き込む値に変換する。"""
+    if column == 'SSL':
+        return 1 if value.strip().lower() in SSL_TRUE_VALUES else 0
+    if column in NOT_NULL_COLUMNS:
+        return value
+    return value or None        # 店舗URL・URL の空文字は NULL
+
+def iter_chunks(file_name, chunk_size, aliases=None):
+    """CSV を一定行数ごとのチャンクに分けて読み込むジェネレータ。
+
+    Args:
+        file_name (str): CSV ファイル名（UTF-8。BOM があってもよい）。
+        chunk_size (int): 1 チャンクの行数。
+        aliases (dict or None): 見出しの別名（見出し → 列名）。
+
+    Yields:
+        tuple: (列名のリスト, 行のタプルのリスト)。
+
+    Raises:
+        ValueError: CSV が空（見出しの行がない）か、ex2_2 の列に対応する見出しがない場合。
+    """
+    with open(file_name, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if headers is None:
+            raise ValueError(f"{file_name} is empty (no header row)")
+        mapping = map_headers(headers, aliases)
+        columns = [column for _, column in mapping]
+        width = max(position for position, _ in mapping) + 1
+        chunk = []
+        for record in reader:
+            if not any(record):
+                continue        # 空行
+            if len(record) < width:
+                record += [''] * (width - len(record))     # 末尾の列が欠けた行
+            chunk.append(tuple(convert_value(column, record[position]) for position, column in mapping))
+            if len(chunk) >= chunk_size:
+                yield columns, chunk
+                chunk = []
+        if chunk:
+            yield columns, chunk
+
+def upsert_sql(table_name, columns):
+    """複数行の INSERT ... ON DUPLICATE KEY UPDATE 文（プレースホルダ付き）を返す。
+
+    Notes:
+        - 新しい値は行の別名（`AS new_row`）で参照する（MySQL 8.0.20 以降で非推奨の VALUES() は使わない。
+          MySQL 8.0.19 以降が必要）。
+    """
+    names = ', '.join(f'`{column}`' for column in columns)
+    placeholders = ', '.join(['%s'] * len(columns))
+    updates = ', '.join(f'`{column}` = new_row.`{column}`' for column in columns if column != '店舗URL')
+    return (f"INSERT INTO {table_name} ({names}) VALUES ({placeholders}) AS new_row "
+            f"ON DUPLICATE KEY UPDATE {updates}")
+
+def secondary_indexes(conn, table_name):
+    """一意でないインデックスの定義を返す。
+
+    Args:
+        conn (sqlalchemy.engine.Connection): データベース接続。
+        table_name (str): テーブル名。
+
+    Returns:
+        dict: インデックス名 → 列の定義（'`列名`' または '`列名`(長さ)'）のリスト。
+    """
+    result = conn.exec_driver_sql(
+        "SELECT INDEX_NAME, COLUMN_NAME, SUB_PART FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 1 "
+        "ORDER BY INDEX_NAME, SEQ_IN_INDEX", (table_name,))
+    indexes = {}
+    for name, column, sub_part in result:
+        indexes.setdefault(name, []).append(f'`{column}`' + (f'({sub_part})' if sub_part else ''))
+    return indexes
+
+def drop_indexes(engine, table_name, indexes):
+    """インデックスを削除する。"""
+    if indexes:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {table_name} "
+                                 + ', '.join(f"DROP INDEX `{name}`" for name in indexes))
+        print(f"Dropped indexes: {', '.join(indexes)}")
+
+def rebuild_indexes(engine, table_name, indexes):
+    """削除したインデックスを 1 回の ALTER TABLE でまとめて作り直す。"""
+    if not indexes:
+        return
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE {table_name} "
+                             + ', '.join(f"ADD INDEX `{name}` ({', '.join(columns)})"
+                                         for name, columns in indexes.items())
+                             + ", ALGORITHM=INPLACE, LOCK=NONE")
+        conn.exec_driver_sql(f"ANALYZE TABLE {table_name}")
+    print(f"Rebuilt indexes in {time.perf_counter() - start:.1f}s: {', '.join(indexes)}")
+
+class Backfiller:
+    """CSV のチャンクを複数の接続で並列に書き込む。
+
+    Args:
+        engine (sqlalchemy.engine.Engine): 書き込み先のデータベースエンジン（接続数は `workers` 以上）。
+        table_name (str): 書き込み先のテーブル名。
+        workers (int): 並列に書き込む接続数。
+        max_retries (int): 1 チャンクあたりの最大リトライ回数（並列の書き込みによるデッドロックなど）。
+
+    Notes:
+        - 書き込み中のチャンクは `workers` の 2 倍までとし、CSV を必要以上に先読みしない
+          （ファイルの大きさに関係なく、メモリに載るのは高々 2 × workers チャンク）。
+        - リトライしても書き込めなかったチャンクは、ファイル名と行の範囲を表示して先に進む。
+    """
+
+    def __init__(self, engine, table_name='ex2_2', workers=4, max_retries=3):
+        self.engine = engine
+        self.table_name = table_name
+        self.workers = workers
+        self.max_retries = max_retries
+        self.written = 0        # 書き込んだ行数
+        self.failed = 0         # 書き込めなかった行数
+
+    def write_chunk(self, columns, rows):
+        """チャンクを 1 トランザクションで書き込む。失敗した場合はリトライする。
+
+        Returns:
+            bool: 書き込めた場合は True。
+        """
+        sql = upsert_sql(self.table_name, columns)
+        delay = 0.5
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                with self.engine.begin() as conn:
+                    conn.exec_driver_sql(sql, rows)
+                METRICS.inc('gnavi_backfill_rows_total', len(rows), table=self.table_name)
+                return True
+            except Exception as e:
+                print(f"Write failed ({attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(delay)
+                    delay *= 2
+        return False
+
+    def load(self, file_name, chunk_size=5000, aliases=None):
+        """CSV ファイルを読み込み、チャンクごとに並列に書き込む。
+
+        Args:
+            file_name (str): CSV ファイル名。
+            chunk_size (int): 1 チャンクの行数。
+            aliases (dict or None): 見出しの別名（見出し → 列名）。
+
+        Returns:
+            int: 書き込んだ行数。
+        """
+        start = time.perf_counter()
+        written = 0
+        first_line = 2          # チャンクの先頭行の行番号（見出しが 1 行目）
+        pending = {}            # Future → (先頭行の行番号, 行数)
+
+        def collect(done):
+            nonlocal written
+            for future in done:
+                line, count = pending.pop(future)
+                if future.result():
+                    written += count
+                else:
+                    self.failed += count
+                    print(f"Skipped {file_name} lines {line}-{line + count - 1}")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for columns, rows in iter_chunks(file_name, chunk_size, aliases):
+                pending[executor.submit(self.write_chunk, columns, rows)] = (first_line, len(rows))
+                first_line += len(rows)
+                if len(pending) >= self.workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(wait(pending)[0])
+
+        elapsed = time.perf_counter() - start
+        self.written += written
+        print(f"{file_name}: {written} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f} rows/s)")
+        return written
+
+def backfill(engine, file_names, table_name='ex2_2', workers=4, chunk_size=5000, aliases=None,
+             keep_indexes=False):
+    """CSV ファイルを順に ex2_2 へ読み込む。
+
+    Args:
+        engine (sqlalchemy.engine.Engine): 書き込み先のデータベースエンジン。
+        file_names (list): CSV ファイル名のリスト。
+        table_name (str): 書き込み先のテーブル名。
+        workers (int): 並列に書き込む接続数。
+        chunk_size (int): 1 チャンクの行数。
+        aliases (dict or None): 見出しの別名（見出し → 列名）。
+        keep_indexes (bool): True の場合、一意でないインデックスを削除せずに読み込む
+            （読み込み中もテーブルを検索に使う場合）。
+
+    Returns:
+        Backfiller: 書き込んだ行数・書き込めなかった行数を持つ。
+
+    Notes:
+        - 読み込みが途中で失敗しても、削除したインデックスは必ず作り直す。
+        - 読み込み後に更新番号（`db.VERSION_TABLE`）を 1 回だけ進める（チャンクごとに進めると、
+          並列の書き込みが更新番号の行のロックを待つため）。
+    """
+    from .db import has_version_table, bump_table_version     # 読み取り側のキャッシュの無効化
+
+    backfiller = Backfiller(engine, table_name, workers)
+    with engine.connect() as conn:
+        indexes = {} if keep_indexes else secondary_indexes(conn, table_name)
+    drop_indexes(engine, table_name, indexes)
+    start = time.perf_counter()
+    try:
+        for file_name in file_names:
+            backfiller.load(file_name, chunk_size, aliases)
+    finally:
+        rebuild_indexes(engine, table_name, indexes)
+        with engine.begin() as conn:
+            if has_version_table(conn):
+                bump_table_version(conn, table_name)
+    elapsed = time.perf_counter() - start
+    print(f"Backfilled {backfiller.written} rows into {table_name} in {elapsed:.1f}s "
+          f"({backfiller.written / max(elapsed, 1e-9):.0f} rows/s, failed: {backfiller.failed})")
+    return backfiller
+
+def parse_aliases(values):
+    """'見出し=列名' の形式の指定を辞書にする。"""
+    aliases = {}
+    for value in values or []:
+        header, sep, column = value.partition('=')
+        if not sep or column not in ROW_COLUMNS:
+            raise ValueError(f"Invalid --map: {value} (expected HEADER=COLUMN, COLUMN in {', '.join(ROW_COLUMNS)})")
+        aliases[header] = column
+    return aliases
+
+def main(argv=None):
+    """コマンドライン引数を解析して CSV を読み込む。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper backfill',
+                                     description='既存の CSV を ex2_2 に並列に読み込む')
+    parser.add_argument('csv_files', nargs='+', help='読み込む CSV ファイル')
+    parser.add_argument('--table', default='ex2_2', help='MySQL の書き込み先テーブル名')
+    parser.add_argument('-j', '--workers', type=int, default=4, help='並列に書き込む接続数')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='1 回の INSERT で書き込む行数')
+    parser.add_argument('--map', action='append', metavar='HEADER=COLUMN',
+                        help='CSV の見出しと ex2_2 の列の対応（複数指定可）')
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help='一意でないインデックスを削除せずに読み込む')
+    args = parser.parse_args(argv)
+    try:
+        aliases = parse_aliases(args.map)
+    except ValueError as e:
+        parser.error(str(e))
+
+    from .db import create_db_engine        # MySQL への接続（SQLAlchemy を読み込む）
+
+    try:
+        result = backfill(create_db_engine(pool_size=args.workers), args.csv_files, args.table, args.workers,
+                          args.chunk_size, aliases, args.keep_indexes)
+    except ValueError as e:
+        print(f"Error: {e}")        # 空の CSV、ex2_2 の列に対応する見出しがない CSV
+        raise SystemExit(1)
+    if result.failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ホストごとのサーキットブレーカー
+
+店舗公式URLには、既に存在しないホストや接続を受け付けないホストが多く含まれます。
+そのようなホストには公式URLの確認・SSL 証明書の確認のたびにタイムアウトまで待たされ、
+同じホストの店舗（チェーン店など）ごとに同じ待ち時間が繰り返されます。
+
+- 接続できなかった回数が接続先ごとに `threshold` 回に達したら回路を開き、以降はそのホストに
+  接続せず、記録した理由をすぐに返す。
+- `cooldown` 秒経つと半開状態になり、1 回だけ接続を試す。成功すれば閉じ、失敗すれば再び開く。
+- 状態は JSON ファイルに保存し、次回の実行に引き継ぐ（既知の接続できないホストには最初から接続しない）。
+
+接続先は、公式URLの確認では 'ホスト名'、SSL 証明書の確認では 'ホスト名:443' です
+（HTTP だけに対応したサイトで、443 番ポートの失敗によって公式URLの確認まで止めないため）。
+接続できたが SSL 証明書が無効だった場合や、HTTP のエラーステータスが返った場合は、ホストは
+生きているため失敗として数えません。
+
+"""
+import json                             # 状態ファイルの読み書き
+import os                               # ファイルの置き換え
+import threading                        # 状態の保護
+import time                             # 回路を開いた時刻
+from .metrics import METRICS
+
+class CircuitOpenError(Exception):
+    """回路が開いているため、接続しなかったことを表す例外。
+
+    Attributes:
+        key (str): 接続先（'ホスト名' または 'ホスト名:ポート番号'）。
+        reason (str): 回路を開いた原因（最後の接続エラー）。
+    """
+
+    def __init__(self, key, reason):
+        super().__init__(f"Circuit open for {key}: {reason}")
+        self.key = key
+        self.reason = reason
+
+class CircuitBreaker:
+    """接続先ごとに接続の失敗を数え、失敗が続いた接続先への接続を止める。
+
+    Args:
+        path (str or None): 状態ファイルのパス（None の場合は保存しない）。
+        threshold (int): 回路を開くまでの連続した失敗の回数。
+        cooldown (float): 回路を開いてから、半開状態で再び接続を試すまでの秒数。
+
+    Notes:
+        - `with` 文で使用すると、終了時に状態をファイルに保存する。
+        - 複数スレッドから同時に使用できる。半開状態の接続先には 1 スレッドだけが接続を試す。
+        - `check` で接続を許可された場合、呼び出し側は必ず `success` か `failure` を呼ぶ。
+    """
+
+    def __init__(self, path=None, threshold=3, cooldown=24 * 3600):
+        self.path = path
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.hosts = {}             # 接続先 → {'failures': 回数, 'opened_at': 時刻 or None, 'reason': 理由}
+        self._probing = set()       # 半開状態で接続を試している接続先
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.hosts = json.load(f)
+        METRICS.gauge_function('gnavi_breaker_open_hosts', self.open_count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
+        return False
+
+    def check(self, key):
+        """接続先に接続してよいかを確認する。
+
+        Args:
+            key (str): 接続先（'ホスト名' または 'ホスト名:ポート番号'）。
+
+        Raises:
+            CircuitOpenError: 回路が開いている（または他のスレッドが半開状態で接続を試している）場合。
+        """
+        with self._lock:
+            state = self.hosts.get(key)
+            if not state or state['opened_at'] is None:
+                return
+            if time.time() - state['opened_at'] >= self.cooldown and key not in self._probing:
+                self._probing.add(key)      # 半開状態: このスレッドだけが接続を試す
+                return
+        METRICS.inc('gnavi_breaker_rejections_total')
+        raise CircuitOpenError(key, state['reason'])
+
+    def success(self, key):
+        """接続できたことを記録し、回路を閉じる。"""
+        with self._lock:
+            self._probing.discard(key)
+            self.hosts.pop(key, None)
+
+    def failure(self, key, reason):
+        """接続できなかったことを記録する。失敗が `threshold` 回に達したか、半開状態で失敗したら回路を開く。
+
+        Args:
+            key (str): 接続先。
+            reason (str): 失敗の理由（回路が開いている間、確認結果として返す）。
+        """
+        with self._lock:
+            state = self.hosts.setdefault(key, {'failures': 0, 'opened_at': None, 'reason': ''})
+            state['failures'] += 1
+            state['reason'] = reason
+            if key in self._probing or state['failures'] >= self.threshold:
+                if state['opened_at'] is None or key in self._probing:
+                    print(f"Circuit opened for {key} after {state['failures']} failures ({reason})")
+                state['opened_at'] = time.time()
+            self._probing.discard(key)
+
+    def open_count(self):
+        """回路が開いている接続先の数を返す。"""
+        with self._lock:
+            return sum(1 for state in self.hosts.values() if state['opened_at'] is not None)
+
+    def save(self):
+        """状態をファイルに保存する。"""
+        if not self.path:
+            return
+        with self._lock:
+            hosts = dict(self.hosts)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(hosts, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
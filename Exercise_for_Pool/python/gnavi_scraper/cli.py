@@ -0,0 +1,378 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ぐるなび店舗情報収集のコマンドライン
+
+サブコマンドのモジュールは、そのサブコマンドが選ばれてから読み込みます。
+また、scrape では選んだバックエンドと出力先のモジュールだけを読み込むため、
+requests と CSV の組み合わせでは Selenium・pandas・SQLAlchemy は読み込まれません。
+
+取得範囲・並列数・タイムアウトなどの設定は `config` を参照してください。
+
+実行方法:
+    python3 -m gnavi_scraper scrape --backend requests --sink csv -o 1-1.csv
+    python3 -m gnavi_scraper scrape --backend selenium --sink mysql
+    python3 -m gnavi_scraper scrape --backend selenium --tabs 4   # 1 つの Chrome の 4 つのタブで並行して取得
+    python3 -m gnavi_scraper scrape --backend selenium --capture cdp  # 描画を待たずに HTML の応答を取得
+    python3 -m gnavi_scraper scrape --config gnavi_scraper.example.toml --area tokyo -n 500 -j 8
+    python3 -m gnavi_scraper scrape --profile-startup     # 起動時の import 時間を表示
+    python3 -m gnavi_scraper scrape --profile profile/    # 取得処理のプロファイリング
+    python3 -m gnavi_scraper scrape --status-port 5000    # 進捗を http://localhost:5000/status で公開
+    python3 -m gnavi_scraper reextract <アーカイブのディレクトリ> -o 1-1.csv
+    python3 -m gnavi_scraper revalidate 1-1.csv 1-2.csv --cache revalidate-cache.json
+    python3 -m gnavi_scraper normalize 1-1.csv -o 1-1.normalized.csv
+    python3 -m gnavi_scraper history --keep-days 90
+    python3 -m gnavi_scraper backfill 1-1.csv 1-2.csv -j 4   # 既存の CSV を ex2_2 に並列に読み込む
+    python3 -m gnavi_scraper serve --port 5000               # ex2_2 の読み取り用 API
+    python3 -m gnavi_scraper discover --index store_index.json --area tokyo -j 8
+    python3 -m gnavi_scraper scrape --index store_index.json --offset 3000 -n 500   # インデックスの範囲を取得
+    python3 -m gnavi_scraper scrape --index store_index.json --budget-minutes 30 -n 5000  # 30 分で優先順に取得
+    cat urls.txt | python3 -m gnavi_scraper scrape --input - --sink ndjson -j 8 | jq .店舗名
+    python3 -m gnavi_scraper loadgen --stores 100000 --port 8080      # 負荷試験用の合成サイト
+
+"""
+import argparse                         # コマンドライン引数の解析
+import contextlib                       # 状態確認のエンドポイントを使わない場合の with 文
+import importlib                        # サブコマンドのモジュールを必要になってから読み込む
+import os                               # 環境変数の取得、パス操作
+import subprocess                       # -X importtime を付けた Python の起動
+import sys                              # コマンドライン引数、実行中の Python のパス
+
+# サブコマンド名 → 'モジュール名:関数名'（関数は引数のリストを受け取る）
+COMMANDS = {
+    'scrape': 'gnavi_scraper.cli:scrape_main',
+    'reextract': 'gnavi_scraper.reextract:main',
+    'revalidate': 'gnavi_scraper.revalidate:main',
+    'normalize': 'gnavi_scraper.normalize:main',
+    'history': 'gnavi_scraper.history:main',
+    'discover': 'gnavi_scraper.discovery:main',
+    'backfill': 'gnavi_scraper.backfill:main',
+    'serve': 'gnavi_scraper.query_service:main',
+    'loadgen': 'gnavi_scraper.loadgen:main',
+}
+# サブコマンドを省略した場合に実行するサブコマンド
+DEFAULT_COMMAND = 'scrape'
+
+# 出力先ごとに、書き込み時に読み込まれるモジュール（--profile-startup で使用）
+SINK_MODULES = {
+    'csv': ['gnavi_scraper.sinks'],
+    'mysql': ['gnavi_scraper.sinks', 'gnavi_scraper.db', 'gnavi_scraper.write_behind'],
+    'ndjson': ['gnavi_scraper.sinks'],
+}
+# バックエンド・出力先に関係なく scrape で読み込まれるモジュール
+SCRAPE_MODULES = ['gnavi_scraper.archive', 'gnavi_scraper.circuit_breaker', 'gnavi_scraper.config',
+                  'gnavi_scraper.hedging', 'gnavi_scraper.links', 'gnavi_scraper.metrics', 'gnavi_scraper.pipeline',
+                  'gnavi_scraper.scheduler']
+
+def load_command(name):
+    """サブコマンド名から、実行する関数を読み込んで返す。
+
+    Args:
+        name (str): サブコマンド名。
+
+    Returns:
+        callable: 引数のリストを受け取る関数。
+    """
+    module_name, func_name = COMMANDS[name].split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+def open_sink(sink_config):
+    """設定から出力先を作成する。
+
+    Args:
+        sink_config (dict): 設定の 'sink' セクション。
+
+    Returns:
+        Sink: 出力先。
+    """
+    from .sinks import CsvSink, MySQLSink, NdjsonSink   # 出力先（SQLAlchemy は書き込み開始時に読み込む）
+
+    if sink_config['type'] == 'csv':
+        sink = CsvSink(sink_config['output'])
+    elif sink_config['type'] == 'ndjson':
+        sink = NdjsonSink(sys.stdout)
+    else:
+        sink = MySQLSink(
+            sink_config['table'],
+            batch_size=sink_config['batch_size'],
+            spill_dir=sink_config['spill_dir'],
+            history_table=sink_config['history_table'] or None,
+        )
+
+    if sink_config['normalize']:
+        from .normalize import NormalizingSink  # 列単位の正規化（pandas を読み込む）
+        sink = NormalizingSink(sink)
+    return sink
+
+def open_fetcher(fetch_config):
+    """設定からページ取得のバックエンドを作成する。
+
+    Args:
+        fetch_config (dict): 設定の 'fetch' セクション。
+
+    Returns:
+        object: ページ取得のバックエンド。
+    """
+    from .backends import load_backend      # 選んだバックエンドだけを読み込む
+
+    fetcher_class = load_backend(fetch_config['backend'])
+    if fetch_config['backend'] == 'selenium':
+        return fetcher_class(max_rss_mb=fetch_config['max_rss_mb'], wait_timeout=fetch_config['wait_timeout'],
+                             tabs=fetch_config['tabs'], capture=fetch_config['capture'])
+    return fetcher_class(timeout=fetch_config['timeout'])
+
+def startup_modules(backend, sink):
+    """scrape で読み込まれるモジュールのリストを返す。
+
+    Args:
+        backend (str): バックエンド名。
+        sink (str): 出力先名。
+
+    Returns:
+        list: モジュール名のリスト。
+    """
+    from .backends import BACKENDS          # バックエンド名 → モジュール名
+
+    backend_module = 'gnavi_scraper.backends' + BACKENDS[backend][0]
+    return SCRAPE_MODULES + [backend_module] + SINK_MODULES[sink]
+
+def parse_importtime(lines):
+    """`-X importtime` の出力を解析する。
+
+    Args:
+        lines (iterable): 標準エラー出力の各行。
+
+    Returns:
+        list: (モジュール名, 自身の時間 [us], 累計時間 [us]) のリスト。
+    """
+    entries = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue            # 見出しの行
+        entries.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return entries
+
+def profile_startup(modules, top=20):
+    """別の Python プロセスでモジュールを読み込み、import 時間の内訳を表示する。
+
+    Args:
+        modules (list): 読み込むモジュール名のリスト。
+        top (int): 累計時間の長い順に表示するモジュール数。
+
+    Notes:
+        - 既に読み込まれたモジュールの影響を受けないよう、`python -X importtime` を新しく起動して計測する。
+        - トップレベルのパッケージ（selenium, sqlalchemy など）ごとの合計も表示する。
+    """
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_dir, env.get('PYTHONPATH')]))
+    code = '; '.join(f'import {name}' for name in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else 'import failed')
+        return
+
+    entries = parse_importtime(result.stderr.splitlines())
+    total = sum(self_us for _, self_us, _ in entries)
+
+    print(f"Startup imports: {len(entries)} modules, {total / 1000:.1f} ms")
+    print(f"\n{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+    for name, self_us, cumulative_us in sorted(entries, key=lambda e: e[2], reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:16.1f} {self_us / 1000:10.1f}  {name.strip()}")
+
+    # トップレベルのパッケージごとの合計（自身の時間の合計）
+    packages = {}
+    for name, self_us, _ in entries:
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print(f"\n{'total [ms]':>16}  package")
+    for package, self_us in sorted(packages.items(), key=lambda p: p[1], reverse=True)[:top]:
+        print(f"{self_us / 1000:16.1f}  {package}")
+
+def scrape(config):
+    """設定にしたがって店舗情報を取得し、出力先に書き込む。
+
+    Args:
+        config (dict): `config.load_config` が返した設定。
+
+    Returns:
+        int: 取得した店舗数。
+
+    Notes:
+        - 出力先が 'ndjson' の場合、標準出力には店舗情報だけを書き出し、進捗の表示は標準エラー出力に出す。
+    """
+    if config['sink']['type'] == 'ndjson':
+        sink = open_sink(config['sink'])     # 標準出力を差し替える前に書き込み先を決める
+        with contextlib.redirect_stdout(sys.stderr):
+            return _scrape(config, sink)
+    return _scrape(config)
+
+def _scrape(config, sink=None):
+    """`scrape` の本体（`sink` を指定した場合は設定の出力先の代わりに使う）。"""
+    from .archive import PageArchive                    # 店舗ページの生HTMLアーカイブ
+    from .circuit_breaker import CircuitBreaker         # 接続できない店舗公式サイトの記録
+    from .hedging import Hedger                         # ヘッジリクエストと処理ごとの期限
+    from .config import start_urls                      # 取得範囲から検索結果ページの URL を作る
+    from .links import iter_scope_links, iter_input_links   # 検索結果・入力からの店舗URLの遅延取得
+    from .metrics import StatusServer                   # 進捗の HTTP エンドポイント
+    from .pipeline import loop_rs_links                 # 店舗情報の取得と出力
+    from .scheduler import Budget                       # 取得に使える時間
+    from .selector_health import SelectorHealth         # セレクタの変化の検知
+    from .sinks import is_file_locked                   # 出力するファイルのロック確認
+
+    scope, fetch, cache, sink_config = config['scope'], config['fetch'], config['cache'], config['sink']
+    if sink_config['type'] == 'csv' and is_file_locked(sink_config['output']):
+        print(f"Error: {sink_config['output']} is open. Please close it and try again.")
+        return 0    # 処理を中断
+
+    sink = sink or open_sink(sink_config)
+    fetcher = open_fetcher(fetch)
+    archive = PageArchive(cache['archive_dir'], cache['archive_codec']) if cache['archive_dir'] else None
+    selectors = SelectorHealth(scope['search_link'], max_blank_stores=scope['max_blank_stores'])
+    # Selenium の複数タブでは、タブの数だけ並列に取得する
+    workers = max(fetch['workers'], fetch['tabs']) if fetch['backend'] == 'selenium' else fetch['workers']
+    hedger = Hedger(fetch['deadline'], fetch['hedge'], max_workers=max(workers, 1) * 4) \
+        if fetch['deadline'] or fetch['hedge'] else None
+    breaker = CircuitBreaker(config['breaker']['file'] or None, config['breaker']['threshold'],
+                             config['breaker']['cooldown_hours'] * 3600)
+    # 遅れている店舗ページを待たずに目標件数に達するよう、並列取得では多めに取得を始める
+    spare = fetch['speculative'] if workers > 1 and getattr(fetcher, 'concurrent', False) else 0
+
+    if scope['offset'] is not None:
+        # 店舗URLのインデックスから範囲を選ぶ（検索結果ページはたどらない）
+        if not config['discovery']['index'] or not os.path.exists(config['discovery']['index']):
+            print("Error: --offset requires an index file created by 'discover' (--index).")
+            return 0
+        from .discovery import StoreIndex               # 店舗URLのインデックス
+        index_links = StoreIndex(config['discovery']['index']).slice(
+            scope['offset'], scope['offset'] + scope['demand'] + spare)
+        print(f"Using {len(index_links)} stores from the index (offset {scope['offset']})")
+
+    budget_config = config['budget']
+    budget = Budget(budget_config['minutes'] * 60, budget_config['reserve_minutes'] * 60) \
+        if budget_config['minutes'] else None
+    targets = None
+    if budget and config['discovery']['index'] and scope['offset'] is None and scope['input'] is None:
+        # インデックスの店舗を優先順位の順に取得し、書き込んだ店舗をインデックスに記録する
+        from .discovery import StoreIndex               # 店舗URLのインデックス
+        from .scheduler import prioritize, CheckpointSink   # 優先順位と取得日時の記録
+        index = StoreIndex(config['discovery']['index'])
+        targets = prioritize(index, budget_config['stale_days'])[:scope['demand']]
+        index_links = [url for url, _ in targets]
+        sink = CheckpointSink(sink, index, budget)
+        spare = 0
+        print(f"Budget {budget_config['minutes']:g} min for {len(targets)} stores "
+              f"({sum(1 for _, tier in targets if tier == 'new')} new)")
+
+    input_file = None
+    if scope['input'] is not None:
+        input_file = sys.stdin if scope['input'] == '-' else open(scope['input'], encoding='utf-8')
+        spare = 0       # 入力のすべての店舗を取得する
+
+    status = config['status']
+    server = StatusServer(status['port'], status['host']) if status['port'] else contextlib.nullcontext()
+
+    print('Processing start')
+    with server, fetcher, sink, breaker, hedger or contextlib.nullcontext(), \
+            input_file or contextlib.nullcontext():
+        # 検索結果から店舗URLを遅延取得し、各店舗の詳細情報を取得
+        if input_file is not None:
+            rs_links = iter_input_links(input_file)
+        elif targets is not None or scope['offset'] is not None:
+            rs_links = iter(index_links)
+        else:
+            rs_links = iter_scope_links(fetcher, scope['demand'] + spare, start_urls(config),
+                                        first_page=scope['first_page'], last_page=scope['last_page'],
+                                        selectors=selectors)
+        demand = None if input_file is not None else scope['demand']
+        rs_count = loop_rs_links(sink, fetcher, rs_links, 0, demand, archive,
+                                 workers=workers, timeout=fetch['timeout'],
+                                 ssl_timeout=fetch['ssl_timeout'], selectors=selectors,
+                                 hedger=hedger, spare=spare, breaker=breaker, budget=budget)
+    if targets is not None:
+        from .scheduler import report               # 目標のうち取得できた割合
+        report(targets, sink.written, budget, sink.failed)
+    elif budget:
+        print(f"\nCovered {rs_count}/{scope['demand']} stores ({rs_count / max(scope['demand'], 1):.1%})"
+              + (" - stopped at the deadline" if budget.expired() else ""))
+    return rs_count
+
+def scrape_main(argv=None, defaults=None, prog='python3 -m gnavi_scraper scrape'):
+    """コマンドライン引数と設定ファイルを読み込み、店舗情報を取得する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+        defaults (dict or None): 呼び出し元のスクリプトごとの既定値（例: 出力ファイル名）。
+        prog (str): ヘルプに表示するコマンド名。
+    """
+    from .config import add_arguments, args_to_overrides, load_config   # 設定の読み込み
+
+    parser = argparse.ArgumentParser(prog=prog, description='ぐるなびの店舗情報を取得する')
+    add_arguments(parser)
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='取得は行わず、選んだバックエンドと出力先の import 時間を表示する')
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help='取得処理をプロファイリングし、pstats とフレームグラフ用のファイルを DIR に保存する')
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args.config, args_to_overrides(args), defaults)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.profile_startup:
+        profile_startup(startup_modules(config['fetch']['backend'], config['sink']['type']))
+        return
+
+    from .selector_health import SelectorDriftError     # セレクタの変化による中断
+
+    try:
+        if args.profile:
+            from .profiling import Profiler     # cProfile とサンプリングによるプロファイリング
+            with Profiler(args.profile):
+                scrape(config)
+        else:
+            scrape(config)
+    except BrokenPipeError:
+        # 出力の読み手（head など）が先に終了した場合は、残りを書き出さずに終わる
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+    except SelectorDriftError as e:
+        print(f"\nError: {e}\n{e.diagnostic}")
+        if e.html is not None:
+            snapshot = save_snapshot(e.html)
+            print(f"Saved the page to {snapshot} for inspection.")
+        sys.exit(2)     # 巡回を続けても取得できないため、異常終了としてすぐに終わる
+
+def save_snapshot(html, prefix='selector-drift'):
+    """セレクタが一致しなかったページの HTML を、調査用にカレントディレクトリへ保存する。
+
+    Args:
+        html (str or bytes): ページの HTML。
+        prefix (str): ファイル名の先頭。
+
+    Returns:
+        str: 保存したファイル名。
+    """
+    import time                             # ファイル名の日時
+
+    file_name = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.html"
+    with open(file_name, 'wb') as f:
+        f.write(html if isinstance(html, bytes) else html.encode('utf-8'))
+    return file_name
+
+def main(argv=None):
+    """サブコマンドを選んで実行する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in ('-h', '--help'):
+        print(__doc__)
+        return
+    name = argv.pop(0) if argv and argv[0] in COMMANDS else DEFAULT_COMMAND
+    load_command(name)(argv)
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""列ごとに店舗情報を溜めるバッファ
+
+店舗情報を 1 件ずつ dict のリストに溜め、最後に `pd.DataFrame(data)` に変換すると、
+行数が多い場合は dict 自体の大きさ（1 件あたり数百バイト）と、DataFrame への変換時の
+コピーの両方がメモリを圧迫します。`ColumnBuffer` は書き込まれた行を列ごとのリストに
+振り分けて溜め、dict は保持しません。
+
+- 都道府県・市区町村のように同じ値が繰り返される列は、同じ文字列オブジェクトを共有する。
+- SSL のような bool の列は `array('b')`（1 件あたり 1 バイト）に溜める。
+- CSV・pandas・Arrow・他の出力先（MySQL など）へ、行の dict のリストを作らずに書き出せる。
+
+出力先（`Sink`）のインターフェースを持つため、`loop_rs_links` の出力先としてそのまま使用できます。
+
+"""
+import csv                              # CSV の書き込み
+from array import array                 # bool の列
+from .extract import ROW_COLUMNS, CSV_COLUMNS
+from .sinks import Sink
+
+# 同じ値が繰り返されるため、文字列オブジェクトを共有する列
+SHARED_COLUMNS = ['都道府県', '市区町村']
+# bool の値を持つ列
+BOOL_COLUMNS = ['SSL']
+
+class ColumnBuffer(Sink):
+    """店舗情報を列ごとのリストに溜める出力先。
+
+    Args:
+        columns (list): 溜める列（これ以外のキーは捨てる）。
+        shared (list): 同じ値の文字列オブジェクトを共有する列。
+        bools (list): bool の値を持つ列（`array('b')` に溜める）。
+
+    Notes:
+        - 行にない列は None（bool の列は False）として溜める。
+        - 書き出しの `release=True` は、変換を終えた列から順にメモリを解放する（バッファは空になる）。
+    """
+
+    def __init__(self, columns=ROW_COLUMNS, shared=SHARED_COLUMNS, bools=BOOL_COLUMNS):
+        self.columns = list(columns)
+        self._bools = [column for column in bools if column in self.columns]
+        self._shared = {column: {} for column in shared if column in self.columns and column not in self._bools}
+        self._data = {}
+        self.clear()
+
+    def __len__(self):
+        return self._length
+
+    def clear(self):
+        """溜めた行をすべて捨てる。"""
+        self._data = {column: array('b') if column in self._bools else [] for column in self.columns}
+        self._length = 0
+
+    def write(self, row):
+        for column, values in self._data.items():
+            value = row.get(column)
+            if column in self._shared and value is not None:
+                value = self._shared[column].setdefault(value, value)
+            elif column in self._bools:
+                value = bool(value)
+            values.append(value)
+        self._length += 1
+
+    def column(self, name):
+        """列の値のリストを返す（bool の列は bool のリスト）。"""
+        values = self._data[name]
+        return [bool(value) for value in values] if name in self._bools else values
+
+    def rows(self, columns=None):
+        """行をタプルで 1 件ずつ返す。
+
+        Args:
+            columns (list or None): 返す列（None の場合はすべての列）。
+
+        Yields:
+            tuple: 列の順の値。
+        """
+        columns = columns or self.columns
+        iterators = [map(bool, self._data[column]) if column in self._bools else iter(self._data[column])
+                     for column in columns]
+        return zip(*iterators)
+
+    def write_to(self, sink):
+        """溜めた行を別の出力先に 1 件ずつ書き込む（dict は 1 件ずつ作って捨てる）。
+
+        Args:
+            sink (Sink): 書き込み先（開いた状態のもの）。
+
+        Returns:
+            int: 書き込んだ行数。
+        """
+        for values in self.rows():
+            sink.write(dict(zip(self.columns, values)))
+        return self._length
+
+    def to_csv(self, file_name, columns=CSV_COLUMNS):
+        """CSV ファイル（UTF-8 BOM 付き）に書き出す。
+
+        Args:
+            file_name (str): 出力するCSVファイル名。
+            columns (list): 出力する列。
+
+        Returns:
+            int: 書き出した行数。
+
+        Notes:
+            - `CsvSink` と同じく、bool の値は 'True' / 'False'、None は空文字として書き込む。
+        """
+        with open(file_name, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(self.rows(columns))
+        return self._length
+
+    def to_frame(self, release=False):
+        """pandas の DataFrame に変換する。
+
+        Args:
+            release (bool): True の場合、変換した列から順にバッファから解放する。
+
+        Returns:
+            pandas.DataFrame: `columns` の列を持つ DataFrame。bool の列は bool 型。
+        """
+        import numpy as np              # bool の列をコピーせずに配列にする
+        import pandas as pd             # DataFrame（使う場合だけ読み込む）
+
+        frame = {}
+        for column in self.columns:
+            values = self._data[column]
+            if column in self._bools:
+                frame[column] = np.frombuffer(values, dtype=np.int8).astype(bool)
+            else:
+                frame[column] = np.array(values, dtype=object)
+            if release:
+                self._data[column] = array('b') if column in self._bools else []
+        if release:
+            self._length = 0
+        return pd.DataFrame(frame, columns=self.columns, copy=False)
+
+    def to_arrow(self, release=False):
+        """Apache Arrow のテーブルに変換する（pyarrow が必要）。
+
+        Args:
+            release (bool): True の場合、変換した列から順にバッファから解放する。
+
+        Returns:
+            pyarrow.Table: 文字列の列は string 型、bool の列は bool 型のテーブル。
+        """
+        import numpy as np              # bool の列をコピーせずに配列にする
+        import pyarrow as pa            # Arrow のテーブル（使う場合だけ読み込む）
+
+        arrays = []
+        for column in self.columns:
+            values = self._data[column]
+            if column in self._bools:
+                arrays.append(pa.array(np.frombuffer(values, dtype=np.int8).astype(bool), type=pa.bool_()))
+            else:
+                arrays.append(pa.array(values, type=pa.string()))
+            if release:
+                self._data[column] = array('b') if column in self._bools else []
+        if release:
+            self._length = 0
+        return pa.Table.from_arrays(arrays, names=self.columns)
@@ -0,0 +1,298 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""収集の設定（設定ファイル・環境変数・コマンドライン引数）
+
+取得範囲・並列数・タイムアウト・キャッシュ（アーカイブ）の場所・出力先を 1 つの設定にまとめます。
+値は次の順に上書きされます（後のものが優先）。
+
+1. `DEFAULT_CONFIG`（スクリプトごとの既定値で上書きできる）
+2. 設定ファイル（`--config` または環境変数 GNAVI_CONFIG。TOML / YAML / JSON）
+3. 環境変数（`ENV_VARS`）
+4. コマンドライン引数（`FLAGS`）
+
+設定ファイルの例は `gnavi_scraper.example.toml` を参照してください。
+
+"""
+import copy                             # 既定値の複製
+import json                             # JSON 形式の設定ファイルの読み込み
+import os                               # 環境変数の取得、拡張子の判定
+from .extract import SEARCH_LINK_SELECTOR
+from .links import SEARCH_URL
+
+# エリアの検索結果ページの URL（{area} にエリア名を入れる。例: 'tokyo', 'osaka'）
+AREA_URL = "https://r.gnavi.co.jp/area/{area}/rs/"
+
+# 設定の既定値（セクション → 項目 → 値）
+DEFAULT_CONFIG = {
+    # 取得範囲
+    'scope': {
+        'demand': 50,                   # 取得したい店舗数（目標件数）
+        'areas': [],                    # エリア名のリスト（空の場合は start_urls を使用）
+        'start_urls': [SEARCH_URL],     # 最初の検索結果ページの URL のリスト
+        'first_page': 1,                # 最初に取得する検索結果のページ番号
+        'last_page': None,              # 最後に取得する検索結果のページ番号（None の場合は最後まで）
+        'search_link': SEARCH_LINK_SELECTOR,    # 検索結果ページの店舗リンクの CSS セレクタ
+        'max_blank_stores': 5,          # 店舗情報が空の店舗ページがこの件数続いたら中断する（0 で無効）
+        'offset': None,                 # 店舗URLのインデックスのこの位置から取得する（None の場合は検索結果をたどる）
+        'input': None,                  # 店舗URLを 1 行ずつ読み込むファイル（'-' は標準入力。すべての行を取得する）
+    },
+    # ページ取得
+    'fetch': {
+        'backend': 'requests',          # 'requests' または 'selenium'
+        'workers': 1,                   # 店舗ページを並列に取得するスレッド数（Selenium は tabs が 2 以上の場合のみ）
+        'timeout': 10.0,                # ページ取得・公式URL確認のタイムアウト（秒）
+        'ssl_timeout': 5.0,             # SSL 証明書確認の接続タイムアウト（秒）
+        'wait_timeout': 10.0,           # Selenium で要素が現れるまで待つ最大秒数
+        'max_rss_mb': 1024,             # Chrome の RSS 合計の上限（MB）
+        'tabs': 1,                      # Selenium で 1 つの Chrome の複数のタブで並行して読み込む数
+        'capture': 'render',            # Selenium の HTML の取得方法（'render' または 'cdp'）
+        'deadline': 30.0,               # 店舗ページ・公式URL・SSL 確認それぞれの全体の期限（秒、0 で無効）
+        'hedge': False,                 # 店舗ページの取得が p95 を超えたら同じページをもう 1 回取得する
+        'speculative': 0,               # 目標件数より多めに取得を始める店舗数（並列取得時のみ）
+    },
+    # キャッシュ（店舗ページの生HTMLアーカイブ）
+    'cache': {
+        'archive_dir': None,            # 保存先ディレクトリ（None の場合は保存しない）
+        'archive_codec': 'gzip',        # 'gzip', 'zstd', 'brotli'
+    },
+    # 店舗URLのインデックス（discover で作成し、scope.offset で範囲を選んで取得する）
+    'discovery': {
+        'index': None,                  # インデックスファイル（None の場合は使用しない）
+        'sitemaps': [],                 # 店舗URLを集めるサイトマップ（またはサイトマップインデックス）の URL
+        'refresh_hours': 24.0,          # 検索条件ごとに、検索結果ページを取得し直すまでの時間
+        'store_site': 'https://r.gnavi.co.jp',  # 店舗ページのサイト（これ以外のホストの店舗URLはインデックスに入れない）
+    },
+    # 時間枠付きの取得（scheduler）
+    'budget': {
+        'minutes': 0.0,                 # 取得に使える時間（分。0 の場合は目標件数だけで区切る）
+        'reserve_minutes': 2.0,         # 残り時間がこれを切ったら公式URLのリダイレクト確認を省略する
+        'stale_days': 7.0,              # 前回の取得からこの日数が経った店舗を、新しい店舗の次に取得する
+    },
+    # 店舗公式サイトのサーキットブレーカー
+    'breaker': {
+        'file': 'circuit_breaker.json',     # 状態の保存先（次回の実行に引き継ぐ。空文字で無効）
+        'threshold': 3,                 # 回路を開くまでの連続した接続の失敗の回数
+        'cooldown_hours': 24.0,         # 回路を開いてから、再び接続を試すまでの時間
+    },
+    # 出力先
+    'sink': {
+        'type': 'csv',                  # 'csv', 'mysql' または 'ndjson'（標準出力に 1 件ずつ JSON を出力）
+        'output': 'scrape.csv',         # CSV の出力ファイル名
+        'table': 'ex2_2',               # MySQL の書き込み先テーブル名
+        'batch_size': 20,               # MySQL の 1 トランザクションの最大行数
+        'spill_dir': 'spill',           # 書き込めなかった行の退避先
+        'history_table': 'ex2_2_history',   # 変更履歴のテーブル名（空文字で無効）
+        'normalize': False,             # 書き込む前に列単位で正規化する（pandas を使用）
+    },
+    # 進捗・処理速度の HTTP エンドポイント（/status, /metrics）
+    'status': {
+        'port': 0,                      # 待ち受けるポート番号（0 の場合は起動しない）
+        'host': '0.0.0.0',              # 待ち受けるアドレス
+    },
+}
+
+# 環境変数 → (セクション, 項目)（従来のスクリプトで使用していた環境変数）
+ENV_VARS = {
+    'GNAVI_CHROME_MAX_RSS_MB': ('fetch', 'max_rss_mb'),
+    'GNAVI_ARCHIVE_DIR': ('cache', 'archive_dir'),
+    'GNAVI_ARCHIVE_CODEC': ('cache', 'archive_codec'),
+    'GNAVI_BREAKER_FILE': ('breaker', 'file'),
+    'GNAVI_STORE_INDEX': ('discovery', 'index'),
+    'MYSQL_BATCH_SIZE': ('sink', 'batch_size'),
+    'MYSQL_SPILL_DIR': ('sink', 'spill_dir'),
+    'MYSQL_HISTORY_TABLE': ('sink', 'history_table'),
+    'GNAVI_STATUS_PORT': ('status', 'port'),
+}
+
+# コマンドライン引数 → (セクション, 項目, 型, ヘルプ)
+FLAGS = [
+    (('-n', '--demand'), 'scope', 'demand', int, '取得したい店舗数（目標件数）'),
+    (('--area',), 'scope', 'areas', 'append', 'エリア名（複数指定可。例: tokyo）'),
+    (('--start-url',), 'scope', 'start_urls', 'append', '最初の検索結果ページの URL（複数指定可）'),
+    (('--first-page',), 'scope', 'first_page', int, '最初に取得する検索結果のページ番号'),
+    (('--last-page',), 'scope', 'last_page', int, '最後に取得する検索結果のページ番号'),
+    (('--backend',), 'fetch', 'backend', str, "ページ取得のバックエンド ('requests', 'selenium')"),
+    (('-j', '--workers'), 'fetch', 'workers', int, '店舗ページを並列に取得するスレッド数'),
+    (('--timeout',), 'fetch', 'timeout', float, 'ページ取得のタイムアウト（秒）'),
+    (('--wait-timeout',), 'fetch', 'wait_timeout', float, 'Selenium で要素を待つ最大秒数'),
+    (('--tabs',), 'fetch', 'tabs', int, 'Selenium で 1 つの Chrome の複数のタブで並行して読み込む数'),
+    (('--capture',), 'fetch', 'capture', str, "Selenium の HTML の取得方法 ('render': 描画を待つ, 'cdp': 応答が届いた時点)"),
+    (('--deadline',), 'fetch', 'deadline', float, '店舗ページ・公式URL・SSL 確認それぞれの期限（秒、0 で無効）'),
+    (('--hedge',), 'fetch', 'hedge', 'flag', '店舗ページの取得が p95 を超えたら同じページをもう 1 回取得する'),
+    (('--speculative',), 'fetch', 'speculative', int, '目標件数より多めに取得を始める店舗数（並列取得時のみ）'),
+    (('--input',), 'scope', 'input', str, "店舗URLを 1 行ずつ読み込むファイル（'-' は標準入力）"),
+    (('--offset',), 'scope', 'offset', int, '店舗URLのインデックスのこの位置から取得する（--index が必要）'),
+    (('--index',), 'discovery', 'index', str, '店舗URLのインデックスファイル'),
+    (('--sitemap',), 'discovery', 'sitemaps', 'append', '店舗URLを集めるサイトマップの URL（複数指定可）'),
+    (('--refresh-hours',), 'discovery', 'refresh_hours', float, '検索結果ページを取得し直すまでの時間'),
+    (('--store-site',), 'discovery', 'store_site', str, '店舗ページのサイト（例: 合成サイトの http://127.0.0.1:8080）'),
+    (('--budget-minutes',), 'budget', 'minutes', float, '取得に使える時間（分。0 で無制限）'),
+    (('--stale-days',), 'budget', 'stale_days', float, '前回の取得からこの日数が経った店舗を優先して取得し直す'),
+    (('--archive-dir',), 'cache', 'archive_dir', str, '店舗ページの生HTMLの保存先'),
+    (('--archive-codec',), 'cache', 'archive_codec', str, "アーカイブの圧縮形式 ('gzip', 'zstd', 'brotli')"),
+    (('--breaker-file',), 'breaker', 'file', str, 'サーキットブレーカーの状態の保存先（空文字で無効）'),
+    (('--sink',), 'sink', 'type', str, "出力先 ('csv', 'mysql', 'ndjson')"),
+    (('-o', '--output'), 'sink', 'output', str, 'CSV の出力ファイル名'),
+    (('--table',), 'sink', 'table', str, 'MySQL の書き込み先テーブル名'),
+    (('--batch-size',), 'sink', 'batch_size', int, 'MySQL の 1 トランザクションの最大行数'),
+    (('--normalize',), 'sink', 'normalize', 'flag', '書き込む前に電話番号・URL・住所などを正規化する'),
+    (('--status-port',), 'status', 'port', int, '進捗を /status と /metrics で公開するポート番号'),
+]
+
+# 値を選択肢から選ぶ項目
+CHOICES = {
+    ('fetch', 'backend'): ('requests', 'selenium'),
+    ('fetch', 'capture'): ('render', 'cdp'),
+    ('sink', 'type'): ('csv', 'mysql', 'ndjson'),
+    ('cache', 'archive_codec'): ('gzip', 'zstd', 'brotli'),
+}
+
+def read_config_file(path):
+    """設定ファイルを読み込む。
+
+    Args:
+        path (str): 設定ファイルのパス（拡張子 .toml, .yaml, .yml, .json）。
+
+    Returns:
+        dict: 設定（セクション → 項目 → 値）。
+
+    Raises:
+        ValueError: 拡張子が対応していない場合。
+
+    Notes:
+        - TOML は Python 3.11 以降では標準の tomllib、それより前では tomli で読み込む。
+        - YAML は PyYAML で読み込む。どちらも、その形式の設定ファイルを使うときだけ読み込む。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        try:
+            import tomllib                  # TOML の読み込み（Python 3.11 以降）
+        except ImportError:
+            import tomli as tomllib         # TOML の読み込み（Python 3.10 以前）
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if ext in ('.yaml', '.yml'):
+        import yaml                         # YAML の読み込み
+        with open(path, encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    if ext == '.json':
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    raise ValueError(f"Unsupported config file: {path}")
+
+def merge_config(config, update, source):
+    """設定に別の設定を上書きする。
+
+    Args:
+        config (dict): 上書きされる設定（直接変更する）。
+        update (dict): 上書きする設定（セクション → 項目 → 値）。
+        source (str): エラーメッセージに表示する設定の出どころ。
+
+    Raises:
+        ValueError: 未知のセクション・項目がある場合。
+    """
+    for section, values in update.items():
+        if section not in config or not isinstance(values, dict):
+            raise ValueError(f"Unknown config section in {source}: {section}")
+        for key, value in values.items():
+            if key not in config[section]:
+                raise ValueError(f"Unknown config key in {source}: {section}.{key}")
+            config[section][key] = value
+
+def convert_env(value, default):
+    """環境変数の文字列を、既定値と同じ型に変換する。
+
+    Args:
+        value (str): 環境変数の値。
+        default (object): 既定値。
+
+    Returns:
+        object: 変換後の値。
+    """
+    if isinstance(default, bool):
+        return value.lower() in ('1', 'true', 'yes')
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return value
+
+def add_arguments(parser):
+    """`FLAGS` のコマンドライン引数と `--config` を argparse のパーサーに追加する。
+
+    Args:
+        parser (argparse.ArgumentParser): 追加先のパーサー。
+    """
+    parser.add_argument('--config', default=None,
+                        help='設定ファイル（TOML / YAML / JSON）。省略時は環境変数 GNAVI_CONFIG')
+    for flags, section, key, kind, help_text in FLAGS:
+        dest = f'{section}.{key}'
+        if kind == 'append':
+            parser.add_argument(*flags, dest=dest, action='append', default=None,
+                                metavar=flags[-1][2:].upper(), help=help_text)
+        elif kind == 'flag':
+            parser.add_argument(*flags, dest=dest, action='store_const', const=True, default=None, help=help_text)
+        else:
+            parser.add_argument(*flags, dest=dest, type=kind, default=None, metavar=flags[-1][2:].upper(),
+                                choices=CHOICES.get((section, key)), help=help_text)
+
+def args_to_overrides(args):
+    """解析済みのコマンドライン引数から、指定された項目だけの設定を作る。
+
+    Args:
+        args (argparse.Namespace): `add_arguments` を追加したパーサーの解析結果。
+
+    Returns:
+        dict: 設定（セクション → 項目 → 値）。
+    """
+    overrides = {}
+    for _, section, key, _, _ in FLAGS:
+        value = getattr(args, f'{section}.{key}')
+        if value is not None:
+            overrides.setdefault(section, {})[key] = value
+    return overrides
+
+def load_config(path=None, overrides=None, defaults=None):
+    """既定値・設定ファイル・環境変数・コマンドライン引数から設定を作る。
+
+    Args:
+        path (str or None): 設定ファイルのパス（None の場合は環境変数 GNAVI_CONFIG）。
+        overrides (dict or None): コマンドライン引数による設定。
+        defaults (dict or None): スクリプトごとの既定値（`DEFAULT_CONFIG` を上書きする）。
+
+    Returns:
+        dict: 設定（セクション → 項目 → 値）。
+
+    Raises:
+        ValueError: 未知の項目や、選択肢にない値がある場合。
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    merge_config(config, defaults or {}, 'defaults')
+
+    path = path or os.getenv('GNAVI_CONFIG')
+    if path:
+        merge_config(config, read_config_file(path), path)
+
+    for name, (section, key) in ENV_VARS.items():
+        value = os.getenv(name)
+        if value is not None:
+            config[section][key] = convert_env(value, DEFAULT_CONFIG[section][key])
+
+    merge_config(config, overrides or {}, 'command line')
+
+    for (section, key), choices in CHOICES.items():
+        if config[section][key] not in choices:
+            raise ValueError(f"Invalid {section}.{key}: {config[section][key]} (choose from {', '.join(choices)})")
+    return config
+
+def start_urls(config):
+    """設定の取得範囲から、最初の検索結果ページの URL のリストを返す。
+
+    Args:
+        config (dict): `load_config` が返した設定。
+
+    Returns:
+        list: 検索結果ページの URL のリスト。エリアが指定されている場合はエリアごとの URL。
+    """
+    scope = config['scope']
+    if scope['areas']:
+        return [AREA_URL.format(area=area) for area in scope['areas']]
+    return list(scope['start_urls'])
@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""MySQL への接続と、テーブルの更新番号（読み取り側のキャッシュの無効化用）"""
+import os                               # OS関連: 環境変数を扱う際に使用
+from sqlalchemy import create_engine    # SQLAlchemyの必要なクラスや関数をインポート
+
+# テーブルごとの更新番号を記録するテーブル（migrations/003_table_versions.sql）
+VERSION_TABLE = 'table_versions'
+
+def create_db_engine(pool_size=None):
+    """環境変数の接続設定から、接続プールを調整したデータベースエンジンを作成する。
+
+    Args:
+        pool_size (int or None): 常時保持する接続数（None の場合は環境変数 MYSQL_POOL_SIZE）。
+            並列に書き込む処理（backfill など）で、スレッド数に合わせて指定する。
+
+    Returns:
+        sqlalchemy.engine.Engine: MySQL のデータベースエンジン。
+
+    Notes:
+        - MYSQL_POOL_SIZE: 常時保持する接続数（デフォルト: 5）。
+        - MYSQL_MAX_OVERFLOW: 一時的に追加できる接続数（デフォルト: 5）。
+        - MYSQL_POOL_RECYCLE: 接続を作り直すまでの秒数（デフォルト: 1800）。
+          MySQL の wait_timeout で切断された接続を使わないようにする。
+        - pool_pre_ping により、使用前に接続が生きているかを確認する。
+    """
+    # MySQL接続設定: 環境変数から取得
+    user = os.getenv('MYSQL_USER', 'user')
+    password = os.getenv('MYSQL_PASSWORD', 'user_password')
+    host = os.getenv('MYSQL_HOST', 'mysql_container')
+    database = os.getenv('MYSQL_DATABASE', 'ex2')
+    charset = 'utf8mb4'
+
+    # データベースエンジンを作成
+    return create_engine(
+        f'mysql+mysqlconnector://{user}:{password}@{host}/{database}?charset={charset}',
+        pool_size=pool_size or int(os.getenv('MYSQL_POOL_SIZE', '5')),
+        max_overflow=int(os.getenv('MYSQL_MAX_OVERFLOW', '5')),
+        pool_recycle=int(os.getenv('MYSQL_POOL_RECYCLE', '1800')),
+        pool_pre_ping=True,
+    )
+
+def has_version_table(conn):
+    """更新番号のテーブルがあるかを返す（003 のマイグレーションを適用する前のデータベースでは False）。"""
+    result = conn.exec_driver_sql(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (VERSION_TABLE,))
+    return result.scalar() > 0
+
+def bump_table_version(conn, table_name):
+    """テーブルの更新番号を 1 つ進める。
+
+    行を書き込んだトランザクションの中で呼び出すと、書き込みと同時に更新番号が変わる。
+    読み取り側（`query_service`）は更新番号が変わったらキャッシュを捨てる。
+
+    Args:
+        conn (sqlalchemy.engine.Connection): データベース接続。
+        table_name (str): 書き込んだテーブルの名前。
+    """
+    conn.exec_driver_sql(
+        f"INSERT INTO {VERSION_TABLE} (table_name, version) VALUES (%s, 1) "
+        f"ON DUPLICATE KEY UPDATE version = version + 1", (table_name,))
+
+def table_version(conn, table_name):
+    """テーブルの更新番号を返す（一度も書き込まれていない場合は 0）。"""
+    result = conn.exec_driver_sql(f"SELECT version FROM {VERSION_TABLE} WHERE table_name = %s", (table_name,))
+    return result.scalar() or 0
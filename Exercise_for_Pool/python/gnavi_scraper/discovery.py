@@ -0,0 +1,425 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗URLのインデックス（サイトマップ・検索結果ページからの店舗の発見）
+
+店舗 N 件目まで取得するには、検索結果ページ（1 ページ 30 件）を 1 ページ目から順に
+N/30 ページたどる必要があり、深いページほど遅く、失敗しやすくなります。
+このモジュールは店舗URLを前もって集めてファイルに保存し、`scrape --offset` で
+任意の範囲の店舗を、検索結果ページをたどらずに直接取得できるようにします。
+
+店舗URLは次の 2 つの方法で集めます（どちらも並列に取得する）。
+
+- サイトマップ: サイトマップインデックスと、その子のサイトマップ（gzip 圧縮にも対応）から
+  店舗ページの URL を取り出す。前回から lastmod が変わっていない子のサイトマップは取得しない。
+- 検索結果ページ: エリアごとの検索結果ページを、ページ番号 (?p=) を付けて並列に取得する。
+  前回の取得から `refresh_hours` 時間経っていない検索条件は取得しない。
+
+インデックスへの店舗の追加は発見した順に行い、既にある店舗の順番は変えないため、
+更新してもそれまでの範囲（offset）の指す店舗は変わりません。
+
+実行方法:
+    python3 -m gnavi_scraper discover --index store_index.json --area tokyo --area osaka -j 8
+    python3 -m gnavi_scraper discover --index store_index.json --sitemap https://r.gnavi.co.jp/sitemap.xml
+    python3 -m gnavi_scraper scrape --index store_index.json --offset 3000 -n 500 -j 8
+
+"""
+import argparse                                     # コマンドライン引数の解析
+import gzip                                         # gzip 圧縮されたサイトマップの展開
+import json                                         # インデックスファイルの読み書き
+import os                                           # ファイルの置き換え
+import re                                           # 店舗ページの URL の判定
+import sys                                          # セレクタの変化による異常終了
+import threading                                    # 状態の保護、スレッドごとのセッション
+import time                                         # 発見・取得した時刻、再試行の間隔
+from collections import deque                       # 再試行するページ
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED   # 並列の取得
+from urllib.parse import urlparse                   # 店舗ページのサイトのホスト
+from xml.etree import ElementTree                   # サイトマップの解析
+from .links import fetch_search_page, with_page
+from .metrics import METRICS
+from .selector_health import SelectorHealth, SelectorDriftError
+
+# 店舗ページのサイト（合成サイト `loadgen` で試す場合は 'http://127.0.0.1:8080' などに変える）
+STORE_SITE = 'https://r.gnavi.co.jp'
+# 店舗ページのパス（ホスト直下の 1 階層で、数字を含む店舗ID。/area/ などの一覧ページは含まない）
+STORE_PATH_PATTERN = r'/([0-9a-z]*[0-9][0-9a-z]*)/?$'
+# サイトマップの XML 名前空間
+SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+def store_url(url, site=STORE_SITE):
+    """URL が店舗ページのものなら、正規化した URL（`site` のスキーム、末尾に /）を返す。
+
+    Args:
+        url (str): URL。
+        site (str): 店舗ページのサイト（スキームとホスト。http / https のどちらの URL も受け付ける）。
+
+    Returns:
+        str or None: 店舗ページの URL。店舗ページでない場合は None。
+    """
+    host = urlparse(site).netloc
+    match = re.match(r'^https?://' + re.escape(host) + STORE_PATH_PATTERN, url.strip())
+    return f"{site.rstrip('/')}/{match.group(1)}/" if match else None
+
+def parse_sitemap(content):
+    """サイトマップ（またはサイトマップインデックス）を解析する。
+
+    Args:
+        content (bytes): サイトマップの内容（gzip 圧縮されていてもよい）。
+
+    Returns:
+        tuple: (子のサイトマップの (URL, lastmod) のリスト, ページの (URL, lastmod) のリスト)。
+    """
+    if content[:2] == b'\x1f\x8b':
+        content = gzip.decompress(content)
+    root = ElementTree.fromstring(content)
+    entries = [(element.findtext(f'{SITEMAP_NS}loc', '').strip(), element.findtext(f'{SITEMAP_NS}lastmod'))
+               for element in root]
+    if root.tag == f'{SITEMAP_NS}sitemapindex':
+        return entries, []
+    return [], entries
+
+class StoreIndex:
+    """店舗URLのインデックス（JSON ファイルに保存）。
+
+    Args:
+        path (str or None): インデックスファイルのパス（None の場合は保存しない）。
+        site (str): 店舗ページのサイト（これ以外のホストの URL は追加しない）。
+
+    Attributes:
+        stores (dict): 店舗URL → {'source': 発見した取得元, 'first_seen': 時刻, 'last_seen': 時刻,
+            'lastmod': サイトマップの lastmod}。発見した順に並ぶ。
+        sources (dict): 取得元（サイトマップまたは検索条件の URL）→ {'fetched_at': 時刻,
+            'lastmod': サイトマップの lastmod, 'stores': 店舗数}。
+
+    Notes:
+        - `with` 文で使用すると、終了時にファイルに保存する。
+        - 複数スレッドから同時に `add` を呼び出せる。
+    """
+
+    def __init__(self, path=None, site=STORE_SITE):
+        self.path = path
+        self.site = site
+        self.stores = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.stores = data['stores']
+            self.sources = data['sources']
+        METRICS.gauge_function('gnavi_index_stores', lambda: len(self.stores))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save()
+        return False
+
+    def __len__(self):
+        return len(self.stores)
+
+    def add(self, source, urls, lastmods=None):
+        """取得元で見つかった店舗URLを記録する。
+
+        Args:
+            source (str): 取得元の URL。
+            urls (list): 店舗ページの URL（店舗ページでない URL は無視する）。
+            lastmods (list or None): `urls` と同じ順の lastmod。
+
+        Returns:
+            int: 新しく追加した店舗数。
+        """
+        now = time.time()
+        added = 0
+        lastmods = lastmods or [None] * len(urls)
+        with self._lock:
+            for url, lastmod in zip(urls, lastmods):
+                url = store_url(url, self.site)
+                if url is None:
+                    continue
+                entry = self.stores.get(url)
+                if entry is None:
+                    entry = self.stores[url] = {'source': source, 'first_seen': now, 'lastmod': None}
+                    added += 1
+                entry['last_seen'] = now
+                entry['lastmod'] = lastmod or entry['lastmod']
+        METRICS.inc('gnavi_index_discovered_total', added)
+        return added
+
+    def mark_fetched(self, source, stores, lastmod=None):
+        """取得元を取得し終えたことを記録する。"""
+        with self._lock:
+            self.sources[source] = {'fetched_at': time.time(), 'lastmod': lastmod, 'stores': stores}
+
+    def is_fresh(self, source, max_age, lastmod=None):
+        """取得元を取得し直す必要がないかを返す。
+
+        Args:
+            source (str): 取得元の URL。
+            max_age (float): 取得し直すまでの秒数（検索条件の場合）。
+            lastmod (str or None): サイトマップインデックスに書かれた lastmod（子のサイトマップの場合）。
+
+        Returns:
+            bool: lastmod が前回と同じ場合、または lastmod がなく前回の取得から `max_age` 秒経っていない場合は True。
+        """
+        state = self.sources.get(source)
+        if state is None:
+            return False
+        if lastmod is not None:
+            return state['lastmod'] == lastmod
+        return time.time() - state['fetched_at'] < max_age
+
+    def slice(self, start, stop=None):
+        """発見した順で `start` 番目から `stop` 番目の手前までの店舗URLを返す。"""
+        with self._lock:
+            urls = list(self.stores)
+        return urls[start:stop]
+
+    def prune(self, max_age):
+        """最後に見つかってから `max_age` 秒経った店舗を削除する（閉店した店舗など）。
+
+        Returns:
+            int: 削除した店舗数。
+
+        Notes:
+            - 削除すると、それより後の店舗の位置（offset）がずれる。
+        """
+        limit = time.time() - max_age
+        with self._lock:
+            stale = [url for url, entry in self.stores.items() if entry['last_seen'] < limit]
+            for url in stale:
+                del self.stores[url]
+        return len(stale)
+
+    def save(self):
+        """インデックスをファイルに保存する。"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {'stores': dict(self.stores), 'sources': dict(self.sources)}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+def crawl_sitemaps(index, sitemap_urls, workers=8, timeout=10.0):
+    """サイトマップを並列に取得し、店舗URLをインデックスに追加する。
+
+    Args:
+        index (StoreIndex): 追加先のインデックス。
+        sitemap_urls (list): サイトマップ（またはサイトマップインデックス）の URL。
+        workers (int): 並列に取得するスレッド数。
+        timeout (float): リクエストのタイムアウト（秒）。
+
+    Returns:
+        int: 新しく追加した店舗数。
+
+    Notes:
+        - サイトマップインデックスは毎回取得し、その子のサイトマップは lastmod が変わったものだけ取得する。
+    """
+    import requests                                 # サイトマップの取得
+    from .backends.requests_backend import HEADERS  # User-Agent
+
+    local = threading.local()
+
+    def fetch(url):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            local.session.headers.update(HEADERS)
+        try:
+            response = local.session.get(url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Request error: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"Sitemap loading failed: {url} ({response.status_code})")
+            return None
+        return response.content
+
+    def crawl(url, lastmod):
+        with METRICS.timer('discover'):
+            content = fetch(url)
+        if content is None:
+            return [], 0
+        try:
+            children, pages = parse_sitemap(content)
+        except ElementTree.ParseError as e:
+            print(f"Invalid sitemap: {url} ({e})")
+            return [], 0
+        added = index.add(url, [loc for loc, _ in pages], [mod for _, mod in pages]) if pages else 0
+        if pages or not children:
+            index.mark_fetched(url, len(pages), lastmod)
+        return [(loc, mod) for loc, mod in children if not index.is_fresh(loc, 0, mod)], added
+
+    added = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(crawl, url, None) for url in sitemap_urls}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                children, count = future.result()
+                added += count
+                for loc, mod in children:
+                    pending.add(executor.submit(crawl, loc, mod))
+    print(f"Sitemaps: {added} new stores ({len(index)} in the index)")
+    return added
+
+def crawl_listings(index, fetcher, start_urls, workers=8, max_pages=1000, max_age=24 * 3600, selectors=None,
+                   retries=2, retry_delay=1.0):
+    """検索条件ごとの検索結果ページを並列に取得し、店舗URLをインデックスに追加する。
+
+    Args:
+        index (StoreIndex): 追加先のインデックス。
+        fetcher (object): ページ取得のバックエンド。
+        start_urls (list): 検索条件ごとの最初の検索結果ページの URL。
+        workers (int): 並列に取得するページ数（バックエンドが複数スレッドに対応していない場合は 1）。
+        max_pages (int): 検索条件ごとに取得する最大ページ数。
+        max_age (float): 前回の取得からこの秒数が経っていない検索条件は取得しない。
+        selectors (SelectorHealth or None): 店舗リンクのセレクタと、その変化の検知。
+        retries (int): 取得に失敗したページを取得し直す最大回数。
+        retry_delay (float): 最初の再試行までの待ち時間（秒）。以降は試行回数に比例して延ばす。
+
+    Returns:
+        int: 新しく追加した店舗数。
+
+    Raises:
+        SelectorDriftError: 最初に取得した 1 ページ目で、どのセレクタでも店舗リンクが見つからない場合。
+
+    Notes:
+        - セレクタを確認するため、最初の検索条件の 1 ページ目を取得し終えるまでは他のページを取得しない。
+          その後は、1 ページ目に店舗があった検索条件だけ 2 ページ目以降を並列に取得する。
+        - 検索条件ごとにページ番号の小さい順に取得を始め、店舗が見つからなかったページ以降は取得しない
+          （既に取得を始めた後ろのページの結果は使う）。
+        - 取得に失敗したページ（HTTP エラーやタイムアウト）は検索結果の終わりとはみなさず、取得し直す。
+          それでも失敗したページがある検索条件は、取得日時を記録しない（次回の実行で再び取得する）。
+        - 複数の検索条件のページは交互に取得する。
+        - インデックスには、取得し終えた順ではなく、検索条件・ページ番号の順に追加する
+          （同じ検索結果から作ったインデックスの店舗の順番が、取得の速さによって変わらないようにする）。
+    """
+    workers = workers if getattr(fetcher, 'concurrent', False) else 1
+    selectors = selectors or SelectorHealth()
+    sources = [url for url in start_urls if not index.is_fresh(url, max_age)]
+    for url in start_urls:
+        if url not in sources:
+            print(f"Skipped (fetched within {max_age / 3600:.0f}h): {url}")
+    next_page = {url: 1 for url in sources}
+    last_page = {url: max_pages for url in sources}
+    opened = set()          # 1 ページ目に店舗があった検索条件（2 ページ目以降を取得する）
+    incomplete = set()      # 取得に失敗したページが残った検索条件
+    retry = deque()         # 取得し直すページ (検索条件, ページ番号, 試行回数)
+
+    def crawl(source, page, attempt=0):
+        if attempt:
+            time.sleep(retry_delay * attempt)
+        with METRICS.timer('discover'):
+            rs_links, next_url = fetch_search_page(fetcher, with_page(source, page), page, selectors)
+        # fetch_search_page は取得に失敗した場合だけ次ページの URL を返さない
+        return source, page, attempt, rs_links, next_url is None
+
+    def submit_next(executor, pending):
+        while retry and len(pending) < workers:
+            pending.add(executor.submit(crawl, *retry.popleft()))
+        # 最初の 1 ページ目でセレクタを確認するまでは、1 ページずつ取得する
+        if not opened and pending:
+            return
+        # 取得するページが残っている検索条件から、順番に 1 ページずつ取得を始める
+        while len(pending) < workers:
+            candidates = [url for url in sources if next_page[url] <= last_page[url]
+                          and (next_page[url] == 1 or url in opened)]
+            if not candidates:
+                return
+            for url in candidates:
+                if len(pending) >= workers:
+                    return
+                pending.add(executor.submit(crawl, url, next_page[url]))
+                next_page[url] += 1
+                if not opened:
+                    return
+
+    results = {}        # (検索条件, ページ番号) → 店舗URLのリスト
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        submit_next(executor, pending)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                source, page, attempt, rs_links, failed = future.result()
+                if page > last_page[source]:
+                    continue
+                if failed and attempt < retries:
+                    retry.append((source, page, attempt + 1))
+                elif failed:
+                    print(f"Failed to fetch page {page} after {retries} retries: {source}")
+                    incomplete.add(source)
+                elif rs_links:
+                    results[source, page] = rs_links
+                    if page == 1:
+                        opened.add(source)
+                else:
+                    last_page[source] = min(last_page[source], page - 1)
+            submit_next(executor, pending)
+
+    added = 0
+    for source in sources:
+        pages = [results[source, page] for page in range(1, last_page[source] + 1) if (source, page) in results]
+        for rs_links in pages:
+            added += index.add(source, rs_links)
+        found = sum(len(rs_links) for rs_links in pages)
+        if source in incomplete:
+            print(f"{source}: {found} stores in {len(pages)} pages (incomplete; fetched again next run)")
+            continue
+        index.mark_fetched(source, found)
+        print(f"{source}: {found} stores in {len(pages)} pages")
+    print(f"Listings: {added} new stores ({len(index)} in the index)")
+    return added
+
+def main(argv=None):
+    """コマンドライン引数と設定ファイルを読み込み、店舗URLのインデックスを作成・更新する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    from .cli import open_fetcher, save_snapshot            # ページ取得のバックエンドの作成、調査用の保存
+    from .config import add_arguments, args_to_overrides, load_config, start_urls   # 設定の読み込み
+
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper discover',
+                                     description='サイトマップ・検索結果ページから店舗URLのインデックスを作成・更新する')
+    add_arguments(parser)
+    parser.add_argument('--no-listings', action='store_true',
+                        help='検索結果ページは取得しない（サイトマップだけを使う）')
+    parser.add_argument('--max-pages', type=int, default=1000, help='検索条件ごとに取得する最大ページ数')
+    parser.add_argument('--prune-days', type=float, default=0,
+                        help='この日数見つからなかった店舗をインデックスから削除する（0 で削除しない）')
+    args = parser.parse_args(argv)
+    try:
+        config = load_config(args.config, args_to_overrides(args))
+    except ValueError as e:
+        parser.error(str(e))
+
+    discovery, fetch = config['discovery'], config['fetch']
+    if not discovery['index']:
+        parser.error('specify --index')
+
+    with StoreIndex(discovery['index'], discovery['store_site']) as index:
+        before = len(index)
+        if discovery['sitemaps']:
+            crawl_sitemaps(index, discovery['sitemaps'], fetch['workers'], fetch['timeout'])
+        if not args.no_listings:
+            try:
+                with open_fetcher(fetch) as fetcher:
+                    crawl_listings(index, fetcher, start_urls(config), max(fetch['workers'], fetch['tabs']),
+                                   args.max_pages, discovery['refresh_hours'] * 3600,
+                                   SelectorHealth(config['scope']['search_link']))
+            except SelectorDriftError as e:
+                print(f"\nError: {e}\n{e.diagnostic}")
+                if e.html is not None:
+                    snapshot = save_snapshot(e.html)
+                    print(f"Saved the page to {snapshot} for inspection.")
+                sys.exit(2)     # 検索結果ページから店舗を取り出せないため、異常終了とする
+        if args.prune_days:
+            print(f"Pruned {index.prune(args.prune_days * 86400)} stores")
+        print(f"Index: {len(index)} stores ({len(index) - before:+d})")
+
+if __name__ == "__main__":
+    main()
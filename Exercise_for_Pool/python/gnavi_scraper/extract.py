@@ -0,0 +1,271 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗ページ・検索結果ページからの情報抽出
+
+取得方法（requests / Selenium）に依存しない抽出処理をまとめたモジュールです。
+どのバックエンドも取得した HTML をこのモジュールに渡し、同じ規則で店舗情報を取り出します。
+
+"""
+import re                               # 正規表現を扱う
+import json                             # JSONデータの読み書き
+from urllib.parse import urljoin        # 相対URLの解決
+from bs4 import BeautifulSoup           # HTMLのスクレイピング
+
+# 検索結果ページの店舗リンク
+SEARCH_LINK_SELECTOR = 'a.style_titleLink__oiHVJ'
+# 店舗リンクの代替セレクタ（クラス名のハッシュ部分が変わった場合 → 構造による判定の順に試す）
+SEARCH_LINK_FALLBACKS = [
+    'a[class^="style_titleLink__"]',
+    'a[class*="titleLink"]',
+    'h2 a[href^="https://r.gnavi.co.jp/"]',
+]
+# 検索結果ページの「次へ（>）」アイコン
+NEXT_ICON_CLASS = 'style_nextIcon__M_Me_'
+# 店舗ページの店舗情報テーブル
+STORE_TABLE_CLASS = 'basic-table'
+# 店舗情報テーブルの代替セレクタ（店舗名のセルを含むテーブル）
+STORE_TABLE_FALLBACK = '#info-name'
+
+# 出力する列（店舗URL はぐるなびの店舗ページの URL で、MySQL では一意キーになる。
+# SSL確認 は SSL 証明書の確認結果や、サーキットブレーカーで接続しなかった理由のメッセージ）
+ROW_COLUMNS = ['店舗URL', '店舗名', '電話番号', 'メールアドレス', '都道府県', '市区町村', '番地', '建物名', 'URL', 'SSL',
+               'SSL確認']
+# CSV に出力する列（従来の 1-1.csv / 1-2.csv と同じ）
+CSV_COLUMNS = ROW_COLUMNS[1:10]
+
+# 住所の正規表現（都道府県、市区町村、番地 の分割）
+PREFECTURE_PATTERN = r'(...??[都道府県])'
+CITY_PATTERN = \
+    r'((?:旭川|伊達|石狩|盛岡|奥州|田村|南相馬|那須塩原|東村山|武蔵村山|羽村|十日町|上越|富山|野々市|大町|蒲郡|四日市|姫路|大和郡山|廿日市|下松|岩国|田川|大村)市.+?|' \
+    r'.+?郡(?:玉村|大町|.+?)[町村].+?|' \
+    r'.+?市.+?区|.+?[市区町村].+?)'
+STREET_PATTERN = r'(\d.*)'
+ADDRESS_REGEX = re.compile(PREFECTURE_PATTERN + CITY_PATTERN + STREET_PATTERN)
+
+# メールアドレスのリンク
+EMAIL_REGEX = re.compile(r'mailto:.*')
+
+def empty_row(rs_url=''):
+    """すべての項目が空の店舗情報（エラー時の初期値）を返す。
+
+    Args:
+        rs_url (str): 店舗ページの URL。
+
+    Returns:
+        dict: `ROW_COLUMNS` をキーとする辞書。
+    """
+    row = dict.fromkeys(ROW_COLUMNS, '')
+    row['店舗URL'] = rs_url
+    row['SSL'] = False
+    return row
+
+def parse_html(html):
+    """HTML を BeautifulSoup オブジェクトに変換する。
+
+    Args:
+        html (str or bytes): ページの HTML。
+
+    Returns:
+        BeautifulSoup: 解析済みの HTML。
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", "ignore")
+    return BeautifulSoup(html, "html.parser")
+
+def get_rs_data_member(info_table, data_type):
+    """店舗情報テーブルから指定されたデータを取得する汎用関数。
+
+    Args:
+        info_table (bs4.element.Tag): 店舗情報のHTMLテーブル。
+        data_type (str): 取得する情報のタイプ ('name', 'phone', 'email')
+
+    Returns:
+        str: 取得したデータ、存在しない場合は空文字。
+
+    Raises:
+        ValueError: `data_type` が 'name', 'phone', 'email' 以外の場合。
+
+    Notes:
+        - メールアドレスは店舗情報テーブルの中だけを検索する（ページ全体は検索しない）。
+    """
+    # 店舗名を取得
+    if data_type == 'name':
+        name_elem = info_table.find(id='info-name')
+        return name_elem.get_text(strip=True) if name_elem else ''
+
+    # 電話番号を取得
+    elif data_type == 'phone':
+        phone_elem = info_table.find(id='info-phone')
+        number_elem = phone_elem.find(class_='number') if phone_elem else None
+        return number_elem.get_text(strip=True) if number_elem else ''
+
+    # メールアドレスを取得
+    elif data_type == 'email':
+        email_elem = info_table.find('a', href=EMAIL_REGEX)
+        return email_elem.get('href').replace('mailto:', '').strip() if email_elem else ''
+
+    # 無効な data_type の場合に備えてエラーメッセージを出す
+    raise ValueError(f"Invalid data_type: {data_type}")
+
+def find_store_table(soup):
+    """店舗ページから店舗情報テーブルを探す。
+
+    Args:
+        soup (BeautifulSoup): 店舗ページ全体のBeautifulSoupオブジェクト。
+
+    Returns:
+        bs4.element.Tag or None: 店舗情報テーブル。見つからない場合は None。
+
+    Notes:
+        - クラス名で見つからない場合は、店舗名のセル（`STORE_TABLE_FALLBACK`）を含むテーブルを使う。
+    """
+    info_table = soup.find(class_=STORE_TABLE_CLASS)
+    if info_table:
+        return info_table
+    name_elem = soup.select_one(STORE_TABLE_FALLBACK)
+    return name_elem.find_parent('table') if name_elem else None
+
+def split_address(region):
+    """住所の文字列を都道府県・市区町村・番地に分割する。
+
+    Args:
+        region (str): 住所（建物名を除く）。
+
+    Returns:
+        tuple: (都道府県, 市区町村, 番地)。分割できない場合はすべて空文字。
+    """
+    match = ADDRESS_REGEX.match(region)
+    if match:
+        return match.groups()
+    return '', '', ''
+
+def get_address(info_table):
+    """住所情報（都道府県、市区町村、番地、建物名）を取得する。
+
+    Args:
+        info_table (bs4.element.Tag): 店舗情報のHTMLテーブル。
+
+    Returns:
+        dict: 住所情報 {'都道府県': str, '市区町村': str, '番地': str, '建物名': str}
+    """
+    # 各種変数を用意（エラー時には空文字を返す）
+    prefecture, city, street, locality = '', '', '', ''
+
+    # 住所・建物名の情報をもつ要素を取得する
+    adr_slink = info_table.find(class_='adr slink')
+    if adr_slink:
+        # 住所を取得して分割
+        region_elem = adr_slink.find(class_='region')
+        region = region_elem.get_text(strip=True) if region_elem else ''
+        prefecture, city, street = split_address(region)
+
+        # 建物名を取得
+        locality_elem = adr_slink.find(class_='locality')
+        if locality_elem:
+            locality = locality_elem.get_text(strip=True)
+
+    return {
+        '都道府県': prefecture,
+        '市区町村': city,
+        '番地': street,
+        '建物名': locality
+    }
+
+def get_url(info_table, soup):
+    """ページに記載された店舗公式URLを取得する（リダイレクトは追跡しない）。
+
+    取得方法は以下の 2 段階で行う。
+    1. `data-o` 属性に格納されている JSON 形式のデータを解析し、URL を構築する。
+    2. `data-o` から取得できない場合、代替手段として `sv-site` ID 内のリンクを取得する。
+
+    Args:
+        info_table (bs4.element.Tag): 店舗情報のHTMLテーブル。
+        soup (BeautifulSoup): 店舗ページ全体のBeautifulSoupオブジェクト。
+
+    Returns:
+        str or None: 店舗公式URL。取得できない場合は None。
+
+    Notes:
+        - リダイレクト後の最終URLは `official_site.resolve_url` で取得する。
+    """
+    url = None
+
+    # 店舗公式URLの情報をもつ要素を取得する
+    link_elem = info_table.find('a', class_='url go-off')
+    if link_elem:
+        # カスタムデータ属性 'data-o' から値を取得（JSON 形式の文字列が格納されている）
+        data_o = link_elem.get('data-o')
+        if data_o:
+            try:
+                data = json.loads(data_o)           # JSONデコード（&quot; を " に変換）
+                url = f"{data['b']}://{data['a']}"  # プロトコルとドメインを結合
+            except (json.JSONDecodeError, KeyError, TypeError):
+                print("No official URL. Proceed to alternative method.")
+
+    # 代替手段でURLを取得（'data-o' から取得できなかった場合）
+    if not url:
+        sv_site = soup.find(id='sv-site')
+        if sv_site:
+            link_elem = sv_site.find('a', class_='sv-of double')
+            if link_elem:
+                url = link_elem.get('href')
+
+    # 明示的に None や "" の場合を除外 (どの手段でも取得できなかった場合)
+    return url or None
+
+def extract_rs_data(html, rs_url=''):
+    """店舗ページの HTML から店舗情報を抽出する。
+
+    Args:
+        html (str or bytes): 店舗ページの HTML。
+        rs_url (str): 店舗ページの URL。
+
+    Returns:
+        dict: `ROW_COLUMNS` をキーとする店舗情報。
+            'URL' にはページに記載された公式URL（リダイレクト前）を、'SSL' には False を格納する。
+            店舗情報テーブルがない場合は `empty_row` の値を返す。
+    """
+    row = empty_row(rs_url)
+    soup = parse_html(html)
+
+    # 店舗情報テーブルを取得
+    info_table = find_store_table(soup)
+    if not info_table:
+        return row  # テーブルがない場合はデフォルト値を返す
+
+    row['店舗名'] = get_rs_data_member(info_table, 'name')
+    row['電話番号'] = get_rs_data_member(info_table, 'phone')
+    row['メールアドレス'] = get_rs_data_member(info_table, 'email')
+    row.update(get_address(info_table))
+    row['URL'] = get_url(info_table, soup)
+    return row
+
+def parse_search_page(html, page_url, link_selector=SEARCH_LINK_SELECTOR):
+    """検索結果ページの HTML から、店舗ページの URL と次ページの URL を取り出す。
+
+    Args:
+        html (str or bytes): 検索結果ページの HTML。
+        page_url (str): 検索結果ページの URL（相対URLの解決に使用）。
+        link_selector (str): 店舗リンクの CSS セレクタ。
+
+    Returns:
+        tuple: (店舗ページの URL のリスト, 次ページの URL または None)
+    """
+    soup = parse_html(html)
+
+    rs_links = []
+    for a in soup.select(link_selector):
+        href = a.get('href')
+        if href:
+            # 相対URLの場合は検索結果ページを基準に完全なURLを生成
+            rs_links.append(urljoin(page_url, href))
+
+    # 「>」アイコンを囲む <a> 要素の href を次ページの URL とする
+    next_url = None
+    next_icon = soup.find(class_=NEXT_ICON_CLASS)
+    if next_icon:
+        anchor = next_icon if next_icon.name == 'a' else next_icon.find_parent('a')
+        if anchor and anchor.get('href'):
+            next_url = urljoin(page_url, anchor.get('href'))
+
+    return rs_links, next_url
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""テールレイテンシの抑制（ヘッジリクエストと処理ごとの期限）
+
+応答の遅い店舗ページや店舗公式サイトが 1 つあるだけで、並列に取得していても全体が待たされます。
+
+- ヘッジリクエスト: 店舗ページの取得が最近の応答時間の p95 を超えても終わらない場合、
+  同じページをもう 1 回取得し、先に返った結果を使う。
+- 処理ごとの期限: 店舗ページの取得・公式URLのリダイレクト確認・SSL 証明書の確認に、
+  タイムアウト（ソケット操作ごと）とは別に全体の期限を設け、超えたら待たずに既定値を返す。
+
+期限を超えた処理のスレッドは止められないため、結果を捨てて先に進みます
+（requests のタイムアウトと SSL の接続タイムアウトにより、いずれ終了します）。
+
+"""
+import bisect                                       # 応答時間の並べ替え済みリストへの挿入
+import threading                                    # 応答時間の記録の排他制御
+import time                                         # 応答時間の計測
+from collections import deque                       # 直近の応答時間
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED   # 期限付きの実行
+from .metrics import METRICS
+
+class LatencyTracker:
+    """直近の応答時間から分位点を求める。
+
+    Args:
+        quantile (float): ヘッジリクエストを送る分位点（例: 0.95）。
+        window (int): 分位点の計算に使う直近の件数。
+        min_samples (int): 分位点を使い始めるまでに必要な件数（それまではヘッジしない）。
+    """
+
+    def __init__(self, quantile=0.95, window=200, min_samples=20):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._recent = deque(maxlen=window)     # 記録順の応答時間
+        self._sorted = []                       # 並べ替え済みの応答時間
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """応答時間を記録する。"""
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._sorted.pop(bisect.bisect_left(self._sorted, self._recent[0]))
+            self._recent.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def threshold(self):
+        """ヘッジリクエストを送るまでの待ち時間（秒）を返す。件数が足りない場合は None。"""
+        with self._lock:
+            if len(self._sorted) < self.min_samples:
+                return None
+            return self._sorted[min(int(len(self._sorted) * self.quantile), len(self._sorted) - 1)]
+
+class Hedger:
+    """ヘッジリクエストと期限付きの実行を行う。
+
+    Args:
+        deadline (float or None): 1 回の処理の期限（秒）。None または 0 の場合は期限なし。
+        hedge (bool): True の場合、店舗ページの取得でヘッジリクエストを送る。
+        quantile (float): ヘッジリクエストを送る分位点。
+        max_workers (int): 期限付きで実行するスレッドの最大数。
+
+    Notes:
+        - `with` 文で使用すると、終了時にスレッドプールを閉じる（期限を超えた処理は待たない）。
+        - ヘッジリクエストは、同じ処理を 2 回実行しても問題のない処理（GET）にだけ使う。
+    """
+
+    def __init__(self, deadline=30.0, hedge=True, quantile=0.95, max_workers=32):
+        self.deadline = deadline or None
+        self.hedge = hedge
+        self.latency = LatencyTracker(quantile)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedger')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        """スレッドプールを閉じる。"""
+        self._executor.shutdown(wait=False)
+
+    def call(self, stage, func, *args, default=None):
+        """期限付きで `func(*args)` を実行する。
+
+        Args:
+            stage (str): 処理の段階の名前（メトリクスに記録する）。
+            func (callable): 実行する関数。
+            *args: 関数の引数。
+            default (object): 期限を超えた場合に返す値。
+
+        Returns:
+            object: 関数の戻り値。期限を超えた場合は `default`。
+        """
+        if self.deadline is None:
+            return func(*args)
+        future = self._executor.submit(func, *args)
+        done, _ = wait([future], timeout=self.deadline)
+        if not done:
+            METRICS.inc('gnavi_deadline_exceeded_total', stage=stage)
+            print(f"Deadline exceeded ({self.deadline:.0f}s): {stage} {args[0] if args else ''}")
+            return default
+        return future.result()
+
+    def fetch(self, fetcher, url, wait_for=None):
+        """店舗ページを取得する。p95 を超えても終わらない場合はヘッジリクエストを送る。
+
+        Args:
+            fetcher (object): ページ取得のバックエンド（複数スレッドから使用できるもの）。
+            url (str): 取得するページの URL。
+            wait_for (str or None): バックエンドに渡す、待機する要素の CSS セレクタ。
+
+        Returns:
+            bytes or str or None: ページの HTML。取得に失敗したか、期限を超えた場合は None。
+
+        Notes:
+            - どちらかが HTML を返した時点でその結果を使う。先に返った方が失敗（None）の場合は、
+              もう一方の結果を期限まで待つ。
+        """
+        start = time.perf_counter()
+        delay = self.latency.threshold() if self.hedge else None
+        deadline = start + self.deadline if self.deadline else None
+        futures = [self._executor.submit(fetcher.fetch, url, wait_for)]
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay if deadline is None else min(delay, remaining()))
+            if not done and (deadline is None or remaining() > 0):
+                METRICS.inc('gnavi_hedges_total', result='sent')
+                futures.append(self._executor.submit(fetcher.fetch, url, wait_for))
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                METRICS.inc('gnavi_deadline_exceeded_total', stage='fetch')
+                print(f"Deadline exceeded ({self.deadline:.0f}s): fetch {url}")
+                return None
+            for future in done:
+                html = future.result()
+                if html is not None:
+                    self.latency.record(time.perf_counter() - start)
+                    if future is not futures[0]:
+                        METRICS.inc('gnavi_hedges_total', result='won')
+                    return html
+        return None
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗情報の変更履歴
+
+ex2_2 テーブルは店舗URLごとに最新の 1 行だけを持つ「現在」テーブルとして扱い、
+変更があった項目だけを取得日でパーティション分割した履歴テーブルに記録します。
+古い履歴はパーティションごと削除できるため、削除のコストは行数に依存しません。
+
+実行方法（パーティションの追加と古いパーティションの削除）:
+    python3 -m gnavi_scraper history --keep-days 90
+
+"""
+import argparse                         # コマンドライン引数の解析
+import datetime                         # 取得日・パーティション境界の計算
+import json                             # 変更内容を JSON で記録する
+
+# 履歴を記録する列（ID・店舗URL・取得日時以外）
+TRACKED_COLUMNS = ['店舗名', '電話番号', 'メールアドレス', '都道府県', '市区町村', '番地', '建物名', 'URL', 'SSL']
+
+def _normalize(value):
+    """比較用に値をそろえる（None は空文字、bool は 0/1）。"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def diff_row(current, row):
+    """現在の行と新しい行を比較し、変更された項目を返す。
+
+    Args:
+        current (dict or None): 現在テーブルの行。存在しない場合は None。
+        row (dict): 新しく取得した行。
+
+    Returns:
+        dict: 変更された項目 {列名: 新しい値}。新規の店舗の場合はすべての項目。
+    """
+    changes = {}
+    for column in TRACKED_COLUMNS:
+        if column not in row:
+            continue
+        new_value = _normalize(row[column])
+        if current is None or _normalize(current.get(column)) != new_value:
+            changes[column] = new_value
+    return changes
+
+def record_changes(conn, table_name, history_table, rows):
+    """新しい行を現在テーブルと比較し、変更があった項目を履歴テーブルに追加する。
+
+    現在テーブルへの書き込み（upsert）より前に、同じトランザクション内で呼び出す。
+
+    Args:
+        conn (sqlalchemy.engine.Connection): トランザクション中のデータベース接続。
+        table_name (str): 現在テーブルの名前（例: 'ex2_2'）。
+        history_table (str): 履歴テーブルの名前（例: 'ex2_2_history'）。
+        rows (list): 新しく取得した行 (dict) のリスト。'店舗URL' を含む。
+
+    Returns:
+        int: 履歴テーブルに追加した行数。
+    """
+    urls = [row['店舗URL'] for row in rows if row.get('店舗URL')]
+    if not urls:
+        return 0
+
+    # 現在の値をまとめて取得
+    columns = ', '.join(f'`{column}`' for column in ['店舗URL'] + TRACKED_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(urls))
+    result = conn.exec_driver_sql(
+        f"SELECT {columns} FROM {table_name} WHERE `店舗URL` IN ({placeholders})", tuple(urls))
+    current_rows = {current['店舗URL']: dict(current) for current in result.mappings()}
+
+    now = datetime.datetime.now().replace(microsecond=0)
+    history_rows = []
+    for row in rows:
+        url = row.get('店舗URL')
+        if not url:
+            continue
+        current = current_rows.get(url)
+        changes = diff_row(current, row)
+        if changes:
+            history_rows.append((url, now.date(), now, 'new' if current is None else 'update',
+                                 json.dumps(changes, ensure_ascii=False, default=str)))
+
+    if history_rows:
+        conn.exec_driver_sql(
+            f"INSERT INTO {history_table} (`店舗URL`, `取得日`, `取得日時`, `変更種別`, `変更内容`) "
+            f"VALUES (%s, %s, %s, %s, %s)", history_rows)
+    return len(history_rows)
+
+def _partition_name(day):
+    """取得日に対応するパーティション名を返す（例: p20250313）。"""
+    return f"p{day:%Y%m%d}"
+
+def list_partitions(conn, history_table):
+    """履歴テーブルのパーティション名のリストを返す。"""
+    result = conn.exec_driver_sql(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION", (history_table,))
+    return [name for (name,) in result]
+
+def ensure_partitions(conn, history_table, days_ahead=7, today=None):
+    """今日から days_ahead 日先までの日次パーティションを作成する。
+
+    Args:
+        conn (sqlalchemy.engine.Connection): データベース接続。
+        history_table (str): 履歴テーブルの名前。
+        days_ahead (int): 先に作成しておく日数。
+        today (datetime.date or None): 基準日（None の場合は今日）。
+
+    Returns:
+        list: 作成したパーティション名のリスト。
+
+    Notes:
+        - 末尾の pmax パーティションを分割して作成するため、pmax が空なら即座に終わる。
+    """
+    today = today or datetime.date.today()
+    existing = set(list_partitions(conn, history_table))
+    created = []
+    for offset in range(days_ahead + 1):
+        day = today + datetime.timedelta(days=offset)
+        name = _partition_name(day)
+        if name in existing:
+            continue
+        upper = day + datetime.timedelta(days=1)
+        conn.exec_driver_sql(
+            f"ALTER TABLE {history_table} REORGANIZE PARTITION pmax INTO ("
+            f"PARTITION {name} VALUES LESS THAN ('{upper:%Y-%m-%d}'), "
+            f"PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+        created.append(name)
+    return created
+
+def drop_old_partitions(conn, history_table, keep_days=90, today=None):
+    """keep_days 日より古い日次パーティションを削除する。
+
+    Args:
+        conn (sqlalchemy.engine.Connection): データベース接続。
+        history_table (str): 履歴テーブルの名前。
+        keep_days (int): 履歴を残す日数。
+        today (datetime.date or None): 基準日（None の場合は今日）。
+
+    Returns:
+        list: 削除したパーティション名のリスト。
+    """
+    today = today or datetime.date.today()
+    oldest = _partition_name(today - datetime.timedelta(days=keep_days))
+    dropped = [name for name in list_partitions(conn, history_table)
+               if name != 'pmax' and name < oldest]
+    if dropped:
+        conn.exec_driver_sql(f"ALTER TABLE {history_table} DROP PARTITION {', '.join(dropped)}")
+    return dropped
+
+def main(argv=None):
+    """履歴テーブルのパーティションを追加し、古いパーティションを削除する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper history', description='ex2_2_history のパーティションを管理する')
+    parser.add_argument('--table', default='ex2_2_history', help='履歴テーブルの名前')
+    parser.add_argument('--days-ahead', type=int, default=7, help='先に作成しておく日数')
+    parser.add_argument('--keep-days', type=int, default=90, help='履歴を残す日数')
+    args = parser.parse_args(argv)
+
+    from .db import create_db_engine      # MySQL への接続（SQLAlchemy を読み込む）
+
+    with create_db_engine().connect() as conn:
+        created = ensure_partitions(conn, args.table, args.days_ahead)
+        dropped = drop_old_partitions(conn, args.table, args.keep_days)
+    print(f"Created partitions: {created or 'none'}")
+    print(f"Dropped partitions: {dropped or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""検索結果ページ（または標準入力・ファイル）からの店舗URLの遅延取得"""
+import asyncio                                      # 非同期処理（検索結果の非同期ジェネレータ）
+import queue                                        # 入力の読み込みスレッドからの受け渡し
+import threading                                    # 入力の読み込みスレッド
+from concurrent.futures import ThreadPoolExecutor   # 次ページの先読み
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode   # ページ番号の付け替え
+from .extract import parse_search_page
+from .selector_health import SelectorHealth
+
+# 検索結果ページの URL
+SEARCH_URL = "https://r.gnavi.co.jp/area/jp/rs/"
+
+def with_page(url, page):
+    """URL のクエリ文字列のページ番号 (p) を付け替える。
+
+    Args:
+        url (str): 検索結果ページの URL。
+        page (int): ページ番号。
+
+    Returns:
+        str: ページ番号を付け替えた URL。
+    """
+    parsed = urlparse(url)
+    query = [(key, value) for key, value in parse_qsl(parsed.query) if key != 'p']
+    query.append(('p', str(page)))
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+def fetch_search_page(fetcher, page_url, page, selectors):
+    """検索結果ページを 1 ページ取得し、店舗URLと次ページの URL を返す。
+
+    Args:
+        fetcher (object): ページ取得のバックエンド。
+        page_url (str): 検索結果ページの URL。
+        page (int): ページ番号（次ページのリンクがない場合に使用）。
+        selectors (SelectorHealth): 店舗リンクのセレクタと、その変化の検知。
+
+    Returns:
+        tuple: (店舗ページの URL のリスト, 次ページの URL)。取得に失敗した場合は ([], None)。
+
+    Raises:
+        SelectorDriftError: 最初の検索結果ページで、どのセレクタでも店舗リンクが見つからない場合。
+
+    Notes:
+        - 次ページのリンクが HTML にない場合は、ページ番号 (?p=) を 1 つ進めた URL を次ページとする。
+    """
+    html = fetcher.fetch(page_url, wait_for=selectors.search_wait_for)
+    if html is None:
+        return [], None
+    rs_links, next_url = parse_search_page(html, page_url, selectors.link_selector)
+    rs_links, next_url = selectors.check_search_page(html, page_url, rs_links, next_url)
+    return rs_links, next_url or with_page(page_url, page + 1)
+
+def iter_rs_links(fetcher, rs_demand, start_url=SEARCH_URL, prefetch=True,
+                  first_page=1, last_page=None, selectors=None, seen=None):
+    """検索結果ページを順に巡回し、店舗ページのURLを 1 件ずつ返すジェネレータ。
+
+    Args:
+        fetcher (object): ページ取得のバックエンド。
+        rs_demand (int): 目標取得件数。この件数を返した時点で終了する。
+        start_url (str): 最初の検索結果ページの URL。
+        prefetch (bool): True の場合、呼び出し側が現在のページを処理している間に
+            次の検索結果ページをバックグラウンドで取得しておく
+            （複数スレッドから使用できるバックエンドの場合のみ）。
+        first_page (int): 最初に取得するページ番号（2 以上の場合は start_url のページ番号を付け替える）。
+        last_page (int or None): 最後に取得するページ番号（None の場合は検索結果の最後まで）。
+        selectors (SelectorHealth or None): 店舗リンクのセレクタと、その変化の検知
+            （None の場合は既定のセレクタを使用する）。
+        seen (set or None): 返した店舗URLの集合。複数の検索条件で重複を除く場合に共有する。
+
+    Yields:
+        str: 店舗ページのURL。
+
+    Raises:
+        SelectorDriftError: 最初の検索結果ページで、どのセレクタでも店舗リンクが見つからない場合。
+
+    Notes:
+        - 検索結果ページは必要になるまで取得しない（遅延評価）。
+        - 検索結果が空、または取得に失敗したページで終了する。
+        - ページをまたいで重複したURLは返さない。
+        - 検索結果ページを開いた時点で次ページの URL も取得しておくため、呼び出し側が
+          同じブラウザで店舗ページを開いても、元のページへ戻る必要はない。
+    """
+    prefetch = prefetch and getattr(fetcher, 'concurrent', False)
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    pg_count = first_page       # 現在の検索ページ番号
+    rs_count = 0                # 返した店舗URLの数
+    seen = set() if seen is None else seen  # 返した店舗URL（重複除外用）
+    selectors = selectors or SelectorHealth()
+
+    def request_page(page_url, page):
+        if executor:
+            return executor.submit(fetch_search_page, fetcher, page_url, page, selectors)
+        return page_url, page
+
+    def receive_page(pending):
+        return pending.result() if executor else fetch_search_page(fetcher, *pending, selectors)
+
+    if first_page > 1:
+        start_url = with_page(start_url, first_page)
+
+    try:
+        pending = request_page(start_url, pg_count)
+        while rs_count < rs_demand:
+            rs_links, next_url = receive_page(pending)
+            if not rs_links:
+                print("No more pages.")
+                break           # 次ページがなければ終了
+
+            # 呼び出し側が処理している間に次ページを先読み（最後のページでは読まない）
+            pg_count += 1
+            pending = request_page(next_url, pg_count) if last_page is None or pg_count <= last_page else None
+
+            for link in rs_links:
+                if link in seen:
+                    continue
+                seen.add(link)
+                yield link
+                rs_count += 1
+                if rs_count >= rs_demand:
+                    return
+
+            if pending is None:
+                print(f"Reached the last page ({last_page}).")
+                break
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
+
+def iter_scope_links(fetcher, rs_demand, start_urls, **kwargs):
+    """複数の検索条件（エリアなど）の検索結果を順に巡回し、合計で目標件数の店舗URLを返す。
+
+    Args:
+        fetcher (object): ページ取得のバックエンド。
+        rs_demand (int): 全体の目標取得件数。
+        start_urls (list): 検索条件ごとの最初の検索結果ページの URL。
+        **kwargs: `iter_rs_links` に渡す引数（first_page, last_page, selectors, prefetch）。
+
+    Yields:
+        str: 店舗ページのURL（検索条件をまたいで重複しない）。
+    """
+    seen = set()
+    kwargs.setdefault('selectors', SelectorHealth())   # 検索条件をまたいで共有する
+    for start_url in start_urls:
+        remaining = rs_demand - len(seen)
+        if remaining <= 0:
+            return
+        yield from iter_rs_links(fetcher, remaining, start_url, seen=seen, **kwargs)
+
+def iter_input_links(stream, idle=0.2):
+    """標準入力やファイルから店舗ページの URL を 1 行ずつ読み込んで返すジェネレータ。
+
+    Args:
+        stream (file): 入力（1 行に 1 つの URL。空行と # で始まる行は無視する）。
+        idle (float): 次の行が届かないまま、この秒数が経つたびに None を返す。
+
+    Yields:
+        str or None: 店舗ページのURL。入力を待っている間は None
+            （`loop_rs_links` は None を受け取ると、取得し終えた店舗情報を書き込む）。
+
+    Notes:
+        - 入力は別スレッドで読み込むため、パイプの前段が次の URL を出すまで待っている間も、
+          取得し終えた店舗情報はすぐに書き出される。
+        - 入力の終わり（EOF）で終了する。
+    """
+    lines = queue.Queue(maxsize=1000)
+    done = object()     # 入力の終わり
+
+    def read():
+        try:
+            for line in stream:
+                lines.put(line)
+        finally:
+            lines.put(done)
+
+    threading.Thread(target=read, name='input-links', daemon=True).start()
+    while True:
+        try:
+            line = lines.get(timeout=idle)
+        except queue.Empty:
+            yield None
+            continue
+        if line is done:
+            return
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+async def aiter_rs_links(fetcher, rs_demand, start_url=SEARCH_URL, prefetch=True):
+    """`iter_rs_links` の非同期版。検索結果ページの取得はスレッドプールで行う。
+
+    Args:
+        fetcher (object): ページ取得のバックエンド（複数スレッドから使用できるもの）。
+        rs_demand (int): 目標取得件数。この件数を返した時点で終了する。
+        start_url (str): 最初の検索結果ページの URL。
+        prefetch (bool): True の場合、次の検索結果ページを先読みする。
+
+    Yields:
+        str: 店舗ページのURL。
+    """
+    loop = asyncio.get_running_loop()
+    pg_count = 1                # 現在の検索ページ番号
+    rs_count = 0                # 返した店舗URLの数
+    seen = set()                # 返した店舗URL（重複除外用）
+    selectors = SelectorHealth()
+
+    def request_page(page_url, page):
+        return loop.run_in_executor(None, fetch_search_page, fetcher, page_url, page, selectors)
+
+    pending = request_page(start_url, pg_count)
+    try:
+        while rs_count < rs_demand:
+            rs_links, next_url = await pending
+            pending = None
+            if not rs_links:
+                break           # 次ページがなければ終了
+
+            pg_count += 1
+            if prefetch:
+                pending = request_page(next_url, pg_count)
+
+            for link in rs_links:
+                if link in seen:
+                    continue
+                seen.add(link)
+                yield link
+                rs_count += 1
+                if rs_count >= rs_demand:
+                    return
+
+            if pending is None:
+                pending = request_page(next_url, pg_count)
+    finally:
+        if pending is not None:
+            pending.cancel()
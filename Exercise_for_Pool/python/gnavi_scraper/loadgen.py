@@ -0,0 +1,410 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ぐるなびに似た合成サイト（負荷試験用、遅延と障害の注入付き）
+
+1 万〜100 万店舗の取得を試すための、r.gnavi.co.jp と店舗公式サイトのように振る舞うローカルの HTTP サーバーです。
+店舗情報は店舗番号と乱数の種から毎回同じものを作るため、店舗数を増やしてもメモリは増えません。
+
+- 検索結果ページ `/area/<エリア>/rs/?p=N`: `style_titleLink__oiHVJ` の店舗リンクと `style_nextIcon__M_Me_` の
+  「次へ」アイコン（最後のページにはない）。エリア名は区別しない。
+- 店舗ページ `/g0000123/`: `basic-table`（`#info-name`, `#info-phone .number`, `adr slink`, メールアドレス）と、
+  公式URLの `data-o` の JSON または `#sv-site` のリンク（どちらか、または両方。公式URLのない店舗もある）。
+- 店舗公式サイト `/site/123/`: `redirects` 回のリダイレクトのあとに 200 を返す。公式サイトのホストは
+  127.1.0.1 から始まるループバックアドレスを店舗ごとに割り当てる（Linux では 127.0.0.0/8 全体が自ホストに届く。
+  サーキットブレーカーがホストごとに働くよう、ホストを分ける）。
+  - HTTPS: `https_rate` の割合の店舗は、自己署名の証明書の HTTPS（`https_port`）を公式URLにする
+    （証明書は openssl コマンドで作成する。ない場合は HTTPS を使わない）。
+    SSL 確認（`official_site.check_ssl_status`）はポート 443 に接続するため、`https_port` が 443 の場合だけ
+    TLS のハンドシェイクまで行う（自己署名のため結果は SSL Error）。
+  - 接続できないホスト: `dead_rate` の割合のホストは、接続を拒否するポート（'refused'）か、
+    応答しないアドレス（'timeout'。10.255.0.0/16）を公式URLにする。
+
+遅延は処理ごと（検索結果・店舗ページ・公式サイト）に分布を指定します（`parse_latency`）。
+`error_rate` の割合の店舗ページは 503 を返します。検索結果ページの取得の失敗は取得全体の終了になるため、
+`search_error_rate` で別に指定します（既定は 0）。
+リクエスト数は `/metrics` で確認できます。
+
+実行方法:
+    python3 -m gnavi_scraper loadgen --stores 100000 --port 8080 --store-latency lognormal:0.1:0.5 --error-rate 0.01
+    python3 -m gnavi_scraper scrape --start-url http://127.0.0.1:8080/area/jp/rs/ -n 1000 -j 8
+    python3 -m gnavi_scraper discover --index loadgen_index.json --store-site http://127.0.0.1:8080 \
+        --start-url http://127.0.0.1:8080/area/jp/rs/ -j 8
+
+"""
+import argparse                                                      # コマンドライン引数の解析
+import html                                                          # HTML のエスケープ
+import json                                                          # data-o 属性の JSON
+import math                                                          # 対数正規分布の中央値
+import os                                                            # 証明書の一時ファイル
+import random                                                        # 店舗情報・遅延・障害の乱数
+import re                                                            # パスの解析
+import socket                                                        # 接続を拒否するポート
+import ssl                                                           # HTTPS のサーバー
+import subprocess                                                    # 自己署名の証明書の作成
+import tempfile                                                      # 証明書の保存先
+import threading                                                     # サーバーのスレッド
+import time                                                          # 応答の遅延
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 合成サイトの HTTP サーバー
+from urllib.parse import urlparse, parse_qsl                         # パスとクエリ文字列の解析
+from .metrics import METRICS
+
+# 店舗の住所（都道府県と市区町村、番地の前の町名）
+ADDRESSES = [
+    ('東京都', '渋谷区', '道玄坂'), ('東京都', '新宿区', '西新宿'), ('東京都', '港区', '六本木'),
+    ('東京都', '武蔵野市', '吉祥寺本町'), ('大阪府', '大阪市北区', '梅田'), ('大阪府', '堺市堺区', '南瓦町'),
+    ('神奈川県', '横浜市中区', '山下町'), ('愛知県', '名古屋市中村区', '名駅'), ('福岡県', '福岡市博多区', '博多駅前'),
+    ('北海道', '札幌市中央区', '北一条西'), ('京都府', '京都市下京区', '四条通'), ('兵庫県', '神戸市中央区', '三宮町'),
+]
+# 店舗名の部品
+NAME_PARTS = (['炭火焼', '鮨', '居酒屋', 'ビストロ', '中華', '焼肉', 'カフェ', 'そば処'],
+              ['さくら', '大地', '海風', 'いろは', '月見', 'はなび', '山ノ内', '一期'])
+# 店舗ページの HTML（実際の店舗ページの抽出に使う要素だけをもつ）
+STORE_PAGE = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>{name}</title></head><body>
+<div id="info"><table class="basic-table"><tbody>
+<tr><th>店名</th><td><p id="info-name" class="fn org summary">{name}</p></td></tr>
+<tr><th>電話番号</th><td><ul id="info-phone"><li><span class="number">{phone}</span></li></ul></td></tr>
+<tr><th>住所</th><td><p class="adr slink"><span class="region">{region}</span>{locality}</p></td></tr>
+{email}{official}</tbody></table></div>
+{sv_site}</body></html>"""
+# 検索結果ページの HTML
+SEARCH_PAGE = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>検索結果 {page}</title></head><body>
+<div class="style_restaurantList">{items}</div>
+<nav>{next}</nav></body></html>"""
+# 公式サイトのホストの数の上限（127.1.0.1 〜 127.1.249.250）
+MAX_HOSTS = 250 * 250
+# 接続できないホストの種類
+DEAD_MODES = ['refused', 'timeout']
+
+def parse_latency(spec):
+    """遅延の分布の指定から、遅延（秒）を返す関数を作る。
+
+    Args:
+        spec (str): 'fixed:秒'（または秒の数値だけ）、'uniform:最小:最大'、
+            'lognormal:中央値:シグマ'（テールの長い遅延）、'pareto:最小:形状'（まれに非常に遅い）のいずれか。
+
+    Returns:
+        callable: `random.Random` を受け取り、遅延（秒）を返す関数。
+
+    Raises:
+        ValueError: 分布の名前か引数が正しくない場合。
+    """
+    kind, _, args = str(spec).partition(':')
+    try:
+        if not args:
+            value = float(kind)
+            return lambda rng: value
+        values = [float(value) for value in args.split(':')]
+        if kind == 'fixed' and len(values) == 1:
+            return lambda rng: values[0]
+        if kind == 'uniform' and len(values) == 2:
+            return lambda rng: rng.uniform(*values)
+        if kind == 'lognormal' and len(values) == 2:
+            mu = math.log(values[0]) if values[0] > 0 else -math.inf
+            return lambda rng: rng.lognormvariate(mu, values[1]) if values[0] > 0 else 0.0
+        if kind == 'pareto' and len(values) == 2:
+            return lambda rng: values[0] * rng.paretovariate(values[1])
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency: {spec} (fixed:S, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA, pareto:MIN:ALPHA)")
+
+def _self_signed_context():
+    """自己署名の証明書で HTTPS のサーバー用の SSL コンテキストを作る。
+
+    Returns:
+        ssl.SSLContext or None: openssl コマンドがない場合は None。
+    """
+    directory = tempfile.mkdtemp(prefix='gnavi_loadgen_')
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    try:
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=gnavi-loadgen', '-keyout', key, '-out', cert],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Warning: could not create a self-signed certificate ({e}); HTTPS is disabled.")
+        return None
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+class LoadGenerator:
+    """ぐるなびに似た合成サイトの内容と、遅延・障害の注入。
+
+    Args:
+        size (int): 店舗数。
+        seed (int): 店舗情報の乱数の種（同じ値なら同じ店舗情報になる）。
+        per_page (int): 検索結果の 1 ページの店舗数。
+        hosts (int): 公式サイトのホストの数（`MAX_HOSTS` まで）。
+        search_latency (str): 検索結果ページの遅延の分布（`parse_latency`）。
+        store_latency (str): 店舗ページの遅延の分布。
+        site_latency (str): 公式サイトの 1 回の応答（リダイレクトを含む）の遅延の分布。
+        error_rate (float): 店舗ページが 503 を返す割合。
+        search_error_rate (float): 検索結果ページが 503 を返す割合。
+        dead_rate (float): 接続できない公式サイトのホストの割合。
+        dead_mode (str): 接続できないホストの種類（'refused' または 'timeout'）。
+        https_rate (float): 公式URLが HTTPS の店舗の割合（HTTPS のサーバーを起動した場合のみ）。
+        redirects (int): 公式サイトの最終URLまでのリダイレクトの回数。
+    """
+
+    def __init__(self, size=10000, seed=0, per_page=20, hosts=1000, search_latency='0', store_latency='0',
+                 site_latency='0', error_rate=0.0, search_error_rate=0.0, dead_rate=0.0, dead_mode='refused',
+                 https_rate=0.0, redirects=2):
+        if dead_mode not in DEAD_MODES:
+            raise ValueError(f"Invalid dead_mode: {dead_mode} (choose from {', '.join(DEAD_MODES)})")
+        self.size = size
+        self.seed = seed
+        self.per_page = per_page
+        self.hosts = max(1, min(hosts, MAX_HOSTS))
+        self.latency = {'search': parse_latency(search_latency), 'store': parse_latency(store_latency),
+                        'site': parse_latency(site_latency)}
+        self.error_rate = {'search': search_error_rate, 'store': error_rate, 'site': 0.0}
+        self.dead_rate = dead_rate
+        self.dead_mode = dead_mode
+        self.https_rate = https_rate
+        self.redirects = redirects
+        self.rng = random.Random(seed)
+        self.http_port = None
+        self.https_port = None
+        self.dead_port = None
+        self._servers = []
+        self._dead_socket = None
+
+    def pages(self):
+        """検索結果のページ数を返す。"""
+        return max(1, -(-self.size // self.per_page))
+
+    def store(self, number):
+        """店舗番号から店舗情報を作る（同じ番号なら毎回同じ内容）。
+
+        Returns:
+            dict: 店舗名・電話番号・住所・メールアドレス・公式URL（なければ None）・公式URLの載せ方。
+        """
+        rng = random.Random(f"{self.seed}:{number}")
+        prefecture, city, town = rng.choice(ADDRESSES)
+        host_number = rng.randrange(self.hosts)
+        store = {
+            'name': f"{rng.choice(NAME_PARTS[0])} {rng.choice(NAME_PARTS[1])} {number}号店",
+            'phone': f"0{rng.randint(3, 99)}-{rng.randint(100, 9999)}-{rng.randint(1000, 9999)}",
+            'region': f"{prefecture}{city}{town}{rng.randint(1, 9)}-{rng.randint(1, 30)}-{rng.randint(1, 20)}",
+            'locality': f"{rng.choice(NAME_PARTS[1])}ビル {rng.randint(1, 9)}F" if rng.random() < 0.6 else '',
+            'email': f"info{number}@example.com" if rng.random() < 0.2 else '',
+            'url': None,
+            'link': rng.choice(['data-o', 'data-o', 'sv-site', 'both']),
+        }
+        if rng.random() < 0.85:
+            store['url'] = self.site_url(number, host_number, https=rng.random() < self.https_rate)
+        return store
+
+    def site_url(self, number, host_number, https=False):
+        """店舗公式サイトの URL を返す。"""
+        # ホストの番号から、接続できないホストかを決める（同じホストの店舗は同じ結果になる）
+        if random.Random(f"{self.seed}:host:{host_number}").random() < self.dead_rate:
+            if self.dead_mode == 'timeout':
+                return f"http://10.255.{host_number // 250}.{host_number % 250 + 1}/site/{number}/"
+            return f"http://{self.host_address(host_number)}:{self.dead_port}/site/{number}/"
+        if https and self.https_port:
+            return f"https://{self.host_address(host_number)}:{self.https_port}/site/{number}/"
+        return f"http://{self.host_address(host_number)}:{self.http_port}/site/{number}/"
+
+    @staticmethod
+    def host_address(host_number):
+        """公式サイトのホストの番号から、ループバックアドレスを返す。"""
+        return f"127.1.{host_number // 250}.{host_number % 250 + 1}"
+
+    def search_page(self, page, base_url):
+        """検索結果ページの HTML を返す（店舗数を超えたページは店舗リンクのない HTML）。"""
+        first = (page - 1) * self.per_page + 1
+        items = []
+        for number in range(first, min(first + self.per_page, self.size + 1)):
+            name = html.escape(self.store(number)['name'])
+            items.append(f'<div class="style_restaurant"><h2><a class="style_titleLink__oiHVJ" '
+                         f'href="{base_url}/g{number:07d}/">{name}</a></h2></div>')
+        next_link = (f'<a href="?p={page + 1}"><img class="style_nextIcon__M_Me_" alt="&gt;"></a>'
+                     if page < self.pages() else '')
+        return SEARCH_PAGE.format(page=page, items='\n'.join(items), next=next_link)
+
+    def store_page(self, number):
+        """店舗ページの HTML を返す。"""
+        store = self.store(number)
+        official, sv_site = '', ''
+        if store['url']:
+            url = urlparse(store['url'])
+            if store['link'] in ('data-o', 'both'):
+                data_o = html.escape(json.dumps({'a': url.netloc + url.path, 'b': url.scheme}), quote=True)
+                official = (f'<tr><th>お店のホームページ</th><td><a class="url go-off" data-o="{data_o}" '
+                            f'href="javascript:void(0)">オフィシャルページ</a></td></tr>\n')
+            if store['link'] in ('sv-site', 'both'):
+                sv_site = (f'<div id="sv-site"><a class="sv-of double" href="{html.escape(store["url"])}">'
+                           f'お店のホームページ</a></div>')
+        return STORE_PAGE.format(
+            name=html.escape(store['name']), phone=store['phone'], region=store['region'],
+            locality=f'<span class="locality">{store["locality"]}</span>' if store['locality'] else '',
+            email=(f'<tr><th>メール</th><td><a href="mailto:{store["email"]}">{store["email"]}</a></td></tr>\n'
+                   if store['email'] else ''),
+            official=official, sv_site=sv_site)
+
+    def delay(self, kind):
+        """処理の種類に応じた遅延のあと、障害を注入するかを返す。
+
+        Returns:
+            bool: 503 を返す場合は True。
+        """
+        seconds = self.latency[kind](self.rng)
+        if seconds > 0:
+            time.sleep(seconds)
+        return self.rng.random() < self.error_rate[kind]
+
+    def start(self, host='0.0.0.0', port=0, https_port=None):
+        """HTTP（と HTTPS）のサーバーをバックグラウンドで起動し、検索結果ページのベース URL を返す。
+
+        Args:
+            host (str): 待ち受けるアドレス（公式サイトのループバックアドレスに応答するため、既定は全アドレス）。
+            port (int): HTTP のポート番号（0 の場合は空いているポート）。
+            https_port (int or None): HTTPS のポート番号（None の場合は起動しない。0 の場合は空いているポート）。
+
+        Returns:
+            str: 'http://127.0.0.1:<ポート番号>'。
+        """
+        handler = type('LoadHandler', (_LoadHandler,), {'generator': self})
+        server = _LoadServer((host, port), handler)
+        self.http_port = server.server_address[1]
+        self._servers.append(server)
+        if https_port is not None:
+            context = _self_signed_context()
+            if context:
+                secure = _LoadServer((host, https_port), handler)
+                secure.socket = context.wrap_socket(secure.socket, server_side=True)
+                self.https_port = secure.server_address[1]
+                self._servers.append(secure)
+        # bind だけして listen しないソケットのポートには、接続が拒否される
+        self._dead_socket = socket.socket()
+        self._dead_socket.bind((host, 0))
+        self.dead_port = self._dead_socket.getsockname()[1]
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.http_port}"
+
+    def stop(self):
+        """サーバーを停止する。"""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        if self._dead_socket:
+            self._dead_socket.close()
+            self._dead_socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+class _LoadServer(ThreadingHTTPServer):
+    """接続の待ち行列を長くした HTTP サーバー（並列数の大きい負荷試験で接続が拒否されないようにする）。"""
+    request_queue_size = 128
+
+class _LoadHandler(BaseHTTPRequestHandler):
+    """合成サイトのリクエストを `LoadGenerator` に振り分ける。"""
+
+    generator = None
+    protocol_version = 'HTTP/1.1'       # 接続を使い回す（requests.Session と同じ条件にする）
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        store = re.match(r'/g(\d+)/$', url.path)
+        site = re.match(r'/site/(\d+)/(?:(\d+)/)?$', url.path)
+        if url.path.startswith('/area/') and url.path.endswith('/rs/'):
+            self._respond('search', lambda: self.generator.search_page(
+                int(dict(parse_qsl(url.query)).get('p', 1)), f"http://{self.headers.get('Host')}"))
+        elif store and 0 < int(store.group(1)) <= self.generator.size:
+            self._respond('store', lambda: self.generator.store_page(int(store.group(1))))
+        elif site:
+            hop = int(site.group(2) or 0)
+            if hop < self.generator.redirects:
+                self._respond('site', None, location=f"/site/{site.group(1)}/{hop + 1}/")
+            else:
+                self._respond('site', lambda: f"<html><body>site {site.group(1)}</body></html>")
+        elif url.path == '/metrics':
+            self._send(200, METRICS.prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            METRICS.inc('gnavi_loadgen_requests_total', kind='other', status='404')
+            self._send(404, b'Not Found', 'text/plain')
+
+    def _respond(self, kind, render, location=None):
+        """遅延と障害を注入して応答する。"""
+        if self.generator.delay(kind):
+            status, body = 503, b'Service Unavailable'
+        elif location:
+            status, body = 302, b''
+        else:
+            status, body = 200, render().encode('utf-8')
+        METRICS.inc('gnavi_loadgen_requests_total', kind=kind, status=str(status))
+        self._send(status, body, 'text/html', location if status == 302 else None)
+
+    def _send(self, status, data, content_type, location=None):
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if location:
+            self.send_header('Location', location)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def add_arguments(parser):
+    """合成サイトの設定のコマンドライン引数を追加する（ベンチマークと共有する）。"""
+    parser.add_argument('--seed', type=int, default=0, help='店舗情報の乱数の種')
+    parser.add_argument('--per-page', type=int, default=20, help='検索結果の 1 ページの店舗数')
+    parser.add_argument('--hosts', type=int, default=1000, help='公式サイトのホストの数')
+    parser.add_argument('--search-latency', default='0', help='検索結果ページの遅延（例: 0.2, uniform:0.1:0.3）')
+    parser.add_argument('--store-latency', default='0', help='店舗ページの遅延（例: lognormal:0.1:0.5）')
+    parser.add_argument('--site-latency', default='0', help='公式サイトの 1 回の応答の遅延（例: pareto:0.05:2）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='店舗ページが 503 を返す割合')
+    parser.add_argument('--search-error-rate', type=float, default=0.0,
+                        help='検索結果ページが 503 を返す割合（取得全体が終了する）')
+    parser.add_argument('--dead-rate', type=float, default=0.0, help='接続できない公式サイトのホストの割合')
+    parser.add_argument('--dead-mode', choices=DEAD_MODES, default='refused',
+                        help="接続できないホストの種類（'refused' は即座に拒否、'timeout' は応答なし）")
+    parser.add_argument('--https-rate', type=float, default=0.0, help='公式URLが HTTPS の店舗の割合')
+    parser.add_argument('--redirects', type=int, default=2, help='公式サイトの最終URLまでのリダイレクトの回数')
+
+def from_arguments(args, size):
+    """`add_arguments` で追加した引数から `LoadGenerator` を作る。"""
+    return LoadGenerator(size, args.seed, args.per_page, args.hosts, args.search_latency, args.store_latency,
+                         args.site_latency, args.error_rate, args.search_error_rate, args.dead_rate,
+                         args.dead_mode, args.https_rate, args.redirects)
+
+def main(argv=None):
+    """コマンドライン引数を解析して合成サイトを起動する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper loadgen',
+                                     description='ぐるなびに似た合成サイトを起動する（負荷試験用）')
+    parser.add_argument('--stores', type=int, default=10000, help='店舗数')
+    parser.add_argument('--port', type=int, default=8080, help='HTTP のポート番号')
+    parser.add_argument('--https-port', type=int, default=None,
+                        help='HTTPS のポート番号（443 の場合は SSL 確認も TLS のハンドシェイクまで行う）')
+    parser.add_argument('--host', default='0.0.0.0', help='待ち受けるアドレス')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    generator = from_arguments(args, args.stores)
+    if args.https_rate and args.https_port is None:
+        parser.error('--https-rate requires --https-port')
+    with generator:
+        base_url = generator.start(args.host, args.port, args.https_port)
+        print(f"{args.stores} stores on {generator.pages()} pages: {base_url}/area/jp/rs/ (/metrics)")
+        if generator.https_port:
+            print(f"HTTPS (self-signed) on port {generator.https_port}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
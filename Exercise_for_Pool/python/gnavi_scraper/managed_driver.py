@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""メモリ上限付きの Chrome WebDriver 管理
+
+Chrome と chromedriver のメモリ使用量（RSS）を監視し、上限を超えたら
+ブラウザを再起動します。例外やシグナルで終了した場合も、必ずブラウザを閉じ、
+残ったプロセスを後始末します。
+
+"""
+import os                           # プロセスID、/proc の読み取り
+import signal                       # SIGTERM / SIGINT の捕捉
+import time                         # 再起動間隔の計測
+from .metrics import METRICS        # ブラウザの状態の公開
+
+# psutil がインストールされていればそちらを使い、なければ /proc を直接読む
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 計測中にプロセスが終了した場合に発生しうる例外
+_PROCESS_ERRORS = (OSError, ValueError) + ((psutil.Error,) if psutil else ())
+
+def _list_children_proc():
+    """/proc を走査し、親プロセスID → 子プロセスID のリストを返す（Linux 用）。"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+        except OSError:
+            continue    # 走査中に終了したプロセス
+        # "pid (comm) state ppid ..." の形式。comm に空白や括弧が含まれることがあるので右から探す
+        fields = stat[stat.rfind(b')') + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+    return children
+
+def process_tree(pid):
+    """指定したプロセスと、その子孫プロセスのIDをすべて返す。
+
+    Args:
+        pid (int): 起点となるプロセスID。
+
+    Returns:
+        list: プロセスIDのリスト。取得できない環境では空リスト。
+    """
+    if psutil:
+        try:
+            parent = psutil.Process(pid)
+            return [pid] + [child.pid for child in parent.children(recursive=True)]
+        except psutil.Error:
+            return []
+
+    if not os.path.isdir('/proc'):
+        return []
+    children = _list_children_proc()
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+def rss_bytes(pids):
+    """プロセスIDのリストについて、RSS の合計をバイト単位で返す。
+
+    Args:
+        pids (list): プロセスIDのリスト。
+
+    Returns:
+        int or None: RSS の合計。計測できない環境では None。
+    """
+    if not pids:
+        return None
+    total = 0
+    for pid in pids:
+        try:
+            if psutil:
+                total += psutil.Process(pid).memory_info().rss
+            else:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1]) * 1024
+                            break
+        except _PROCESS_ERRORS:
+            continue    # 計測中に終了したプロセス
+    return total
+
+def kill_processes(pids):
+    """プロセスを強制終了し、終了させた数を返す。
+
+    Args:
+        pids (list): プロセスIDのリスト。
+
+    Returns:
+        int: 終了させたプロセスの数。
+    """
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL if hasattr(signal, 'SIGKILL') else signal.SIGTERM)
+            killed += 1
+        except OSError:
+            pass        # すでに終了している
+    return killed
+
+class ManagedDriver:
+    """Chrome WebDriver の起動・再起動・終了を管理するラッパー。
+
+    WebDriver の属性・メソッドはそのまま委譲するため、既存の関数に
+    `driver` として渡して使用できる。`get` の呼び出し時にメモリ使用量を確認し、
+    上限を超えていればブラウザを再起動してからページを開く。
+
+    Args:
+        factory (callable): 新しい WebDriver を返す関数（例: `set_webdriver`）。
+        max_rss_mb (int): Chrome と chromedriver の RSS 合計の上限（MB）。
+        check_every (int): メモリ使用量を確認する `get` の呼び出し間隔。
+
+    Notes:
+        - `with` 文で使用すると、例外や SIGTERM / SIGINT で終了した場合もブラウザを閉じる。
+        - 終了時に残った chrome / chromedriver プロセスを検出して強制終了する（リーク検出）。
+        - 終了時にピークメモリ・再起動回数・リークしたプロセス数を表示する。
+    """
+
+    def __init__(self, factory, max_rss_mb=1024, check_every=10):
+        self._factory = factory
+        self._driver = None
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.check_every = check_every
+        self.get_count = 0          # get の呼び出し回数
+        self.restarts = 0           # 再起動回数
+        self.peak_rss = 0           # 計測した RSS の最大値（バイト）
+        self.leaked = 0             # 終了時に残っていたプロセスの数
+        METRICS.gauge_function('gnavi_driver_alive', lambda: 0 if self._driver is None else 1)
+        METRICS.gauge_function('gnavi_driver_pages', lambda: self.get_count)
+        METRICS.gauge_function('gnavi_driver_restarts', lambda: self.restarts)
+        METRICS.gauge_function('gnavi_driver_peak_rss_bytes', lambda: self.peak_rss)
+        METRICS.gauge_function('gnavi_driver_leaked_processes', lambda: self.leaked)
+        self._started_at = None
+        self._saved_handlers = {}
+
+    def __getattr__(self, name):
+        # 管理していない属性はすべて現在の WebDriver に委譲する
+        if self._driver is None:
+            raise AttributeError(name)
+        return getattr(self._driver, name)
+
+    def __enter__(self):
+        self.start()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                self._saved_handlers[signum] = signal.signal(signum, self._handle_signal)
+            except ValueError:
+                pass    # メインスレッド以外ではシグナルを設定できない
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for signum, handler in self._saved_handlers.items():
+            signal.signal(signum, handler)
+        self._saved_handlers = {}
+        self.quit()
+        self.report()
+        return False
+
+    def _handle_signal(self, signum, frame):
+        # SystemExit を送出して with 文の後始末を実行させる
+        raise SystemExit(128 + signum)
+
+    def start(self):
+        """WebDriver を起動する。"""
+        self._driver = self._factory()
+        self._started_at = time.time()
+
+    def browser_pids(self):
+        """chromedriver と、そこから起動された chrome のプロセスIDを返す。"""
+        try:
+            pid = self._driver.service.process.pid
+        except AttributeError:
+            return []
+        return process_tree(pid)
+
+    def memory_usage(self):
+        """chrome と chromedriver の RSS 合計（バイト）を計測し、ピーク値を更新する。
+
+        Returns:
+            int or None: RSS の合計。計測できない環境では None。
+        """
+        rss = rss_bytes(self.browser_pids())
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def quit(self):
+        """WebDriver を終了し、残ったプロセスを強制終了する。"""
+        if self._driver is None:
+            return
+        pids = self.browser_pids()
+        self.memory_usage()
+        try:
+            self._driver.quit()
+        except Exception as e:
+            print(f"Error in quitting WebDriver: {e}")
+        self._driver = None
+
+        # quit 後もメモリを保持しているプロセスはリークとして扱う
+        remaining = [pid for pid in pids if rss_bytes([pid])]
+        if remaining:
+            self.leaked += kill_processes(remaining)
+            print(f"Killed {len(remaining)} orphaned browser processes")
+
+    def restart(self):
+        """WebDriver を終了して起動し直す。"""
+        self.quit()
+        self.start()
+        self.restarts += 1
+
+    def check_memory(self):
+        """メモリ使用量を確認し、上限を超えていればブラウザを再起動する。
+
+        Returns:
+            bool: 再起動した場合は True。
+        """
+        rss = self.memory_usage()
+        if rss is not None and rss > self.max_rss:
+            print(f"Browser RSS {rss / 1024 / 1024:.0f} MB exceeds limit. Restarting...")
+            self.restart()
+            return True
+        return False
+
+    def get(self, url):
+        """必要に応じてブラウザを再起動してから、指定した URL を開く。
+
+        Args:
+            url (str): 開く URL。
+        """
+        self.get_count += 1
+        if self.get_count % self.check_every == 0:
+            self.check_memory()
+        return self._driver.get(url)
+
+    def report(self):
+        """ピークメモリなどの実行結果を表示する。"""
+        elapsed = time.time() - self._started_at if self._started_at else 0
+        print(f"Browser peak RSS: {self.peak_rss / 1024 / 1024:.0f} MB, "
+              f"restarts: {self.restarts}, leaked processes: {self.leaked}, "
+              f"pages: {self.get_count}, last session: {elapsed:.0f}s")
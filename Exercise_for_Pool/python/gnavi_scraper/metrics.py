@@ -0,0 +1,226 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""進捗と処理速度の計測、および状態確認用の HTTP エンドポイント
+
+取得処理の各段階が `METRICS` にカウンタや処理時間を記録し、`StatusServer` が
+それを HTTP で公開します（docker-compose の ex2_py では 5000 番ポート）。
+
+- `GET /metrics`: Prometheus のテキスト形式（メトリクス収集システムから取得する）。
+- `GET /status`: 人が読むための JSON（取得件数、毎秒の件数、目標件数までの残り時間など）。
+
+記録はロックを取って数値を足すだけで、キューの長さやブラウザの状態のような値は
+取得されたときにだけ関数を呼んで求めるため、常に有効にしておいても負荷はほとんどありません。
+
+"""
+import bisect                                                        # ヒストグラムのバケットの検索
+import json                                                          # /status の出力
+import threading                                                     # 記録の排他制御、HTTP サーバーのスレッド
+import time                                                          # 経過時間
+from contextlib import contextmanager                                # 処理時間の計測
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # 状態確認用の HTTP サーバー
+
+# 処理時間のヒストグラムのバケットの上限（秒）
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+def _label_text(labels):
+    """ラベルを Prometheus の形式（{key="value",...}）にする。"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+class Histogram:
+    """処理時間の分布（バケットごとの件数、合計、件数）。"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)      # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """バケットの上限から分位点を概算する（該当するバケットの上限を返す）。"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+class Metrics:
+    """カウンタ・ゲージ・処理時間を記録する。
+
+    Notes:
+        - 名前とラベル（キーワード引数）の組み合わせごとに値を持つ。
+        - `gauge_function` で登録した関数は、出力するときにだけ呼ばれる。
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters = {}          # (名前, ラベル) → 値
+        self.gauges = {}            # (名前, ラベル) → 値
+        self.gauge_functions = {}   # (名前, ラベル) → 値を返す関数
+        self.histograms = {}        # (名前, ラベル) → Histogram
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """カウンタを増やす。"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """ゲージの値を設定する。"""
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def gauge_function(self, name, func, **labels):
+        """出力するときに呼ばれる、ゲージの値を返す関数を登録する。
+
+        Args:
+            name (str): メトリクス名。
+            func (callable): 引数なしで数値を返す関数。
+            **labels: ラベル。
+        """
+        with self._lock:
+            self.gauge_functions[(name, tuple(sorted(labels.items())))] = func
+
+    def observe(self, name, seconds, **labels):
+        """処理時間を記録する。"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """with 文で囲んだ処理の時間を 'gnavi_stage_seconds' に記録する。
+
+        Args:
+            stage (str): 処理の段階の名前（例: 'fetch', 'extract'）。
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('gnavi_stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def counter(self, name, **labels):
+        """カウンタの値を返す。"""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def _gauge_values(self):
+        """ゲージの値（関数で求める値を含む）を返す。"""
+        with self._lock:
+            values = dict(self.gauges)
+            functions = list(self.gauge_functions.items())
+        for key, func in functions:
+            try:
+                values[key] = func()
+            except Exception:
+                continue        # 終了済みのオブジェクトなどは出力しない
+        return values
+
+    def prometheus(self):
+        """Prometheus のテキスト形式で出力する。"""
+        lines = [f"gnavi_uptime_seconds {time.time() - self.started_at:.3f}"]
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in sorted(self.histograms.items())]
+        for (name, labels), value in counters:
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), value in sorted(self._gauge_values().items()):
+            lines.append(f"{name}{_label_text(labels)} {float(value)}")
+        for (name, labels), counts, total, count in histograms:
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def status(self):
+        """進捗の概要を辞書で返す（/status 用）。"""
+        elapsed = time.time() - self.started_at
+        rows = self.counter('gnavi_rows_written_total')
+        demand = self._gauge_values().get(('gnavi_rows_demand', ()), 0)
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        with self._lock:
+            stages = {dict(labels).get('stage', name): {
+                'count': h.count,
+                'mean': h.sum / h.count if h.count else 0.0,
+                'p50': h.quantile(0.5),
+                'p95': h.quantile(0.95),
+            } for (name, labels), h in self.histograms.items()}
+            counters = {name + _label_text(labels): value for (name, labels), value in self.counters.items()}
+        return {
+            'elapsed_seconds': round(elapsed, 1),
+            'rows_written': rows,
+            'rows_demand': demand,
+            'rows_per_second': round(rate, 3),
+            'eta_seconds': round((demand - rows) / rate, 1) if rate > 0 and demand > rows else None,
+            'stages': stages,
+            'counters': counters,
+            'gauges': {name + _label_text(labels): value for (name, labels), value in self._gauge_values().items()},
+        }
+
+# 取得処理全体で共有する記録先
+METRICS = Metrics()
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    """/metrics と /status に応答する。"""
+
+    metrics = METRICS
+
+    def do_GET(self):
+        if self.path.startswith('/metrics'):
+            body, content_type = self.metrics.prometheus(), 'text/plain; version=0.0.4'
+        elif self.path in ('/', '/status'):
+            body, content_type = json.dumps(self.metrics.status(), ensure_ascii=False, indent=2), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass                    # 取得処理の出力に混ざらないよう、アクセスログは出さない
+
+class StatusServer:
+    """状態確認用の HTTP サーバーをバックグラウンドで動かす。
+
+    Args:
+        port (int): 待ち受けるポート番号。
+        host (str): 待ち受けるアドレス（コンテナの外から見る場合は '0.0.0.0'）。
+        metrics (Metrics): 公開するメトリクス。
+    """
+
+    def __init__(self, port=5000, host='0.0.0.0', metrics=METRICS):
+        handler = type('StatusHandler', (_StatusHandler,), {'metrics': metrics})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, name='status-server', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"Status endpoint: http://{host}:{port}/status (Prometheus: /metrics)")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
@@ -0,0 +1,244 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""取得した店舗情報の正規化（列単位の一括処理）
+
+1 行ずつではなく、pandas の文字列操作で列ごとにまとめて正規化します。
+都道府県・市区町村・URL のように同じ値が多い列は、重複を除いた値だけを正規化して元の行に展開します。
+重複の除外や他のデータとの結合で、表記の揺れによって同じ店舗が別物にならないようにします。
+
+- 全角英数字・半角カナなどを NFKC で統一し、前後の空白を除く。
+- 電話番号のハイフンの表記を統一し、'+81' を '0' に置き換える。
+- URL のスキームとホスト名を小文字にし、既定のポート番号とフラグメントを除く。
+- 住所（都道府県・市区町村・番地）を NFKC で統一したうえで分割し直す。
+
+スクレイピング後の出力先（`NormalizingSink`）としても、既存の CSV に対しても使用できます。
+
+実行方法:
+    python3 -m gnavi_scraper normalize 1-1.csv -o 1-1.normalized.csv
+
+"""
+import argparse                         # コマンドライン引数の解析
+import functools                        # デコレータ
+import pandas as pd                     # 列単位の文字列操作
+from .column_buffer import ColumnBuffer
+from .extract import ADDRESS_REGEX
+from .sinks import Sink
+
+# 電話番号のハイフンとして使われる文字（全角・長音記号などを含む）
+DASH_PATTERN = r'[\-‐‑‒–—―−ー－]+'
+# URL の分解（スキーム、ホスト名、ポート番号、パス以降、フラグメント）
+URL_PATTERN = r'^(?P<scheme>[A-Za-z][A-Za-z0-9+.\-]*)://(?P<host>[^/:?#]+)(?::(?P<port>\d+))?(?P<rest>[^#]*)'
+# 正規化する文字列の列（NFKC と前後の空白の除去）
+TEXT_COLUMNS = ['店舗名', 'メールアドレス', '都道府県', '市区町村', '番地', '建物名']
+
+def as_text(series):
+    """欠損値を空文字にした文字列の列を返す。"""
+    return series.fillna('').astype(str)
+
+def per_unique(func):
+    """列の重複を除いた値だけに `func` を適用し、元の行に展開するデコレータ。
+
+    Args:
+        func (callable): 列を受け取り、同じ長さの列を返す関数。
+
+    Returns:
+        callable: 同じ結果を返す関数。重複が多い列ほど速い。
+    """
+    @functools.wraps(func)
+    def wrapper(series):
+        codes, uniques = pd.factorize(as_text(series))
+        result = func(pd.Series(uniques, dtype=object))
+        return pd.Series(result.to_numpy()[codes], index=series.index, name=series.name)
+    return wrapper
+
+@per_unique
+def nfkc(series):
+    """NFKC で正規化し、前後の空白を除く。
+
+    Args:
+        series (pandas.Series): 文字列の列。
+
+    Returns:
+        pandas.Series: 正規化した列。
+    """
+    return as_text(series).str.normalize('NFKC').str.strip()
+
+@per_unique
+def normalize_phone(series):
+    """電話番号の表記を統一する（例: '０３－１２３４－５６７８' → '03-1234-5678'）。
+
+    Args:
+        series (pandas.Series): 電話番号の列。
+
+    Returns:
+        pandas.Series: 数字とハイフンだけにした電話番号の列。
+
+    Notes:
+        - 国番号付き（'+81-3-...'）は国内の表記（'03-...'）に置き換える。
+        - 括弧は区切りとしてハイフンに置き換える（'(03)1234-5678' → '03-1234-5678'）。
+    """
+    phone = series.str.normalize('NFKC').str.strip()
+    phone = phone.str.replace(r'^\+81[\s\-]*', '0', regex=True)
+    phone = phone.str.replace(r'^\((\d+)\)', r'\1-', regex=True).str.replace(r'[()\s]+', '-', regex=True)
+    phone = phone.str.replace(DASH_PATTERN, '-', regex=True)
+    return phone.str.replace(r'[^\d\-]', '', regex=True).str.strip('-')
+
+def phone_digits(series):
+    """重複の判定や結合に使う、数字だけの電話番号の列を返す。"""
+    return normalize_phone(series).str.replace('-', '', regex=False)
+
+@per_unique
+def normalize_url(series):
+    """URL を正規化する（例: 'HTTP://Example.COM:80#top' → 'http://example.com/'）。
+
+    Args:
+        series (pandas.Series): URL の列。
+
+    Returns:
+        pandas.Series: 正規化した URL の列。URL として解釈できない値は前後の空白を除いただけで返す。
+
+    Notes:
+        - スキームとホスト名は小文字にし、パスとクエリ文字列の大文字・小文字は変えない。
+        - スキームの既定のポート番号（http: 80、https: 443）とフラグメントを除く。
+        - パスがない場合は '/' を補う。
+    """
+    url = as_text(series).str.strip()
+    parts = url.str.extract(URL_PATTERN)
+    matched = parts['scheme'].notna()
+    parts = parts.fillna('')
+
+    scheme = parts['scheme'].str.lower()
+    host = parts['host'].str.lower().str.rstrip('.')
+    default_port = ((scheme == 'http') & (parts['port'] == '80')) | ((scheme == 'https') & (parts['port'] == '443'))
+    port = (':' + parts['port']).where((parts['port'] != '') & ~default_port, '')
+    rest = parts['rest'].where(parts['rest'] != '', '/')
+    rest = rest.where(rest.str.startswith('/'), '/' + rest)
+
+    return (scheme + '://' + host + port + rest).where(matched, url)
+
+def split_address_columns(prefecture, city, street):
+    """都道府県・市区町村・番地を NFKC で統一し、`ADDRESS_REGEX` で分割し直す。
+
+    Args:
+        prefecture (pandas.Series): 都道府県の列。
+        city (pandas.Series): 市区町村の列。
+        street (pandas.Series): 番地の列。
+
+    Returns:
+        pandas.DataFrame: '都道府県', '市区町村', '番地' の列。分割できない行は NFKC で統一しただけの値。
+    """
+    parts = pd.DataFrame({'都道府県': nfkc(prefecture), '市区町村': nfkc(city), '番地': nfkc(street)})
+    # 3 つの列の組み合わせごとに 1 回だけ分割する（区切りの制御文字 US は住所に含まれない）
+    codes, uniques = pd.factorize(parts['都道府県'] + '\x1f' + parts['市区町村'] + '\x1f' + parts['番地'])
+    uniques = pd.Series(uniques, dtype=object)
+    split = uniques.str.replace('\x1f', '', regex=False).str.extract(ADDRESS_REGEX)
+    split.columns = parts.columns
+    unmatched = split['都道府県'].isna()
+    if unmatched.any():
+        split.loc[unmatched] = uniques[unmatched].str.split('\x1f', expand=True).set_axis(parts.columns, axis=1)
+    return pd.DataFrame(split.to_numpy()[codes], index=parts.index, columns=parts.columns)
+
+@per_unique
+def normalize_ssl(series):
+    """SSL の値（True / 'True' / 1 など）を bool の列にする。"""
+    return as_text(series).str.strip().str.lower().isin(['true', '1'])
+
+def normalize_frame(df):
+    """店舗情報のデータフレームを列ごとに正規化する。
+
+    Args:
+        df (pandas.DataFrame): `ROW_COLUMNS` または `CSV_COLUMNS` の列を持つデータフレーム。
+
+    Returns:
+        pandas.DataFrame: 正規化したデータフレーム（元のデータフレームは変更しない）。
+            存在しない列は処理しない。
+    """
+    df = df.copy()
+    for column in TEXT_COLUMNS:
+        if column in df:
+            df[column] = nfkc(df[column])
+    if 'メールアドレス' in df:
+        df['メールアドレス'] = df['メールアドレス'].str.replace(r'^mailto:', '', case=False, regex=True)
+    if '電話番号' in df:
+        df['電話番号'] = normalize_phone(df['電話番号'])
+    if {'都道府県', '市区町村', '番地'} <= set(df.columns):
+        df[['都道府県', '市区町村', '番地']] = split_address_columns(df['都道府県'], df['市区町村'], df['番地'])
+    if 'URL' in df:
+        df['URL'] = normalize_url(df['URL'])
+    if 'SSL' in df:
+        df['SSL'] = normalize_ssl(df['SSL'])
+    return df
+
+def normalize_csv(input_file, output_file, chunksize=100000):
+    """CSV ファイルを正規化して別のファイルに出力する。
+
+    Args:
+        input_file (str): 入力の CSV ファイル（UTF-8 BOM 付き）。
+        output_file (str): 出力の CSV ファイル（UTF-8 BOM 付き）。
+        chunksize (int): 一度に読み込んで正規化する行数（メモリ使用量の上限になる）。
+
+    Returns:
+        int: 正規化した行数。
+    """
+    count = 0
+    reader = pd.read_csv(input_file, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunksize)
+    for number, chunk in enumerate(reader):
+        normalize_frame(chunk).to_csv(output_file, mode='w' if number == 0 else 'a', header=number == 0,
+                                      index=False, encoding='utf-8-sig' if number == 0 else 'utf-8')
+        count += len(chunk)
+    return count
+
+class NormalizingSink(Sink):
+    """行をまとめて正規化してから、別の出力先に書き込む出力先。
+
+    Args:
+        sink (Sink): 正規化した行を書き込む出力先。
+        batch_size (int): まとめて正規化する行数。
+
+    Notes:
+        - 正規化は `batch_size` 行ごとに列単位で行うため、出力先への書き込みはその分だけ遅れる。
+        - 溜める間は `ColumnBuffer` に列ごとに振り分け、行の dict は保持しない。
+    """
+
+    def __init__(self, sink, batch_size=1000):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.buffer = ColumnBuffer()
+
+    def open(self):
+        self.sink.open()
+
+    def write(self, row):
+        self.buffer.write(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """溜めた行を正規化して出力先に書き込む。"""
+        if not len(self.buffer):
+            return
+        df = normalize_frame(self.buffer.to_frame(release=True))
+        for row in df.to_dict('records'):
+            self.sink.write(row)
+
+    def close(self):
+        self.flush()
+        self.sink.close()
+
+def main(argv=None):
+    """コマンドライン引数を解析して CSV を正規化する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper normalize',
+                                     description='店舗情報の CSV を列単位で正規化する')
+    parser.add_argument('input', help='入力の CSV ファイル')
+    parser.add_argument('-o', '--output', required=True, help='出力の CSV ファイル')
+    parser.add_argument('--chunksize', type=int, default=100000, help='一度に正規化する行数')
+    args = parser.parse_args(argv)
+    count = normalize_csv(args.input, args.output, args.chunksize)
+    print(f"Normalized {count} rows -> {args.output}")
+
+if __name__ == "__main__":
+    main()
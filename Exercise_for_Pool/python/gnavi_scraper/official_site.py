@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗公式サイトの確認
+
+店舗公式URLのリダイレクト先の取得と、SSL 証明書の確認を行います。
+サーキットブレーカー（`circuit_breaker.CircuitBreaker`）を渡すと、接続できないことが
+分かっているホストには接続せず、すぐに結果を返します。その理由（'Circuit Open (Conn Timeout)' など）は
+`resolve_url_status` と `check_ssl_status` のメッセージとして返し、店舗情報の 'SSL確認' 列に記録されます。
+
+"""
+import ssl                              # SSL/TLSの処理
+import socket                           # ネットワーク通信（IPアドレス取得など）
+from urllib.parse import urlparse       # URL解析
+import requests                         # HTTPリクエストを送信する
+from .circuit_breaker import CircuitOpenError
+
+def resolve_url(url, timeout=None, session=None, breaker=None):
+    """URL にアクセスし、リダイレクト後の最終URLを返す（`resolve_url_status` の最終URLだけを返す）。"""
+    return resolve_url_status(url, timeout, session, breaker)[0]
+
+def resolve_url_status(url, timeout=None, session=None, breaker=None):
+    """URL にアクセスし、リダイレクト後の最終URLと、確認できなかった理由を返す。
+
+    Args:
+        url (str): 店舗ページに記載された公式URL。
+        timeout (float or None): リクエストのタイムアウト（秒）。
+        session (requests.Session or None): 接続を使い回す場合のセッション。
+        breaker (CircuitBreaker or None): 指定した場合、接続できないホストには接続せず元のURLを返す。
+
+    Returns:
+        tuple: (実際にブラウザで開いたときの最終的なURL, メッセージ)。エラー時は元のURL。
+            メッセージは回路が開いていて接続しなかった場合だけ 'URL Circuit Open (<最後の接続エラー>)'、
+            それ以外は空文字。
+
+    Notes:
+        - サーバー側で User-Agent に基づく動的なレスポンスがある場合、ブラウザでの挙動と異なるURLが取得される可能性がある。
+        - 必要なのは最終URLだけなので、本文はダウンロードしない（stream=True で開いてすぐ閉じる）。
+    """
+    host = urlparse(url).hostname
+    breaker = breaker if host else None     # ホスト名のない URL は requests のエラーになる
+    try:
+        if breaker:
+            breaker.check(host)
+    except CircuitOpenError as e:
+        message = f"URL Circuit Open ({e.reason})"
+        print(f"URL: {url} -> {message}")
+        return url, message
+
+    try:
+        # 指定したURLに GET リクエストを送り、ブラウザのように振る舞い、リダイレクトも自動追従する
+        response = (session or requests).get(url, headers={"User-Agent": "Mozilla/5.0"}, allow_redirects=True,
+                                             timeout=timeout, stream=True)
+        response.close()
+    except (requests.ConnectionError, requests.Timeout) as e:
+        # 接続できなかった（ホストが存在しない、応答しないなど）
+        if breaker:
+            breaker.failure(host, "Conn Timeout" if isinstance(e, requests.Timeout) else "Connection Error")
+        return url, ''
+    except requests.RequestException:
+        # 接続はできた（リダイレクトが多すぎるなど）。エラー時は元のURLを返す
+        if breaker:
+            breaker.success(host)
+        return url, ''
+    if breaker:
+        breaker.success(host)
+    # リダイレクト後の最終URL
+    return response.url, ''
+
+def check_ssl_status(url, timeout=5, breaker=None):
+    """URL の SSL 証明書を検証し、その結果を返す。
+
+    Args:
+        url (str): SSL 証明書を検証したい URL。
+        timeout (float): 接続のタイムアウト（秒）。
+        breaker (CircuitBreaker or None): 指定した場合、接続できないホストには接続しない。
+
+    Returns:
+        tuple: (URL が SSL 証明書を持っていれば `True`、そうでなければ `False`, 検証結果のメッセージ)。
+
+    Notes:
+        - SSL 証明書の検証は `check_ssl_certificate` 関数を利用して行う。
+        - URL が指定されていない場合は `(False, '')` を返す。
+    """
+    if not url:
+        return False, ''
+    has_ssl, message = check_ssl_certificate(url, timeout, breaker)
+    print(f"URL: {url} -> {message}")
+    return has_ssl, message
+
+def check_ssl_certificate(url, timeout=5, breaker=None):
+    """指定された URL の SSL 証明書を検証し、その結果を返す。
+
+    Args:
+        url (str): SSL 証明書を検証したい URL。
+        timeout (float): 接続のタイムアウト（秒）。
+        breaker (CircuitBreaker or None): 指定した場合、接続できないホストには接続せず
+            `(False, 'Circuit Open (<最後の接続エラー>)')` を返す。
+
+    Returns:
+        tuple:  SSL 証明書が有効であれば `(True, 'SSL Available')` を返し、
+                無効または接続に失敗した場合は `(False, エラーメッセージ)` を返す。
+
+    Notes:
+        - 接続できなかった場合（タイムアウト、接続拒否、名前解決の失敗）だけを `breaker` の失敗として数える。
+          SSL のエラーはホストが応答しているため失敗として数えない。
+    """
+    # テスト用URL (NOT SECURE!) -> http://www.hakarime.jp/
+    hostname = urlparse(url).hostname   # ドメイン名を取得（ポート番号は除く）
+
+    # ホスト名が取得できない場合は無効なURLと判断
+    if not hostname:
+        return False, "Invalid URL"
+
+    key = f"{hostname}:443"
+    try:
+        if breaker:
+            breaker.check(key)
+    except CircuitOpenError as e:
+        return False, f"Circuit Open ({e.reason})"
+
+    has_ssl, message, connected = _probe_certificate(hostname, timeout)
+    if breaker:
+        if connected:
+            breaker.success(key)
+        else:
+            breaker.failure(key, message)
+    return has_ssl, message
+
+def _probe_certificate(hostname, timeout):
+    """ホストのポート 443 に接続し、SSL 証明書を検証する。
+
+    Returns:
+        tuple: (SSL 証明書が有効か, メッセージ, ホストに接続できたか)。
+    """
+    # デフォルトのSSLコンテキストを作成
+    context = ssl.create_default_context()
+    try:
+        # 指定したホストに対してポート443（HTTPS）でソケット接続を確立
+        with socket.create_connection((hostname, 443), timeout=timeout) as sock:
+            # SSL/TLSでソケットをラップし、ホスト名を検証
+            with context.wrap_socket(sock, server_hostname=hostname) as ssock:
+                # 証明書を取得できた場合、証明書の有効性もチェック
+                if ssock.getpeercert():
+                    return True, "SSL Available", True
+                return False, "No Certificate", True
+    except ssl.SSLError as e:
+        return False, f"SSL Error: {e}", True
+    except socket.timeout:
+        return False, "Conn Timeout", False
+    except Exception as e:
+        return False, f"SSL Not Available ({e})", False
@@ -0,0 +1,193 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗ページの取得から出力までの処理"""
+from collections import deque                       # 並列取得中の店舗ページ（取得順を保つ）
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED   # 店舗ページの並列取得
+from .extract import extract_rs_data, empty_row
+from .metrics import METRICS
+from .official_site import resolve_url_status, check_ssl_status
+from .selector_health import SelectorHealth
+
+# selectors を指定しない場合のセレクタ（店舗情報が空のページが続いても中断しない）
+DEFAULT_SELECTORS = SelectorHealth(max_blank_stores=0)
+# SSL確認 の最大文字数（ex2_2 の列の長さ）
+MESSAGE_LENGTH = 255
+
+def get_rs_data(fetcher, rs_url, archive=None, timeout=None, ssl_timeout=5, selectors=None, hedger=None,
+                breaker=None, budget=None):
+    """店舗ページを取得し、店舗情報を抽出する。
+
+    Args:
+        fetcher (object): ページ取得のバックエンド。
+        rs_url (str): 店舗ページの URL。
+        archive (PageArchive or None): 指定した場合、取得したページの HTML を保存する。
+        timeout (float or None): 公式URLのリダイレクト先を確認するときのタイムアウト（秒）。
+        ssl_timeout (float): SSL 証明書を確認するときの接続タイムアウト（秒）。
+        selectors (SelectorHealth or None): 指定した場合、店舗情報を取り出せないページが続いたら中断する。
+        hedger (Hedger or None): 指定した場合、各処理に期限を設け、店舗ページの取得でヘッジリクエストを送る
+            （ヘッジリクエストは複数スレッドから使用できるバックエンドの場合のみ）。
+        breaker (CircuitBreaker or None): 指定した場合、接続できないことが分かっている店舗公式サイトには接続しない。
+        budget (Budget or None): 指定した場合、残り時間が少なくなったら公式URLのリダイレクト確認を省略し、
+            記載された URL をそのまま使う。
+
+    Returns:
+        dict: `ROW_COLUMNS` をキーとする店舗情報。
+            - 'URL' (str): リダイレクト後の店舗公式URL。
+            - 'SSL' (bool): 店舗公式サイトの SSL 対応状況。
+            - 'SSL確認' (str): SSL 証明書の確認結果のメッセージ。サーキットブレーカーや期限のために
+              公式URL・SSL を確認しなかった場合は、その理由（'URL Circuit Open (Conn Timeout)' など）。
+            ページを取得できなかった場合は `empty_row` の値を返す。
+
+    Raises:
+        SelectorDriftError: 店舗情報が空の店舗ページが続いた場合（`selectors` を指定した場合のみ）。
+    """
+    selectors = selectors or DEFAULT_SELECTORS
+    with METRICS.timer('fetch'):
+        if hedger and getattr(fetcher, 'concurrent', False):
+            html = hedger.fetch(fetcher, rs_url, wait_for=selectors.store_wait_for)
+        else:
+            html = fetcher.fetch(rs_url, wait_for=selectors.store_wait_for)
+    if html is None:
+        METRICS.inc('gnavi_errors_total', stage='fetch')
+        return empty_row(rs_url)   # エラーレスポンス時はデフォルト値を返す
+
+    with METRICS.timer('extract'):
+        row = extract_rs_data(html, rs_url)
+    selectors.check_store_page(html, rs_url, row)
+
+    # 公式URLのリダイレクト先と SSL 対応状況を確認
+    official_url = row['URL']
+    url_message = ''
+    with METRICS.timer('resolve_url'):
+        if not official_url:
+            row['URL'] = None
+        elif budget and budget.skip('resolve_url', rs_url):
+            pass                                # 記載された URL のまま
+        elif hedger:
+            row['URL'], url_message = hedger.call('resolve_url', resolve_url_status, official_url, timeout, None,
+                                                  breaker, default=(official_url, 'URL Deadline Exceeded'))
+        else:
+            row['URL'], url_message = resolve_url_status(official_url, timeout, breaker=breaker)
+    with METRICS.timer('ssl'):
+        if hedger and row['URL']:
+            row['SSL'], ssl_message = hedger.call('ssl', check_ssl_status, row['URL'], ssl_timeout, breaker,
+                                                  default=(False, 'Deadline Exceeded'))
+        else:
+            row['SSL'], ssl_message = check_ssl_status(row['URL'], ssl_timeout, breaker)
+    row['SSL確認'] = ' / '.join(message for message in (url_message, ssl_message) if message)[:MESSAGE_LENGTH]
+
+    # 再抽出用に HTML と、ネットワーク経由で得た値を保存
+    if archive:
+        archive.put(rs_url, html, official_url=official_url, URL=row['URL'], SSL=row['SSL'],
+                    SSL確認=row['SSL確認'])
+
+    return row
+
+def loop_rs_links(sink, fetcher, rs_links, rs_count, rs_demand, archive=None,
+                  workers=1, timeout=None, ssl_timeout=5, selectors=None, hedger=None, spare=0, breaker=None,
+                  budget=None):
+    """店舗ページの URL を巡回し、店舗情報を取得して出力先に書き込む。
+
+    Args:
+        sink (object): 出力先（`write` を持つオブジェクト）。
+        fetcher (object): ページ取得のバックエンド。
+        rs_links (iterable): 店舗ページの URL のリスト、または `iter_rs_links` / `iter_input_links` の
+            ジェネレータ。None は「次の URL を待っている」ことを表し、取得し終えた店舗情報を書き込む。
+        rs_count (int): 取得済みの店舗数。
+        rs_demand (int or None): 目標取得件数（None の場合は `rs_links` のすべての店舗を取得する）。
+        archive (PageArchive or None): 指定した場合、店舗ページの HTML を保存する。
+        workers (int): 店舗ページを並列に取得するスレッド数
+            （複数スレッドから使用できるバックエンドの場合のみ有効）。
+        timeout (float or None): 公式URLのリダイレクト先を確認するときのタイムアウト（秒）。
+        ssl_timeout (float): SSL 証明書を確認するときの接続タイムアウト（秒）。
+        selectors (SelectorHealth or None): 指定した場合、店舗情報を取り出せないページが続いたら中断する。
+        hedger (Hedger or None): 指定した場合、各処理に期限を設け、店舗ページの取得でヘッジリクエストを送る。
+        spare (int): `rs_links` が目標件数より多く返す店舗URLの数（投機的に取得する件数）。
+        breaker (CircuitBreaker or None): 指定した場合、接続できないことが分かっている店舗公式サイトには接続しない。
+        budget (Budget or None): 指定した場合、期限を過ぎたら新しい店舗ページの取得を始めず、
+            取得中のものを書き込んで終了する。
+
+    Returns:
+        int: 更新後の取得済みの店舗数。
+
+    Raises:
+        SelectorDriftError: セレクタが変わったため、巡回を続けても取得できない場合。
+
+    Notes:
+        - `rs_demand` の桁数に応じてゼロ埋めした店舗番号を表示する。
+        - 並列に取得する場合、先頭から続けて取得し終えた店舗情報は、次の店舗URLを待たずに書き込む。
+        - 並列に取得する場合も、出力先には店舗URLの順に書き込む。
+        - 並列に取得する場合、先に取得を始める店舗ページは workers の 2 倍までとする
+          （`iter_rs_links` の検索結果ページを必要以上に先読みしないため）。
+        - 書き込んだ件数・目標件数・取得中の店舗ページ数を `METRICS` に記録する。
+        - `spare` を指定した場合、店舗URLを取り終えた後は取得が終わった順に書き込み、目標件数に達したら
+          残りの店舗ページ（遅れているもの）を待たずに終了する。
+    """
+    rs_digits = len(str(rs_demand)) if rs_demand else 1     # rs_demandの桁数 (ゼロ埋め用)
+    if rs_demand is None:
+        rs_demand = float('inf')                # 入力のすべての店舗を取得する
+        spare = 0
+    else:
+        METRICS.set('gnavi_rows_demand', rs_demand)
+
+    def write(row):
+        with METRICS.timer('write'):
+            sink.write(row)
+        METRICS.inc('gnavi_rows_written_total')
+
+    if workers <= 1 or not getattr(fetcher, 'concurrent', False):
+        for link in rs_links:
+            if link is None:
+                continue
+            if rs_count >= rs_demand or (budget and budget.expired()):
+                break
+            num = str(rs_count + 1).zfill(rs_digits)
+            print(f'\nProcessing {num} -> {link}')
+            write(get_rs_data(fetcher, link, archive, timeout, ssl_timeout, selectors, hedger, breaker, budget))
+            rs_count += 1                       # 取得した店舗数をカウント
+        return rs_count
+
+    pending = deque()                           # 取得中の店舗ページ（URL の順）
+    METRICS.gauge_function('gnavi_fetch_inflight', lambda: len(pending))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for link in rs_links:
+            # 先頭から続けて取得し終えたものは、次の店舗URLを待たずに書き込む
+            while pending and pending[0].done():
+                write(pending.popleft().result())
+                rs_count += 1
+            if (spare and rs_count >= rs_demand) or (budget and budget.expired()):
+                break
+            if link is None:
+                continue
+            num = str(rs_count + len(pending) + 1).zfill(rs_digits)
+            print(f'\nProcessing {num} -> {link}')
+            pending.append(executor.submit(get_rs_data, fetcher, link, archive, timeout, ssl_timeout,
+                                           selectors, hedger, breaker, budget))
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+                rs_count += 1
+                if spare and rs_count >= rs_demand:
+                    break
+        if spare:
+            # 残りは終わった順に書き込み、目標件数に達したら遅れている店舗ページは待たない
+            remaining = set(pending)
+            while remaining and rs_count < rs_demand:
+                done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+                for future in [f for f in pending if f in done]:
+                    if rs_count < rs_demand:
+                        write(future.result())
+                        rs_count += 1
+            for future in remaining:
+                future.cancel()
+            if remaining:
+                print(f"Reached {rs_demand} stores; skipped {len(remaining)} speculative fetches.")
+            pending.clear()
+        while pending:
+            write(pending.popleft().result())
+            rs_count += 1
+    finally:
+        # 投機的に取得した店舗ページは、期限（hedger）までに終わるため待たずに進む
+        executor.shutdown(wait=not spare)
+
+    return rs_count
@@ -0,0 +1,278 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""取得処理のプロファイリング（`scrape --profile <ディレクトリ>`）
+
+遅い実行が CPU（BeautifulSoup、住所の正規表現など）によるものか、ネットワーク
+（requests、TLS）や chromedriver の応答待ちによるものかを切り分けるため、
+2 種類のプロファイラを同時に動かします。
+
+- 決定的プロファイラ（cProfile）: すべてのスレッドの関数呼び出しを記録し、`profile.pstats` に保存する
+  （Python 3.11 まではスレッドごとに 1 つ、3.12 以降はプロセス全体で 1 つのプロファイラ）。
+- サンプリングプロファイラ: 一定間隔ですべてのスレッドのスタックを記録し、その間に
+  スレッドが CPU を使った時間（on-CPU）と待っていた時間（off-CPU）に分けて、
+  フレームグラフ用の collapsed 形式（`wall.folded`, `oncpu.folded`, `offcpu.folded`）で保存する。
+  値はマイクロ秒で、flamegraph.pl や speedscope でそのまま表示できる。
+
+最後に、主な関数（`SUMMARY_FUNCTIONS`）ごとの経過時間と on-CPU / off-CPU の内訳を表示します。
+
+"""
+import cProfile                         # 決定的プロファイラ
+import io                               # 集計結果の文字列化
+import os                               # 出力先のディレクトリ
+import pstats                           # cProfile の集計
+import re                               # スレッド名の番号の除去
+import sys                              # スレッドのスタックの取得
+import threading                        # サンプリングのスレッド、各スレッドへのプロファイラの設定
+import time                             # サンプリング間隔、スレッドごとの CPU 時間
+from collections import Counter         # スタックごとの時間の集計
+
+# Python 3.12 以降の cProfile は sys.monitoring を使い、1 つのプロファイラで全スレッドを記録する
+# （スレッドごとに有効にすると 2 つ目で ValueError: Another profiling tool is already active になる）
+PROCESS_WIDE_CPROFILE = sys.version_info >= (3, 12)
+
+# 経過時間の内訳を表示する関数
+SUMMARY_FUNCTIONS = [
+    'loop_rs_links', 'get_rs_data', 'fetch', 'extract_rs_data', 'get_address', 'get_url',
+    'resolve_url', 'check_ssl_certificate', 'fetch_search_page', 'write',
+]
+
+def thread_cpu_time(ident):
+    """スレッドの CPU 時間（秒）を返す。取得できない場合は None。
+
+    Args:
+        ident (int): `threading.get_ident()` のスレッド識別子。
+
+    Notes:
+        - Linux などの `time.pthread_getcpuclockid` が使える環境でのみ取得できる。
+    """
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+def collapse_stack(frame, thread_name):
+    """フレームからルートまでのスタックを collapsed 形式の 1 行にする。
+
+    Args:
+        frame (frame): スタックの末端のフレーム。
+        thread_name (str): スレッド名（スタックの根元に付ける）。
+
+    Returns:
+        str: 'スレッド名;関数 (ファイル名);...' 形式の文字列。
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    # ThreadPoolExecutor-0_3 のような番号を除き、同じ役割のスレッドをまとめる
+    names.append(re.sub(r'_\d+$', '', thread_name))
+    return ';'.join(reversed(names))
+
+class StackSampler:
+    """一定間隔ですべてのスレッドのスタックを記録するサンプリングプロファイラ。
+
+    Args:
+        interval (float): サンプリング間隔（秒）。
+
+    Attributes:
+        oncpu (Counter): スタック → CPU を使っていた時間（マイクロ秒）。
+        offcpu (Counter): スタック → 待っていた時間（マイクロ秒）。
+
+    Notes:
+        - サンプル間の経過時間のうち、そのスレッドの CPU 時間の増分を on-CPU、残りを off-CPU とする。
+        - スレッドごとの CPU 時間が取得できない環境では、すべて off-CPU として記録する。
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.oncpu = Counter()
+        self.offcpu = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        last_time = time.perf_counter()
+        last_cpu = {}               # スレッド識別子 → 前回の CPU 時間
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed = now - last_time
+            last_time = now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = collapse_stack(frame, names.get(ident, 'thread'))
+                cpu = thread_cpu_time(ident)
+                previous = last_cpu.get(ident)
+                last_cpu[ident] = cpu
+                on = min(max(cpu - previous, 0.0), elapsed) if cpu is not None and previous is not None else 0.0
+                self.oncpu[stack] += int(on * 1e6)
+                self.offcpu[stack] += int((elapsed - on) * 1e6)
+
+class ThreadProfiles:
+    """メインスレッドと、実行中に作られたすべてのスレッドで cProfile を動かす。
+
+    Notes:
+        - Python 3.11 まで: `threading.setprofile` で新しいスレッドの最初のイベントを捕まえ、そのスレッド用の
+          `cProfile.Profile` を有効にする（cProfile は有効にしたスレッドしか記録しない）。
+          他のスレッドのプロファイラはそのスレッドからしか外せないため、`stop` の時点でまだ動いている
+          スレッドは、その時点までの集計を使う（スレッドの終了時にプロファイラも外れる）。
+        - Python 3.12 以降: メインスレッドで 1 つだけ有効にし、全スレッドを記録する。
+          並列に動くスレッドの呼び出しが 1 つの呼び出しスタックに混ざるため、関数ごとの累計時間は目安になる
+          （スレッドごとの内訳はサンプリングプロファイラの結果を使う）。
+        - 他のプロファイラ（coverage など）が動いていて有効にできない場合は、警告を表示して cProfile を使わない。
+    """
+
+    def __init__(self):
+        self.profiles = {}          # スレッド識別子 → cProfile.Profile
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def _new_profile(self):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            print(f"Warning: cProfile is unavailable in {threading.current_thread().name} ({e}); "
+                  f"only the sampling profile covers it.")
+            return
+        with self._lock:
+            if self._stopped:
+                profile.disable()       # stop と同時に始まったスレッド
+                return
+            self.profiles[threading.get_ident()] = profile
+
+    def _bootstrap(self, frame, event, arg):
+        sys.setprofile(None)
+        self._new_profile()
+
+    def start(self):
+        if not PROCESS_WIDE_CPROFILE:
+            threading.setprofile(self._bootstrap)
+        self._new_profile()
+
+    def stop(self):
+        """記録を終え、各プロファイラの集計を確定する。"""
+        threading.setprofile(None)
+        with self._lock:
+            self._stopped = True
+            profiles = dict(self.profiles)
+        own = threading.get_ident()
+        running = {thread.ident for thread in threading.enumerate()} - {own}
+        for ident, profile in profiles.items():
+            if ident == own:
+                profile.create_stats()      # 無効にしてから集計する（3.12 以降は全スレッド分）
+            else:
+                profile.snapshot_stats()    # 他のスレッドの集計は、この時点までで確定する
+        still_profiled = running & set(profiles)
+        if still_profiled:
+            print(f"Note: {len(still_profiled)} profiled threads are still running; "
+                  f"their cProfile results end at this point.")
+
+    def stats(self):
+        """すべてのスレッドの集計をまとめた `pstats.Stats` を返す（`stop` の後に呼び出す）。"""
+        stats = None
+        for profile in self.profiles.values():
+            if not getattr(profile, 'stats', None):
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                stats.add(profile)
+        return stats
+
+def write_folded(path, counter):
+    """collapsed 形式のファイルを書き出す（値が 0 のスタックは除く）。"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, value in sorted(counter.items()):
+            if value > 0:
+                f.write(f"{stack} {value}\n")
+
+def function_times(stats, oncpu, offcpu, functions=SUMMARY_FUNCTIONS):
+    """関数ごとの呼び出し回数・累計時間と、on-CPU / off-CPU の時間を集計する。
+
+    Args:
+        stats (pstats.Stats or None): cProfile の集計。
+        oncpu (Counter): スタック → on-CPU の時間（マイクロ秒）。
+        offcpu (Counter): スタック → off-CPU の時間（マイクロ秒）。
+        functions (list): 集計する関数名。
+
+    Returns:
+        list: (関数名, 呼び出し回数, 累計時間 [秒], on-CPU [秒], off-CPU [秒]) のリスト。
+
+    Notes:
+        - 同じ名前の関数（`fetch` など）はファイルをまたいで合計する。
+        - 累計時間はスレッドごとの経過時間の合計のため、並列に取得した場合は全体の経過時間を超えることがある。
+        - on-CPU / off-CPU は、その関数を含むスタックのサンプルの合計（再帰しても 1 回だけ数える）。
+    """
+    rows = []
+    for name in functions:
+        calls, cumulative = 0, 0.0
+        if stats is not None:
+            for (_, _, func_name), (_, total_calls, _, cum_time, _) in stats.stats.items():
+                if func_name == name:
+                    calls += total_calls
+                    cumulative += cum_time
+        marker = f';{name} ('
+        on = sum(value for stack, value in oncpu.items() if marker in stack) / 1e6
+        off = sum(value for stack, value in offcpu.items() if marker in stack) / 1e6
+        rows.append((name, calls, cumulative, on, off))
+    return rows
+
+class Profiler:
+    """cProfile とサンプリングプロファイラで処理全体をプロファイリングする。
+
+    Args:
+        output_dir (str): 結果を保存するディレクトリ。
+        interval (float): サンプリング間隔（秒）。
+
+    Notes:
+        - `with` 文で囲んだ処理が対象になる。終了時に結果を保存し、概要を表示する。
+    """
+
+    def __init__(self, output_dir, interval=0.005):
+        self.output_dir = output_dir
+        self.sampler = StackSampler(interval)
+        self.profiles = ThreadProfiles()
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def __enter__(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._start = (time.perf_counter(), time.process_time())
+        self.sampler.start()
+        self.profiles.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiles.stop()
+        self.sampler.stop()
+        self.wall_time = time.perf_counter() - self._start[0]
+        self.cpu_time = time.process_time() - self._start[1]
+        self.save()
+        return False
+
+    def save(self):
+        """結果をファイルに保存し、概要を表示する。"""
+        stats = self.profiles.stats()
+        if stats is not None:
+            stats.dump_stats(os.path.join(self.output_dir, 'profile.pstats'))
+        write_folded(os.path.join(self.output_dir, 'oncpu.folded'), self.sampler.oncpu)
+        write_folded(os.path.join(self.output_dir, 'offcpu.folded'), self.sampler.offcpu)
+        write_folded(os.path.join(self.output_dir, 'wall.folded'), self.sampler.oncpu + self.sampler.offcpu)
+
+        print(f"\nProfile: wall {self.wall_time:.2f} s, process CPU {self.cpu_time:.2f} s "
+              f"({self.cpu_time / self.wall_time:.0%} of wall)" if self.wall_time else "\nProfile: empty run")
+        print(f"{'function':<24} {'calls':>8} {'cumulative [s]':>15} {'on-CPU [s]':>11} {'off-CPU [s]':>12}")
+        for name, calls, cumulative, on, off in function_times(stats, self.sampler.oncpu, self.sampler.offcpu):
+            print(f"{name:<24} {calls:8d} {cumulative:15.2f} {on:11.2f} {off:12.2f}")
+        print(f"Saved profile.pstats and wall/oncpu/offcpu.folded to {self.output_dir}")
@@ -0,0 +1,354 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""ex2_2 の読み取り用 API（結果のキャッシュ付き）
+
+「市区町村 X の SSL 非対応の店舗」のような、よく使う条件での検索と集計を HTTP で提供します
+（docker-compose の ex2_py では 5000 番ポート。scrape の状態確認用エンドポイントと同じポートのため、
+取得が終わってから起動する）。
+
+- `GET /stores?pref=東京都&city=渋谷区&ssl=0&after=<ID>&limit=100`: 条件に合う店舗を ID の順に返す。
+  次のページは、応答の `next` を `after` に指定して取得する（キーセットページネーション。
+  OFFSET と違い、深いページでも読み飛ばす行がない）。
+- `GET /stores.ndjson?pref=東京都&ssl=0`: 条件に合うすべての店舗を 1 行 1 件の JSON で返す。
+  サーバー側のカーソルで少しずつ読み出して送るため、件数が多くてもメモリを使わない（キャッシュしない）。
+- `GET /counts?group=city&pref=東京都&ssl=0`: 都道府県（group=pref）または市区町村（group=city）ごとの店舗数。
+- `GET /metrics`: キャッシュの命中率などのメトリクス（Prometheus のテキスト形式）。
+
+検索条件はすべてプレースホルダで渡します。/stores と /counts の結果は LRU・有効期限付きのキャッシュに
+保存し、テーブルの更新番号（`db.table_version`）が変わったら、有効期限内でもすべて捨てます。
+
+実行方法:
+    python3 -m gnavi_scraper serve --port 5000 --cache-size 512 --cache-ttl 60
+
+"""
+import argparse                                                      # コマンドライン引数の解析
+import json                                                          # 応答の JSON
+import threading                                                     # キャッシュの排他制御
+import time                                                          # 有効期限・更新番号の確認間隔
+from collections import OrderedDict                                  # LRU の順序
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # API の HTTP サーバー
+from urllib.parse import urlparse, parse_qsl                         # パスとクエリ文字列の解析
+from .metrics import METRICS
+
+# 返す列
+STORE_COLUMNS = ['ID', '店舗URL', '店舗名', '電話番号', 'メールアドレス', '都道府県', '市区町村', '番地',
+                 '建物名', 'URL', 'SSL', '取得日時']
+# 検索条件のパラメータ → (列名, 値の変換)
+FILTERS = {
+    'pref': ('都道府県', str),
+    'city': ('市区町村', str),
+    'phone': ('電話番号', str),
+    'ssl': ('SSL', int),
+}
+# 集計の単位 → 列名
+GROUPS = {
+    'pref': ['都道府県'],
+    'city': ['都道府県', '市区町村'],
+}
+# 1 ページの件数の既定値と上限
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+class QueryError(ValueError):
+    """検索条件が正しくないことを表す例外（400 を返す）。"""
+
+class QueryCache:
+    """LRU・有効期限付きの結果のキャッシュ。テーブルの更新番号が変わったらすべて捨てる。
+
+    Args:
+        maxsize (int): 保存する結果の最大数（超えたら最も長く使われていないものから捨てる）。
+        ttl (float): 結果の有効期限（秒）。
+        version_func (callable or None): テーブルの現在の更新番号を返す関数。
+        version_interval (float): 更新番号を確認する最短間隔（秒。リクエストごとに問い合わせないため）。
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0, version_func=None, version_interval=1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_func = version_func
+        self.version_interval = version_interval
+        self._entries = OrderedDict()       # キー → (値, 保存した時刻)
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        METRICS.gauge_function('gnavi_query_cache_entries', lambda: len(self._entries))
+
+    def _check_version(self):
+        """更新番号が変わっていたらキャッシュをすべて捨てる。"""
+        if self.version_func is None or time.monotonic() - self._checked_at < self.version_interval:
+            return
+        self._checked_at = time.monotonic()
+        version = self.version_func()
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    METRICS.inc('gnavi_query_cache_invalidations_total')
+                self._entries.clear()
+                self._version = version
+
+    def get(self, key, compute):
+        """キャッシュされた結果を返す。ないか期限切れの場合は `compute()` の結果を保存して返す。
+
+        Args:
+            key (tuple): 結果のキー（エンドポイントと検索条件）。
+            compute (callable): 結果を求める関数。
+
+        Returns:
+            object: 結果。
+
+        Notes:
+            - `compute()` の実行中に更新番号が変わった場合は、結果を返すだけで保存しない
+              （更新前のデータから求めた結果が、捨てたばかりのキャッシュに戻らないようにする）。
+        """
+        self._check_version()
+        now = time.monotonic()
+        with self._lock:
+            version = self._version
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                METRICS.inc('gnavi_cache_requests_total', cache='query', result='hit')
+                return entry[0]
+        METRICS.inc('gnavi_cache_requests_total', cache='query', result='miss')
+        value = compute()
+        with self._lock:
+            if self._version != version:
+                return value
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """キャッシュをすべて捨てる。"""
+        with self._lock:
+            self._entries.clear()
+
+def build_where(params):
+    """検索条件のパラメータから WHERE 句とプレースホルダの値を作る。
+
+    Args:
+        params (dict): クエリ文字列のパラメータ。
+
+    Returns:
+        tuple: (WHERE 句の条件のリスト, 値のリスト)。
+
+    Raises:
+        QueryError: 値を変換できない場合。
+    """
+    conditions, values = [], []
+    for name, (column, convert) in FILTERS.items():
+        if name not in params:
+            continue
+        try:
+            values.append(convert(params[name]))
+        except ValueError:
+            raise QueryError(f"Invalid {name}: {params[name]}")
+        conditions.append(f"`{column}` = %s")
+    if 'has_url' in params:
+        conditions.append("`URL` IS NOT NULL" if params['has_url'] not in ('0', 'false') else "`URL` IS NULL")
+    return conditions, values
+
+def _int_param(params, name, default, maximum=None):
+    """整数のパラメータを取り出す。"""
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise QueryError(f"Invalid {name}: {params[name]}")
+    if value < 0:
+        raise QueryError(f"Invalid {name}: {value}")
+    return min(value, maximum) if maximum else value
+
+class QueryService:
+    """ex2_2 の検索と集計を行う。
+
+    Args:
+        engine (sqlalchemy.engine.Engine): データベースエンジン。
+        table_name (str): 店舗情報のテーブル名。
+        cache (QueryCache or None): 結果のキャッシュ（None の場合はキャッシュしない）。
+    """
+
+    def __init__(self, engine, table_name='ex2_2', cache=None):
+        self.engine = engine
+        self.table_name = table_name
+        self.cache = cache
+
+    def _cached(self, key, compute):
+        return self.cache.get(key, compute) if self.cache else compute()
+
+    def stores(self, params):
+        """条件に合う店舗を、ID が `after` より大きいものから `limit` 件返す。
+
+        Returns:
+            dict: {'stores': 店舗のリスト, 'next': 次のページの after（最後のページでは None）}。
+        """
+        conditions, values = build_where(params)
+        after = _int_param(params, 'after', 0)
+        limit = _int_param(params, 'limit', DEFAULT_LIMIT, MAX_LIMIT) or DEFAULT_LIMIT
+
+        def compute():
+            where = ' AND '.join(conditions + ['ID > %s'])
+            columns = ', '.join(f'`{column}`' for column in STORE_COLUMNS)
+            with METRICS.timer('query'), self.engine.connect() as conn:
+                result = conn.exec_driver_sql(
+                    f"SELECT {columns} FROM {self.table_name} WHERE {where} ORDER BY ID LIMIT %s",
+                    tuple(values + [after, limit]))
+                rows = [dict(row) for row in result.mappings()]
+            return {'stores': rows, 'next': rows[-1]['ID'] if len(rows) == limit else None}
+
+        return self._cached(('stores', tuple(sorted(params.items()))), compute)
+
+    def iter_stores(self, params, batch_size=1000):
+        """条件に合うすべての店舗を、サーバー側のカーソルで少しずつ読み出して 1 件ずつ返す。
+
+        Yields:
+            dict: 店舗情報。
+        """
+        conditions, values = build_where(params)
+        where = ' AND '.join(conditions) or '1'
+        columns = ', '.join(f'`{column}`' for column in STORE_COLUMNS)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).exec_driver_sql(
+                f"SELECT {columns} FROM {self.table_name} WHERE {where} ORDER BY ID", tuple(values))
+            for row in result.mappings():
+                yield dict(row)
+
+    def counts(self, params):
+        """都道府県または市区町村ごとの店舗数を返す。
+
+        Returns:
+            list: {列名: 値, ..., '店舗数': 件数} のリスト（店舗数の多い順）。
+        """
+        group = params.get('group', 'city')
+        if group not in GROUPS:
+            raise QueryError(f"Invalid group: {group} (choose from {', '.join(GROUPS)})")
+        conditions, values = build_where(params)
+
+        def compute():
+            columns = ', '.join(f'`{column}`' for column in GROUPS[group])
+            where = ' AND '.join(conditions) or '1'
+            with METRICS.timer('query'), self.engine.connect() as conn:
+                result = conn.exec_driver_sql(
+                    f"SELECT {columns}, COUNT(*) AS `店舗数` FROM {self.table_name} WHERE {where} "
+                    f"GROUP BY {columns} ORDER BY `店舗数` DESC", tuple(values))
+                return [dict(row) for row in result.mappings()]
+
+        return self._cached(('counts', tuple(sorted(params.items()))), compute)
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """API のリクエストを `QueryService` に振り分ける。"""
+
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        METRICS.inc('gnavi_query_requests_total', path=url.path)
+        try:
+            if url.path == '/stores':
+                self._send_json(self.service.stores(params))
+            elif url.path == '/stores.ndjson':
+                self._send_stream(self.service.iter_stores(params))
+            elif url.path == '/counts':
+                self._send_json(self.service.counts(params))
+            elif url.path == '/metrics':
+                self._send(METRICS.prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+            else:
+                self.send_error(404)
+        except QueryError as e:
+            self.send_error(400, str(e))
+
+    def _send(self, data, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, value):
+        self._send(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'), 'application/json')
+
+    def _send_stream(self, rows):
+        """行を 1 行ずつ書き出す（長さが分からないため、接続を閉じて終わりを示す）。"""
+        rows = iter(rows)
+        first = next(rows, None)        # 検索条件の誤りは、応答を始める前に 400 で返す
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        if first is None:
+            return
+        self.wfile.write((json.dumps(first, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+        for row in rows:
+            self.wfile.write((json.dumps(row, ensure_ascii=False, default=str) + '\n').encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(service, port=5000, host='0.0.0.0'):
+    """API を起動し、中断されるまで応答する。
+
+    Args:
+        service (QueryService): 検索と集計を行うオブジェクト。
+        port (int): 待ち受けるポート番号。
+        host (str): 待ち受けるアドレス。
+    """
+    handler = type('QueryHandler', (_QueryHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Query API: http://{host}:{server.server_address[1]}/stores (/stores.ndjson, /counts, /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def open_service(table_name='ex2_2', cache_size=256, cache_ttl=60.0, workers=8):
+    """環境変数の接続設定から `QueryService` を作成する。
+
+    Args:
+        table_name (str): 店舗情報のテーブル名。
+        cache_size (int): キャッシュする結果の最大数（0 の場合はキャッシュしない）。
+        cache_ttl (float): 結果の有効期限（秒）。
+        workers (int): 接続プールの接続数。
+
+    Returns:
+        QueryService: 検索と集計を行うオブジェクト。
+    """
+    from .db import create_db_engine, has_version_table, table_version     # MySQL への接続
+
+    engine = create_db_engine(pool_size=workers)
+    cache = None
+    if cache_size:
+        with engine.connect() as conn:
+            versioned = has_version_table(conn)
+        if not versioned:
+            print("Warning: table_versions is missing; cached results expire only by --cache-ttl.")
+
+        def current_version():
+            with engine.connect() as conn:
+                return table_version(conn, table_name)
+
+        cache = QueryCache(cache_size, cache_ttl, current_version if versioned else None)
+    return QueryService(engine, table_name, cache)
+
+def main(argv=None):
+    """コマンドライン引数を解析して API を起動する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper serve',
+                                     description='ex2_2 の読み取り用 API を起動する')
+    parser.add_argument('--port', type=int, default=5000, help='待ち受けるポート番号')
+    parser.add_argument('--host', default='0.0.0.0', help='待ち受けるアドレス')
+    parser.add_argument('--table', default='ex2_2', help='店舗情報のテーブル名')
+    parser.add_argument('--cache-size', type=int, default=256, help='キャッシュする結果の最大数（0 で無効）')
+    parser.add_argument('--cache-ttl', type=float, default=60.0, help='結果の有効期限（秒）')
+    parser.add_argument('--pool-size', type=int, default=8, help='データベースの接続数')
+    args = parser.parse_args(argv)
+    serve(open_service(args.table, args.cache_size, args.cache_ttl, args.pool_size), args.port, args.host)
+
+if __name__ == "__main__":
+    main()
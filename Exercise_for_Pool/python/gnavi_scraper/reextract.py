@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""アーカイブ済みの店舗ページからの再抽出
+
+`PageArchive` に保存した店舗ページから、ネットワークに接続せずに店舗情報を
+抽出し直して出力を作り直します。
+
+実行方法:
+    python3 -m gnavi_scraper reextract <アーカイブのディレクトリ> -o 1-1.csv
+
+"""
+import argparse                                     # コマンドライン引数の解析
+from concurrent.futures import ProcessPoolExecutor  # 並列の再抽出
+from .archive import PageArchive
+from .extract import extract_rs_data
+from .sinks import CsvSink
+
+def reextract_record(archive_dir, record):
+    """アーカイブ済みの店舗ページ 1 件から、ネットワークに接続せずに店舗情報を抽出する。
+
+    Args:
+        archive_dir (str): アーカイブの保存先ディレクトリ。
+        record (dict): `PageArchive.records` が返した索引レコード。
+
+    Returns:
+        dict: `pipeline.get_rs_data` と同じ形式の店舗情報。
+
+    Notes:
+        - 店舗名・電話番号・メールアドレス・住所・公式URLは HTML から抽出し直す。
+        - 公式URLが取得時と同じ場合は、取得時に記録したリダイレクト後の URL と SSL の判定結果（SSL確認 を含む）を使う。
+        - 公式URLが変わった場合は、記載された URL をそのまま使い、SSL は False とする。
+    """
+    html = PageArchive(archive_dir).read(record)
+    row = extract_rs_data(html, record['url'])
+
+    official_url = row['URL']
+    if official_url and official_url == record.get('official_url'):
+        row['URL'] = record.get('URL')
+        row['SSL'] = record.get('SSL', False)
+        row['SSL確認'] = record.get('SSL確認', '')
+    return row
+
+def reextract(archive_dir, sink, max_workers=None):
+    """アーカイブ全体から店舗情報を並列に再抽出し、出力先に書き込む。
+
+    Args:
+        archive_dir (str): アーカイブの保存先ディレクトリ。
+        sink (Sink): 出力先。
+        max_workers (int or None): 並列実行するプロセス数（None の場合は CPU 数）。
+
+    Returns:
+        int: 再抽出した店舗数。
+    """
+    records = PageArchive(archive_dir).records()
+    print(f"Re-extracting {len(records)} pages from {archive_dir}")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, sink:
+        for row in executor.map(reextract_record, [archive_dir] * len(records), records, chunksize=16):
+            sink.write(row)
+    return len(records)
+
+def main(argv=None):
+    """コマンドライン引数を解析して再抽出を実行する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper reextract',
+                                     description='アーカイブ済みの店舗ページから CSV を作り直す')
+    parser.add_argument('archive_dir', help='アーカイブの保存先ディレクトリ')
+    parser.add_argument('-o', '--output', default='1-1.csv', help='出力するCSVファイル名')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='並列実行するプロセス数')
+    args = parser.parse_args(argv)
+    reextract(args.archive_dir, CsvSink(args.output), args.jobs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗公式URLと SSL 対応状況の再確認
+
+店舗名や住所に比べて、公式URL（リダイレクト先）と SSL 対応状況は早く古くなります。
+ぐるなびを巡回し直さずに、既存の CSV（1-1.csv / 1-2.csv）または ex2_2 テーブルの
+URL と SSL だけを並列に確認し直し、値が変わった行だけを書き戻します。
+
+- 同じ URL・同じホストは 1 回だけ確認する（チェーン店などで重複が多いため）。
+- `--cache` を指定すると確認結果をファイルに保存し、有効期限内は確認を省略する。
+- 全体の毎秒リクエスト数と、同じホストへのリクエスト間隔を制限する。
+
+実行方法:
+    python3 -m gnavi_scraper revalidate ex1_web-scraping/1-1.csv ex1_web-scraping/1-2.csv -j 32
+    python3 -m gnavi_scraper revalidate --mysql --table ex2_2 --cache revalidate-cache.json
+
+"""
+import argparse                                     # コマンドライン引数の解析
+import csv                                          # CSV の読み書き
+import json                                         # キャッシュファイルの読み書き
+import os                                           # ファイルの置き換え
+import threading                                    # スレッドごとのセッション、状態の保護
+import time                                         # 待機・有効期限
+from concurrent.futures import ThreadPoolExecutor   # URL の並列確認
+from urllib.parse import urlparse                   # ホスト名の取得
+from .metrics import METRICS
+from .official_site import resolve_url, check_ssl_certificate
+
+class RateLimiter:
+    """全体の毎秒リクエスト数と、同じホストへのリクエスト間隔を制限する。
+
+    Args:
+        rate (float): 全体の毎秒リクエスト数の上限（0 の場合は制限しない）。
+        per_host_interval (float): 同じホストへのリクエストの最短間隔（秒）。
+
+    Notes:
+        - 呼び出し順に実行時刻を予約し、予約した時刻まで待つ（複数スレッドから使用できる）。
+    """
+
+    def __init__(self, rate=20.0, per_host_interval=1.0):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.per_host_interval = per_host_interval
+        self._next_time = 0.0       # 次にリクエストできる時刻（全体）
+        self._next_host = {}        # ホスト名 → 次にリクエストできる時刻
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """リクエストを送ってよい時刻まで待つ。
+
+        Args:
+            host (str): リクエスト先のホスト名。
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time, self._next_host.get(host, 0.0))
+            self._next_time = slot + self.interval
+            self._next_host[host] = slot + self.per_host_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class ResultCache:
+    """確認結果のキャッシュ（有効期限付き、JSON ファイルに保存）。
+
+    Args:
+        path (str or None): キャッシュファイルのパス（None の場合は保存しない）。
+        ttl_hours (float): 確認結果の有効期限（時間）。
+    """
+
+    def __init__(self, path=None, ttl_hours=24.0):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.entries = {}           # キー → [値, 確認した時刻]
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, key):
+        """有効期限内の確認結果を返す。
+
+        Args:
+            key (str): キー（'url:<URL>' または 'ssl:<ホスト名>'）。
+
+        Returns:
+            tuple: (見つかったか, 値)。
+        """
+        entry = self.entries.get(key)
+        kind = key.split(':', 1)[0]
+        if entry and time.time() - entry[1] < self.ttl:
+            METRICS.inc('gnavi_cache_requests_total', cache=kind, result='hit')
+            return True, entry[0]
+        METRICS.inc('gnavi_cache_requests_total', cache=kind, result='miss')
+        return False, None
+
+    def put(self, key, value):
+        """確認結果を記録する。"""
+        with self._lock:
+            self.entries[key] = [value, time.time()]
+
+    def save(self):
+        """期限切れの結果を除いてファイルに保存する。"""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = {key: entry for key, entry in self.entries.items() if now - entry[1] < self.ttl}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+class Revalidator:
+    """店舗公式URLのリダイレクト先と SSL 対応状況を並列に確認する。
+
+    Args:
+        workers (int): 並列に確認するスレッド数。
+        timeout (float): リダイレクト先の確認のタイムアウト（秒）。
+        ssl_timeout (float): SSL 証明書の確認の接続タイムアウト（秒）。
+        limiter (RateLimiter or None): リクエストの間隔の制限。
+        cache (ResultCache or None): 確認結果のキャッシュ。
+
+    Notes:
+        - SSL 対応状況はホストごとに決まるため、ホスト名ごとに 1 回だけ確認する。
+        - スレッドごとに `requests.Session` を持ち、同じホストへの接続を使い回す。
+    """
+
+    def __init__(self, workers=16, timeout=10.0, ssl_timeout=5.0, limiter=None, cache=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.ssl_timeout = ssl_timeout
+        self.limiter = limiter or RateLimiter()
+        self.cache = cache or ResultCache()
+        self._local = threading.local()
+        self._ssl_locks = {}        # ホスト名 → 同じホストを同時に確認しないためのロック
+        self._lock = threading.Lock()
+
+    def _session(self):
+        """スレッドごとの requests セッションを返す。"""
+        import requests             # HTTPリクエストを送信する
+
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def resolve(self, url):
+        """URL のリダイレクト先を返す（キャッシュを使用）。"""
+        found, final_url = self.cache.get(f'url:{url}')
+        if not found:
+            self.limiter.wait(urlparse(url).hostname or '')
+            final_url = resolve_url(url, self.timeout, self._session())
+            self.cache.put(f'url:{url}', final_url)
+        return final_url
+
+    def check_ssl(self, url):
+        """URL のホストの SSL 対応状況を返す（ホストごとにキャッシュを使用）。"""
+        host = urlparse(url).hostname
+        if not host:
+            return False
+        with self._lock:
+            host_lock = self._ssl_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            found, has_ssl = self.cache.get(f'ssl:{host}')
+            if not found:
+                self.limiter.wait(host)
+                has_ssl, _ = check_ssl_certificate(url, self.ssl_timeout)
+                self.cache.put(f'ssl:{host}', has_ssl)
+        return has_ssl
+
+    def check(self, url):
+        """1 つの URL を確認する。
+
+        Args:
+            url (str): 保存されている店舗公式URL。
+
+        Returns:
+            tuple: (リダイレクト後の URL, SSL 対応状況)。
+        """
+        final_url = self.resolve(url)
+        return final_url, self.check_ssl(final_url)
+
+    def check_all(self, urls):
+        """複数の URL を並列に確認する。
+
+        Args:
+            urls (iterable): 店舗公式URL。重複していてもよい。
+
+        Returns:
+            dict: URL → (リダイレクト後の URL, SSL 対応状況)。
+        """
+        unique_urls = sorted(set(url for url in urls if url))
+        print(f"Checking {len(unique_urls)} unique URLs with {self.workers} workers")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(zip(unique_urls, executor.map(self.check, unique_urls)))
+        self.cache.save()
+        return results
+
+def parse_ssl(value):
+    """CSV（'True' / 'False'）や MySQL（0 / 1）の SSL の値を bool に変換する。"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1')
+    return bool(value)
+
+def changed_rows(rows, results):
+    """確認結果で URL・SSL が変わる行を、新しい値にして返す。
+
+    Args:
+        rows (list): 'URL' と 'SSL' を持つ行 (dict) のリスト。
+        results (dict): `Revalidator.check_all` の結果。
+
+    Returns:
+        list: (行の位置, 新しい値の行) のリスト。
+    """
+    changes = []
+    for index, row in enumerate(rows):
+        if not row.get('URL') or row['URL'] not in results:
+            continue
+        final_url, has_ssl = results[row['URL']]
+        if final_url != row['URL'] or has_ssl != parse_ssl(row.get('SSL')):
+            changes.append((index, dict(row, URL=final_url, SSL=has_ssl)))
+    return changes
+
+def revalidate_csv(file_name, revalidator, dry_run=False):
+    """CSV ファイルの URL と SSL を確認し直し、変わった行を書き戻す。
+
+    Args:
+        file_name (str): CSV ファイル（UTF-8 BOM 付き、1-1.csv / 1-2.csv の形式）。
+        revalidator (Revalidator): URL の確認に使用する。
+        dry_run (bool): True の場合は書き戻さない。
+
+    Returns:
+        list: (行の位置, 新しい値の行) のリスト。
+
+    Notes:
+        - 変わった行がある場合だけ、一時ファイルに書き出してから置き換える（途中で失敗しても元のファイルは残る）。
+    """
+    with open(file_name, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    changes = changed_rows(rows, revalidator.check_all(row.get('URL') for row in rows))
+    print(f"{file_name}: {len(changes)} of {len(rows)} rows changed")
+    if not changes or dry_run:
+        return changes
+
+    for index, row in changes:
+        rows[index] = row
+    tmp_path = file_name + '.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, file_name)
+    return changes
+
+def revalidate_table(engine, table_name, revalidator, history_table=None, batch_size=500, dry_run=False):
+    """MySQL のテーブルの URL と SSL を確認し直し、変わった行だけを更新する。
+
+    Args:
+        engine (sqlalchemy.engine.Engine): データベースエンジン。
+        table_name (str): 店舗情報のテーブル名（例: 'ex2_2'）。
+        revalidator (Revalidator): URL の確認に使用する。
+        history_table (str or None): 指定した場合、変更をこの履歴テーブルに記録する。
+        batch_size (int): 1 トランザクションで更新する最大行数。
+        dry_run (bool): True の場合は更新しない。
+
+    Returns:
+        list: (行の位置, 新しい値の行) のリスト。
+
+    Notes:
+        - 行は ID で更新する（店舗URL のない、移行前からある行も更新する。変更履歴は店舗URL のある行だけ記録する）。
+        - 取得日時は変えない（店舗ページを取得し直したわけではないため、ON UPDATE CURRENT_TIMESTAMP を打ち消す）。
+    """
+    from .db import has_version_table, bump_table_version     # 読み取り側のキャッシュの無効化
+    from .history import record_changes         # 変更履歴の記録
+
+    with engine.connect() as conn:
+        result = conn.exec_driver_sql(
+            f"SELECT `ID`, `店舗URL`, `URL`, `SSL` FROM {table_name} WHERE `URL` IS NOT NULL AND `URL` <> ''")
+        rows = [dict(row) for row in result.mappings()]
+        versioned = has_version_table(conn)
+
+    changes = changed_rows(rows, revalidator.check_all(row['URL'] for row in rows))
+    print(f"{table_name}: {len(changes)} of {len(rows)} rows changed")
+    if dry_run:
+        return changes
+
+    for start in range(0, len(changes), batch_size):
+        batch = [row for _, row in changes[start:start + batch_size]]
+        with engine.begin() as conn:
+            if history_table:
+                record_changes(conn, table_name, history_table, batch)
+            conn.exec_driver_sql(
+                f"UPDATE {table_name} SET `URL` = %s, `SSL` = %s, `取得日時` = `取得日時` WHERE `ID` = %s",
+                [(row['URL'], int(row['SSL']), row['ID']) for row in batch])
+            if versioned:
+                bump_table_version(conn, table_name)
+    return changes
+
+def main(argv=None):
+    """コマンドライン引数を解析して再確認を実行する。
+
+    Args:
+        argv (list or None): コマンドライン引数（None の場合は sys.argv）。
+    """
+    parser = argparse.ArgumentParser(prog='python3 -m gnavi_scraper revalidate',
+                                     description='既存の CSV / ex2_2 の URL と SSL だけを確認し直す')
+    parser.add_argument('csv_files', nargs='*', help='確認し直す CSV ファイル')
+    parser.add_argument('--mysql', action='store_true', help='MySQL のテーブルを確認し直す')
+    parser.add_argument('--table', default='ex2_2', help='MySQL のテーブル名')
+    parser.add_argument('--history-table', default=os.getenv('MYSQL_HISTORY_TABLE', 'ex2_2_history'),
+                        help='変更を記録する履歴テーブル（空文字で記録しない）')
+    parser.add_argument('-j', '--workers', type=int, default=16, help='並列に確認するスレッド数')
+    parser.add_argument('--rate', type=float, default=20.0, help='全体の毎秒リクエスト数の上限（0 で無制限）')
+    parser.add_argument('--per-host-interval', type=float, default=1.0, help='同じホストへのリクエスト間隔（秒）')
+    parser.add_argument('--timeout', type=float, default=10.0, help='リダイレクト先の確認のタイムアウト（秒）')
+    parser.add_argument('--ssl-timeout', type=float, default=5.0, help='SSL 証明書の確認のタイムアウト（秒）')
+    parser.add_argument('--cache', default=None, help='確認結果のキャッシュファイル（JSON）')
+    parser.add_argument('--cache-ttl', type=float, default=24.0, help='キャッシュの有効期限（時間）')
+    parser.add_argument('--dry-run', action='store_true', help='変わる行を数えるだけで書き戻さない')
+    args = parser.parse_args(argv)
+    if not args.csv_files and not args.mysql:
+        parser.error('specify CSV files and/or --mysql')
+
+    revalidator = Revalidator(args.workers, args.timeout, args.ssl_timeout,
+                              RateLimiter(args.rate, args.per_host_interval),
+                              ResultCache(args.cache, args.cache_ttl))
+    for file_name in args.csv_files:
+        revalidate_csv(file_name, revalidator, args.dry_run)
+    if args.mysql:
+        from .db import create_db_engine        # MySQL への接続（SQLAlchemy を読み込む）
+        revalidate_table(create_db_engine(), args.table, revalidator, args.history_table or None,
+                         dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""時間枠付きの取得（優先順位付けと期限での打ち切り）
+
+「毎晩 30 分」のように使える時間が決まっている場合に、目標件数ではなく時間で取得を区切ります。
+
+- 優先順位: 店舗URLのインデックス（`discovery.StoreIndex`）の店舗を、
+  1. まだ取得していない店舗（新しい店舗）
+  2. 前回の取得から `stale_days` 日経った店舗、または前回に公式URLの確認を省略した店舗
+  3. それ以外（前回の取得が古い順）
+  の順に並べて取得する。
+- 省略できる処理: 残り時間が `reserve` 秒を切ったら、時間のかかる公式URLのリダイレクト確認を省略し、
+  記載された URL のまま書き込む（その店舗は次回 2 の扱いになる）。
+- 期限: 期限を過ぎたら新しい店舗ページの取得を始めず、取得中のものを書き込んで終了する。
+  書き込んだ店舗はインデックスに取得日時として記録し（チェックポイント）、次回は残りの店舗から取得する。
+  店舗ページを取得できなかった店舗（空の行）は取得日時を記録せず、次回も新しい店舗（または取得し直す店舗）として扱う。
+
+終了時に、目標のうち取得できた割合を優先順位ごとに表示します。
+
+実行方法:
+    python3 -m gnavi_scraper scrape --index store_index.json --budget-minutes 30 -n 5000 -j 8
+
+"""
+import time                             # 期限・取得日時
+from .metrics import METRICS
+from .selector_health import is_blank_row
+from .sinks import Sink
+
+# 優先順位の名前（小さいほど先に取得する）
+TIERS = ['new', 'stale', 'other']
+
+class Budget:
+    """取得に使える時間。
+
+    Args:
+        seconds (float): 使える時間（秒）。
+        reserve (float): 残り時間がこの秒数を切ったら、省略できる処理を省略する。
+
+    Attributes:
+        partial (set): 省略した処理がある店舗URL。
+    """
+
+    def __init__(self, seconds, reserve=120.0):
+        self.seconds = seconds
+        self.reserve = reserve
+        self.deadline = time.monotonic() + seconds
+        self.partial = set()
+        METRICS.gauge_function('gnavi_budget_remaining_seconds', self.remaining)
+
+    def remaining(self):
+        """残り時間（秒）を返す。"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        """期限を過ぎたかを返す。"""
+        return time.monotonic() >= self.deadline
+
+    def skip(self, stage, rs_url):
+        """残り時間が少ないため、店舗の省略できる処理を省略するかを返す。
+
+        Args:
+            stage (str): 処理の段階の名前（メトリクスに記録する）。
+            rs_url (str): 店舗ページの URL。
+
+        Returns:
+            bool: 省略する場合は True（店舗を `partial` に記録する）。
+        """
+        if self.remaining() >= self.reserve:
+            return False
+        self.partial.add(rs_url)
+        METRICS.inc('gnavi_stages_skipped_total', stage=stage)
+        return True
+
+def prioritize(index, stale_days=7.0, now=None):
+    """インデックスの店舗を優先順位の順に並べる。
+
+    Args:
+        index (StoreIndex): 店舗URLのインデックス。
+        stale_days (float): 前回の取得からこの日数が経った店舗を、取得し直す店舗とする。
+        now (float or None): 基準の時刻（None の場合は現在）。
+
+    Returns:
+        list: (店舗URL, 優先順位の名前) のリスト。同じ優先順位の中では前回の取得が古い順
+            （まだ取得していない店舗はインデックスの順）。
+    """
+    now = time.time() if now is None else now
+    limit = now - stale_days * 86400
+    ranked = []
+    for position, (url, entry) in enumerate(index.stores.items()):
+        scraped_at = entry.get('scraped_at')
+        if scraped_at is None:
+            tier = 0
+        elif scraped_at < limit or entry.get('partial'):
+            tier = 1
+        else:
+            tier = 2
+        ranked.append((tier, scraped_at or 0, position, url))
+    ranked.sort()
+    return [(url, TIERS[tier]) for tier, _, _, url in ranked]
+
+class CheckpointSink(Sink):
+    """書き込んだ店舗の取得日時をインデックスに記録する出力先（別の出力先を包む）。
+
+    Args:
+        sink (Sink): 包む出力先。
+        index (StoreIndex): 取得日時を記録するインデックス。
+        budget (Budget or None): 省略した処理がある店舗の記録。
+        save_every (int): この件数を書き込むごとにインデックスを保存する（途中で強制終了された場合に備える）。
+
+    Attributes:
+        written (set): 店舗情報を取り出せた店舗URL。
+        failed (set): 店舗ページを取得できなかった（空の行を書き込んだ）店舗URL。
+    """
+
+    def __init__(self, sink, index, budget=None, save_every=100):
+        self.sink = sink
+        self.index = index
+        self.budget = budget
+        self.save_every = save_every
+        self.written = set()
+        self.failed = set()
+        self._rows = 0
+
+    def open(self):
+        self.sink.open()
+
+    def write(self, row):
+        self.sink.write(row)
+        url = row.get('店舗URL')
+        entry = self.index.stores.get(url)
+        if is_blank_row(row):
+            # 取得日時は記録しない（前回取得した店舗は、次回に取得し直す店舗として扱う）
+            self.failed.add(url)
+            if entry is not None and 'scraped_at' in entry:
+                entry['partial'] = True
+        else:
+            self.written.add(url)
+            if entry is not None:
+                entry['scraped_at'] = time.time()
+                entry['partial'] = bool(self.budget and url in self.budget.partial)
+        self._rows += 1
+        if self._rows % self.save_every == 0:
+            self.index.save()
+
+    def close(self):
+        self.sink.close()
+        self.index.save()
+
+def report(targets, written, budget=None, failed=()):
+    """目標のうち取得できた割合を、優先順位ごとに表示する。
+
+    Args:
+        targets (list): `prioritize` が返した (店舗URL, 優先順位の名前) のうち、目標とした店舗。
+        written (set): 店舗情報を取り出せた店舗URL。
+        budget (Budget or None): 取得に使った時間。
+        failed (set): 店舗ページを取得できなかった店舗URL（取得できた数には含めない）。
+
+    Returns:
+        dict: 優先順位の名前 → (取得できた店舗数, 目標の店舗数)。
+    """
+    coverage = {tier: [0, 0] for tier in TIERS}
+    for url, tier in targets:
+        coverage[tier][1] += 1
+        if url in written:
+            coverage[tier][0] += 1
+    done = sum(count for count, _ in coverage.values())
+    print(f"\nCovered {done}/{len(targets)} stores ({done / max(len(targets), 1):.1%})"
+          + (" - stopped at the deadline" if budget and budget.expired() else ""))
+    for tier, (count, total) in coverage.items():
+        if total:
+            print(f"  {tier:>5}: {count}/{total} ({count / total:.1%})")
+            METRICS.set('gnavi_budget_coverage_ratio', count / total, tier=tier)
+    if budget and budget.partial:
+        print(f"  URL resolution skipped for {len(budget.partial)} stores (re-checked next run)")
+    if failed:
+        print(f"  Store page failed for {len(failed)} stores (retried next run)")
+    return {tier: tuple(values) for tier, values in coverage.items()}
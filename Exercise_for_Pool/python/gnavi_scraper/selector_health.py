@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""セレクタの変化（ぐるなびのクラス名の変更）の検知
+
+ぐるなびのクラス名にはハッシュ（`style_titleLink__oiHVJ` の `oiHVJ` など）が含まれ、
+サイトの更新で変わることがあります。変わったまま巡回を続けると、検索結果が空のまま
+終了したり、店舗ページごとに要素の待機がタイムアウトしたりして、時間とネットワークを浪費します。
+
+`SelectorHealth` は次の確認を行い、続けても取得できない場合はすぐに `SelectorDriftError` で中断します。
+
+- 最初の検索結果ページで店舗リンクが見つからない場合、代替セレクタ（`SEARCH_LINK_FALLBACKS`）を
+  順に試し、見つかったものに切り替える。どれも見つからない場合は中断する。
+- 店舗情報が空の店舗ページが `max_blank_stores` 件続いた場合は中断する。
+
+"""
+import re                               # クラス名の候補の抽出
+import threading                        # 先読みスレッドとの共有
+from collections import Counter         # クラス名の出現回数
+from .extract import (parse_html, parse_search_page, SEARCH_LINK_SELECTOR, SEARCH_LINK_FALLBACKS,
+                      NEXT_ICON_CLASS, STORE_TABLE_CLASS, STORE_TABLE_FALLBACK)
+
+# 診断情報に表示するクラス名の候補（店舗リンク・次ページ・店舗情報テーブルに関係しそうなもの）
+CLASS_HINT_REGEX = re.compile(r'title|link|next|table|shop|store|rest', re.IGNORECASE)
+
+class SelectorDriftError(RuntimeError):
+    """想定したセレクタでページから情報を取り出せないため、巡回を中断する。
+
+    Args:
+        message (str): エラーメッセージ。
+        diagnostic (str): ページの診断情報（`diagnose_page` の結果）。
+        url (str): 確認したページの URL。
+        html (str or bytes or None): 確認したページの HTML（保存して調査するため）。
+    """
+
+    def __init__(self, message, diagnostic='', url='', html=None):
+        super().__init__(message)
+        self.diagnostic = diagnostic
+        self.url = url
+        self.html = html
+
+def count_selectors(soup, selectors):
+    """各セレクタに一致する要素の数を数える。
+
+    Args:
+        soup (BeautifulSoup): 解析済みの HTML。
+        selectors (list): CSS セレクタのリスト。
+
+    Returns:
+        list: (セレクタ, 一致した要素の数) のリスト。
+    """
+    return [(selector, len(soup.select(selector))) for selector in selectors]
+
+def diagnose_page(html, url, selectors, top=15):
+    """セレクタが一致しなかったページの診断情報を作る。
+
+    Args:
+        html (str or bytes): ページの HTML。
+        url (str): ページの URL。
+        selectors (list): 試した CSS セレクタのリスト。
+        top (int): 表示するクラス名の候補の数。
+
+    Returns:
+        str: 診断情報（複数行）。
+
+    Notes:
+        - 新しいクラス名を探しやすいよう、ページ内のクラス名のうち `CLASS_HINT_REGEX` に
+          一致するものを出現回数の多い順に表示する。
+    """
+    soup = parse_html(html)
+    title = soup.title.get_text(strip=True) if soup.title else ''
+    classes = Counter(name for tag in soup.find_all(class_=True) for name in tag.get('class', [])
+                      if CLASS_HINT_REGEX.search(name))
+
+    lines = [
+        f"URL: {url}",
+        f"Title: {title}",
+        f"HTML size: {len(html)} bytes, anchors: {len(soup.find_all('a'))}",
+        "Selectors tried:",
+    ]
+    lines += [f"  {count:5d}  {selector}" for selector, count in count_selectors(soup, selectors)]
+    lines.append("Candidate class names:")
+    lines += [f"  {count:5d}  {name}" for name, count in classes.most_common(top)]
+    return '\n'.join(lines)
+
+def is_blank_row(row):
+    """店舗情報テーブルから何も取り出せなかった行かを判定する。
+
+    Args:
+        row (dict): 店舗情報。
+
+    Returns:
+        bool: 店舗名・電話番号・都道府県がすべて空の場合は True。
+    """
+    return not (row.get('店舗名') or row.get('電話番号') or row.get('都道府県'))
+
+class SelectorHealth:
+    """巡回中のセレクタの状態を管理し、変化を検知する。
+
+    Args:
+        search_link (str): 店舗リンクの CSS セレクタ。
+        fallbacks (list): 店舗リンクが見つからない場合に試す代替セレクタ。
+        max_blank_stores (int): 店舗情報が空の店舗ページがこの件数続いたら中断する（0 の場合は中断しない）。
+
+    Attributes:
+        link_selector (str): 現在使用している店舗リンクの CSS セレクタ（代替セレクタに切り替わることがある）。
+
+    Notes:
+        - 検索結果ページの先読みスレッドからも呼ばれるため、状態の更新はロックで保護する。
+    """
+
+    def __init__(self, search_link=SEARCH_LINK_SELECTOR, fallbacks=SEARCH_LINK_FALLBACKS, max_blank_stores=5):
+        self.link_selector = search_link
+        self.fallbacks = [selector for selector in fallbacks if selector != search_link]
+        self.max_blank_stores = max_blank_stores
+        self.search_checked = False     # 店舗リンクが見つかった検索結果ページがあるか
+        self.blank_stores = 0           # 店舗情報が空の店舗ページが続いた数
+        self._lock = threading.Lock()
+
+    @property
+    def search_wait_for(self):
+        """検索結果ページで待つ CSS セレクタ（どれかの候補が現れたら待機を終える）。"""
+        return ', '.join([self.link_selector] + self.fallbacks)
+
+    @property
+    def store_wait_for(self):
+        """店舗ページで待つ CSS セレクタ。"""
+        return f'.{STORE_TABLE_CLASS}, {STORE_TABLE_FALLBACK}'
+
+    def check_search_page(self, html, page_url, rs_links, next_url):
+        """検索結果ページの解析結果を確認し、必要なら代替セレクタで解析し直す。
+
+        Args:
+            html (str or bytes): 検索結果ページの HTML。
+            page_url (str): 検索結果ページの URL。
+            rs_links (list): 現在のセレクタで取り出した店舗ページの URL。
+            next_url (str or None): 取り出した次ページの URL。
+
+        Returns:
+            tuple: (店舗ページの URL のリスト, 次ページの URL)。
+
+        Raises:
+            SelectorDriftError: 最初の検索結果ページで、どのセレクタでも店舗リンクが見つからない場合。
+
+        Notes:
+            - 2 ページ目以降で店舗リンクが見つからない場合は、検索結果の終わりとして空のリストを返す。
+        """
+        with self._lock:
+            if rs_links:
+                self.search_checked = True
+                return rs_links, next_url
+            if self.search_checked:
+                return rs_links, next_url
+
+            for selector in self.fallbacks:
+                fallback_links, fallback_next = parse_search_page(html, page_url, selector)
+                if fallback_links:
+                    print(f"Warning: '{self.link_selector}' matched nothing on {page_url}; "
+                          f"falling back to '{selector}' ({len(fallback_links)} links).")
+                    self.link_selector = selector
+                    self.fallbacks = [s for s in self.fallbacks if s != selector]
+                    self.search_checked = True
+                    return fallback_links, next_url or fallback_next
+
+        tried = [self.link_selector] + self.fallbacks + [f'.{NEXT_ICON_CLASS}']
+        raise SelectorDriftError(f"No store links found on the first search page: {page_url}",
+                                 diagnose_page(html, page_url, tried), page_url, html)
+
+    def check_store_page(self, html, rs_url, row):
+        """店舗ページから店舗情報を取り出せたかを確認する。
+
+        Args:
+            html (str or bytes): 店舗ページの HTML。
+            rs_url (str): 店舗ページの URL。
+            row (dict): 取り出した店舗情報。
+
+        Raises:
+            SelectorDriftError: 店舗情報が空の店舗ページが `max_blank_stores` 件続いた場合。
+        """
+        with self._lock:
+            if not is_blank_row(row):
+                self.blank_stores = 0
+                return
+            self.blank_stores += 1
+            if not self.max_blank_stores or self.blank_stores < self.max_blank_stores:
+                return
+
+        tried = [f'.{STORE_TABLE_CLASS}', STORE_TABLE_FALLBACK, '#info-phone .number', '.adr.slink .region']
+        raise SelectorDriftError(f"No store data found on {self.blank_stores} store pages in a row",
+                                 diagnose_page(html, rs_url, tried), rs_url, html)
@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""店舗情報の出力先
+
+どの出力先も次の共通のインターフェースを持ちます。
+
+- `open()`: 出力を開始する。
+- `write(row)`: 店舗情報 1 件を書き込む。
+- `close()`: 残りを書き出して出力を終了する。
+
+`with` 文で使用すると `open` と `close` が自動的に呼ばれます。
+`NdjsonSink` は 1 件ごとに JSON の 1 行を標準出力に書き出すため、パイプラインの後段に渡せます。
+CSV の出力には pandas を使用しません。SQLAlchemy は MySQL に出力するときに初めて読み込みます。
+
+"""
+import csv                              # CSV の書き込み
+import json                             # NDJSON の書き込み
+import os                               # ファイルの存在確認、ロック状態のチェック
+import sys                              # 標準出力
+from .extract import CSV_COLUMNS
+
+def is_file_locked(file_path):
+    """指定したファイルが開かれているかを確認する。
+
+    Args:
+        file_path (str): 確認するファイルのパス。
+
+    Returns:
+        bool: ファイルがロックされている場合は True、それ以外は False。
+    """
+    if not os.path.exists(file_path):
+        return False                # ファイルが存在しなければロックされている心配はない
+
+    try:
+        with open(file_path, 'a'):  # 追記モードで開いてみる
+            return False            # 開けたらロックされていない
+    except IOError:
+        return True                 # 開けなかったらロックされている
+
+class Sink:
+    """出力先の基底クラス。"""
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def open(self):
+        """出力を開始する。"""
+
+    def write(self, row):
+        """店舗情報 1 件を書き込む。
+
+        Args:
+            row (dict): 店舗情報。
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """残りを書き出して出力を終了する。"""
+
+class CsvSink(Sink):
+    """店舗情報を CSV ファイル（UTF-8 BOM 付き）に 1 行ずつ出力する。
+
+    Args:
+        file_name (str): 出力するCSVファイル名。
+        columns (list): 出力する列（これ以外のキーは出力しない）。
+
+    Raises:
+        OSError: 出力するファイルが他のアプリケーションで開かれている場合（`open` 時）。
+
+    Notes:
+        - 取得した行をメモリに溜めずに書き込むため、途中で中断してもそこまでの行は残る。
+        - bool の値は pandas の出力と同じく 'True' / 'False' と書き込む。
+    """
+
+    def __init__(self, file_name, columns=CSV_COLUMNS):
+        self.file_name = file_name
+        self.columns = columns
+        self._file = None
+        self._writer = None
+
+    def open(self):
+        # ファイルが開かれているかチェック
+        if is_file_locked(self.file_name):
+            raise OSError(f"{self.file_name} is open. Please close it and try again.")
+        self._file = open(self.file_name, 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            print(self.file_name + " has been created!")
+
+class NdjsonSink(Sink):
+    """店舗情報を 1 件ずつ JSON の 1 行（NDJSON）として出力する。
+
+    Args:
+        stream (file or None): 書き込み先（None の場合は `open` 時点の標準出力）。
+
+    Notes:
+        - 行を溜めずに書き込むたびに flush するため、後段のプロセスは 1 件目からすぐに処理できる。
+        - 値は JSON の型のまま書き込む（SSL は true / false、値がない項目は null）。
+        - 標準出力に書き込む場合、進捗の表示は標準エラー出力に出す（`cli.scrape` を参照）。
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def open(self):
+        if self.stream is None:
+            self.stream = sys.stdout
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+class MySQLSink(Sink):
+    """店舗情報をバックグラウンドで MySQL のテーブルに書き込む。
+
+    Args:
+        table_name (str): 書き込み先のテーブル名。
+        batch_size (int): 1 トランザクションで書き込む最大行数。
+        spill_dir (str): 書き込みに失敗したバッチを退避するディレクトリ。
+        history_table (str or None): 指定した場合、変更された項目をこの履歴テーブルに記録する。
+
+    Notes:
+        - 書き込みは `WriteBehindWriter` が行う（接続プール・リトライ・退避を含む）。
+    """
+
+    def __init__(self, table_name='ex2_2', batch_size=20, spill_dir='spill', history_table=None):
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.spill_dir = spill_dir
+        self.history_table = history_table
+        self.writer = None
+
+    def open(self):
+        from .db import create_db_engine            # MySQL への接続（SQLAlchemy を読み込む）
+        from .write_behind import WriteBehindWriter # MySQL へのバックグラウンド書き込み
+
+        self.writer = WriteBehindWriter(create_db_engine(), self.table_name, batch_size=self.batch_size,
+                                        spill_dir=self.spill_dir, history_table=self.history_table)
+        self.writer.start()
+
+    def write(self, row):
+        self.writer.append(row)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
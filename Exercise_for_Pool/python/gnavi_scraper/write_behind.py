@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""MySQL への非同期書き込み（ライトビハインド）
+
+スクレイピング中に取得した行をバッファに溜め、バックグラウンドのスレッドが
+小さなトランザクションに分けて MySQL に書き込みます。書き込みに失敗した
+バッチはリトライし、それでも失敗した場合はローカルのファイルに退避します。
+
+"""
+import glob                             # 退避ファイルの検索
+import json                             # 退避ファイルの読み書き
+import os                               # パス操作
+import queue                            # スレッド間で行を受け渡すキュー
+import threading                        # バックグラウンドの書き込みスレッド
+import time                             # リトライ間隔・フラッシュ間隔
+from sqlalchemy import MetaData, Table, func   # 書き込み先のテーブル定義の読み込み、取得日時
+from sqlalchemy.dialects.mysql import insert    # INSERT ... ON DUPLICATE KEY UPDATE の生成
+from .db import has_version_table, bump_table_version     # 読み取り側のキャッシュの無効化
+from .history import record_changes, ensure_partitions   # 変更履歴の記録
+from .metrics import METRICS            # キューの長さ・書き込み件数の公開
+
+# キューの終端を表す目印
+_STOP = object()
+
+def upsert_statement(table, rows):
+    """一意キーが重複した行を上書きする、複数行の INSERT 文を作成する。
+
+    Args:
+        table (sqlalchemy.Table): 書き込み先のテーブル。
+        rows (list): 書き込む行 (dict) のリスト。すべての行が同じキーを持つ。
+
+    Returns:
+        sqlalchemy.sql.Insert: INSERT ... ON DUPLICATE KEY UPDATE 文。
+
+    Notes:
+        - 同じ店舗URLの行が既にある場合は、ID と店舗URL 以外の列を新しい値で更新する。
+        - 取得日時は内容が変わらなくても現在時刻にする（ON UPDATE CURRENT_TIMESTAMP は
+          どれかの列が変わった場合しか働かないため、明示的に設定する）。
+    """
+    stmt = insert(table).values(rows)
+    update_cols = {key: stmt.inserted[key] for key in rows[0] if key not in ('ID', '店舗URL')}
+    if '取得日時' in table.c:
+        update_cols['取得日時'] = func.now()
+    return stmt.on_duplicate_key_update(update_cols)
+
+def fit_rows(table, rows):
+    """行をテーブルの列に合わせる。
+
+    Args:
+        table (sqlalchemy.Table): 書き込み先のテーブル。
+        rows (list): 書き込む行 (dict) のリスト。
+
+    Returns:
+        list: テーブルにない列を除き、列の長さを超える文字列を切り詰めた行のリスト。
+
+    Notes:
+        - 厳格モードの MySQL は長すぎる値が 1 つでもあるとバッチ全体を拒否し、退避したファイルの
+          書き込み直しも毎回同じ理由で失敗するため、書き込む前に切り詰める（'03-1234-5678（代表）' など）。
+        - テーブルにない列（SSL確認 の列を追加する前のテーブルなど）は書き込まない。
+    """
+    lengths = {column.name: column.type.length for column in table.c
+               if isinstance(getattr(column.type, 'length', None), int)}
+    fitted = []
+    for row in rows:
+        row = {key: value for key, value in row.items() if key in table.c}
+        for key, length in lengths.items():
+            value = row.get(key)
+            if isinstance(value, str) and len(value) > length:
+                print(f"Truncated {key} to {length} characters: {value}")
+                row[key] = value[:length]
+        fitted.append(row)
+    return fitted
+
+class WriteBehindWriter:
+    """取得した行をバックグラウンドで MySQL に書き込むライター。
+
+    `sinks.MySQLSink` から使用する。`append` はすぐに戻るため、スクレイピングを止めない。
+
+    Args:
+        engine (sqlalchemy.engine.Engine): 書き込み先のデータベースエンジン。
+        table_name (str): 書き込み先のテーブル名。
+        batch_size (int): 1 トランザクションで書き込む最大行数。
+        flush_interval (float): バッチが満たなくても書き込むまでの最大待ち時間（秒）。
+        max_retries (int): 1 バッチあたりの最大リトライ回数。
+        retry_delay (float): 最初のリトライまでの待ち時間（秒）。以降は倍々に延ばす。
+        spill_dir (str): 書き込みに失敗したバッチを退避するディレクトリ。
+        history_table (str or None): 指定した場合、変更された項目をこの履歴テーブルに記録する。
+
+    Notes:
+        - `start` で前回の退避ファイルを書き込み直してから、書き込みスレッドを開始する。
+        - `close` でキューに残った行をすべて書き込み、スレッドの終了を待つ。
+        - 一意キー（店舗URL）が重複した行は `upsert_statement` で上書きする。
+        - 列の長さを超える値は `fit_rows` で切り詰める（1 件のためにバッチ全体が失敗しないように）。
+        - 履歴は上書きと同じトランザクションで記録するため、現在テーブルと食い違わない。
+        - 更新番号のテーブル（`db.VERSION_TABLE`）がある場合は、同じトランザクションで更新番号を進める。
+        - `with` 文で使用すると、例外で中断した場合も `close` が呼ばれる。
+    """
+
+    def __init__(self, engine, table_name, batch_size=20, flush_interval=2.0,
+                 max_retries=3, retry_delay=1.0, spill_dir='spill', history_table=None):
+        self.engine = engine
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.spill_dir = spill_dir
+        self.history_table = history_table
+        self._table = None      # 書き込み先のテーブル定義（最初の書き込み時に読み込む）
+        self._versioned = False # 更新番号を進めるか（`start` で確認する）
+        self.written = 0        # 書き込んだ行数
+        self.spilled = 0        # 退避した行数
+        self._queue = queue.Queue()
+        METRICS.gauge_function('gnavi_write_queue_depth', self._queue.qsize, table=table_name)
+        METRICS.gauge_function('gnavi_write_rows', lambda: self.written, table=table_name, state='written')
+        METRICS.gauge_function('gnavi_write_rows', lambda: self.spilled, table=table_name, state='spilled')
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def start(self):
+        """接続を確認し、退避ファイルを書き込み直してから、書き込みスレッドを開始する。"""
+        try:
+            with self.engine.connect() as conn:
+                print("Connection successful")
+                if self.history_table:
+                    ensure_partitions(conn, self.history_table)
+                self._versioned = has_version_table(conn)
+            self._replay_spills()
+        except Exception as e:
+            print(f"Connection failed: {e}")    # 取得した行はリトライ後に退避される
+        self._thread.start()
+
+    def append(self, row):
+        """書き込む行をキューに追加する（すぐに戻る）。
+
+        Args:
+            row (dict): テーブルの 1 行分のデータ。
+        """
+        self._queue.put(row)
+
+    def close(self):
+        """キューに残った行をすべて書き込み、書き込みスレッドの終了を待つ。"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        print(f"Data has been inserted into the {self.table_name} table! "
+              f"(written: {self.written}, spilled: {self.spilled})")
+
+    def _run(self):
+        """キューから行を取り出し、バッチごとに書き込むスレッドの本体。"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                row = None
+
+            if row is _STOP:
+                break
+            if row is not None:
+                batch.append(row)
+
+            # バッチが満杯になったか、待ち時間を過ぎたら書き込む
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._write_batch(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        if batch:
+            self._write_batch(batch)
+
+    def _insert(self, rows):
+        """1 トランザクションで行を書き込む。"""
+        if self._table is None:
+            self._table = Table(self.table_name, MetaData(), autoload_with=self.engine)
+        rows = fit_rows(self._table, rows)
+        with self.engine.begin() as conn:
+            if self.history_table:
+                record_changes(conn, self.table_name, self.history_table, rows)
+            conn.execute(upsert_statement(self._table, rows))
+            if self._versioned:
+                bump_table_version(conn, self.table_name)
+
+    def _write_batch(self, rows):
+        """バッチを書き込む。リトライしても失敗した場合はファイルに退避する。"""
+        delay = self.retry_delay
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._insert(rows)
+                self.written += len(rows)
+                return
+            except Exception as e:
+                print(f"Write failed ({attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(delay)
+                    delay *= 2
+        self._spill(rows)
+
+    def _spill(self, rows):
+        """書き込めなかった行を JSON Lines 形式のファイルに退避する。"""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        file_name = f"{self.table_name}-{time.strftime('%Y%m%d%H%M%S')}-{self.spilled}.jsonl"
+        path = os.path.join(self.spill_dir, file_name)
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        self.spilled += len(rows)
+        print(f"Spilled {len(rows)} rows to {path}")
+
+    def _replay_spills(self):
+        """前回までに退避した行を書き込み、成功したファイルを削除する。"""
+        pattern = os.path.join(self.spill_dir, f"{self.table_name}-*.jsonl")
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            if rows:
+                self._insert(rows)
+                self.written += len(rows)
+            os.remove(path)
+            print(f"Replayed {len(rows)} rows from {path}")